@@ -11,9 +11,15 @@ Main Functions
 --------------
 nca_analysis : Perform NCA analysis on data
 nca_output : Display analysis results
+nca_bottleneck_query : Required X levels for arbitrary Y levels
 nca_outliers : Identify outliers in NCA analysis
+nca_outliers_batch : Outliers for several conditions and ceilings
 nca_power : Power analysis for NCA
+nca_sample_size : Smallest sample size for a target power
+nca_power_lookup : Power from stored power tables
 nca_random : Generate random data for testing
+nca_random_chunks : Generate large random datasets in chunks
+nca_random_file : Write a large random dataset to a .npy or Parquet file
 
 Example
 -------
@@ -29,19 +35,26 @@ __author__ = "Gerandi Matraku"
 
 # Core analysis functions
 from .nca import nca_analysis
+from .nca_bottleneck import nca_bottleneck_query
+from .nca_outliers import nca_outliers, nca_outliers_batch
 from .nca_output import nca_output
-from .nca_outliers import nca_outliers
-from .nca_power import nca_power
-from .nca_random import nca_random
+from .nca_power import nca_power, nca_power_lookup, nca_sample_size
+from .nca_random import nca_random, nca_random_chunks, nca_random_file
 
 # Public API
 __all__ = [
     # Core functions
     "nca_analysis",
     "nca_output",
+    "nca_bottleneck_query",
     "nca_outliers",
+    "nca_outliers_batch",
     "nca_power",
+    "nca_sample_size",
+    "nca_power_lookup",
     "nca_random",
+    "nca_random_chunks",
+    "nca_random_file",
     # Metadata
     "__version__",
     "__author__",
@@ -5,13 +5,20 @@ import warnings
 from .nca_plots import p_plot
 from .nca_summary import p_summary
 from .nca_tests import p_test, p_test_time
-from .p_bottleneck_table import p_bottleneck_data
+from .p_bottleneck_export import (
+    p_close_bottleneck_export,
+    p_open_bottleneck_export,
+    p_write_bottleneck,
+)
+from .p_bottleneck_query import p_add_bottleneck_query, p_bottleneck_query_data
+from .p_bottleneck_table import p_add_bottleneck, p_bottleneck_data
 from .p_ceiling import p_nca_wrapper
 from .p_constants import P_NO_BOTTLENECK
 from .p_loop_data import p_create_loop_data
 from .p_scope import p_scope
-from .p_utils import p_cluster_cleanup, p_start_cluster, p_warn_percentage_max
+from .p_utils import p_cluster_cleanup, p_seed_sequence, p_start_cluster, p_warn_percentage_max
 from .p_validate import (
+    p_column_names,
     p_validate_ceilings,
     p_validate_clean,
     p_validate_corner,
@@ -56,19 +63,24 @@ def nca_analysis(
     test_rep=0,
     test_p_confidence=0.95,
     test_p_threshold=0.05,
+    bottleneck_query=False,
+    bottleneck_export=None,
+    bottleneck_path=None,
+    bottleneck_specs=None,
+    random_state=None,
 ):
 
     if ceilings is None:
         ceilings = ["ols", "ce_fdh", "cr_fdh"]
 
-    # Cleans up any cluster registration
-    p_cluster_cleanup()
-
     # Validate and clean data
     cleaned = p_validate_clean(data, x, y)
     data_x = cleaned["x"]
     data_y = cleaned["y"]
 
+    # One name (or column position) per condition
+    x = p_column_names(x)
+
     # Validate ceiling types
     ceilings = p_validate_ceilings(ceilings)
 
@@ -109,8 +121,17 @@ def nca_analysis(
         steps,
         step_size,
         cutoff,
+        bottleneck_specs,
     )
 
+    # Frontiers and lines for answering bottleneck queries at any Y level
+    query = p_bottleneck_query_data(data_y, bn_data, flip_y) if bottleneck_query else None
+
+    # Stream the bottlenecks to file instead of keeping the tables in memory
+    export = None
+    if bottleneck_export is not None:
+        export = p_open_bottleneck_export(bn_data, bottleneck_export, bottleneck_path)
+
     # Data for tests
     # Assuming data_y is a pandas DataFrame or similar, len() gives rows.
     n_rows = len(data_y)
@@ -137,7 +158,11 @@ def nca_analysis(
         num_vars = len(data_x[0])
 
     condition = len(ceilings) * num_vars * test_rep > 6000
-    p_start_cluster(multiprocessing.cpu_count() > 1 and condition)
+    # Reuses the pool of an outer analysis, if any
+    owned_pool = p_start_cluster(multiprocessing.cpu_count() > 1 and condition)
+
+    # One seed per X, split in the analysis (bootstraps) and the test streams
+    x_seeds = p_seed_sequence(random_state).spawn(num_vars)
 
     # Create output lists
     plots = {}
@@ -146,75 +171,88 @@ def nca_analysis(
     peers = {}
     test_time = 0
 
-    # Loop the independent varaibles
-    for id_x in range(num_vars):
-        loop_data = p_create_loop_data(data_x, data_y, scope, flip_x, flip_y, id_x, qr_tau)
-        loop_data["conf"] = test_p_confidence
-        p_warn_percentage_max(loop_data, bn_data)
-        x_name = loop_data["names"][0]  # Index 0 is always the X variable name
-
-        # We need this for the 'FIT' number, regardless of user preference
-        analisys_ce_fdh = p_nca_wrapper("ce_fdh", loop_data, bn_data, effect_aggregation)
-        loop_data["ce_fdh_ceiling"] = analisys_ce_fdh["ceiling"]
-        loop_data["ce_fdh_peers"] = analisys_ce_fdh["peers"]
-
-        # We need to make sure ce_cm_conf (if present) comes before cr_cm_conf
-        if "ce_cm_conf" in ceilings:
-            analisys_ce_cm_conf = p_nca_wrapper(
-                "ce_cm_conf", loop_data, bn_data, effect_aggregation
-            )
-            loop_data["ce_cm_conf_columns"] = analisys_ce_cm_conf["line"].get("columns")
-
-        analyses = {}
-        for ceiling in ceilings:
-            if ceiling == "ce_fdh":
-                analysis = analisys_ce_fdh
-            elif ceiling == "ce_cm_conf":
-                analysis = analisys_ce_cm_conf
-            else:
-                analysis = p_nca_wrapper(ceiling, loop_data, bn_data, effect_aggregation)
-
-            if analysis.get("bottleneck") is not None and ceiling not in P_NO_BOTTLENECK:
-                if ceiling not in bn_data["bottlenecks"]:
-                    bn_data["bottlenecks"][ceiling] = {}
-                bn_data["bottlenecks"][ceiling][x_name] = analysis["bottleneck"]
-                # Handle 'cases' attribute if needed
-                if "cases" in analysis:
-                    bn_data["bottlenecks"][ceiling][x_name]["cases"] = analysis["cases"]
-
-            if "bottleneck" in analysis:
-                del analysis["bottleneck"]
-
-            analyses[ceiling] = analysis
-
-            if ceiling not in peers:
-                peers[ceiling] = {}
-            peers[ceiling][x_name] = analysis.get("peers")
-
-        test_tuple = p_test(analyses, loop_data, test_params, effect_aggregation)
-        if test_tuple is not None:
-            tests[x_name] = test_tuple["test"]
-            test_time += test_tuple["test_time"]
-
-        # Add P-value/accuracy for displaying in summary
-        for ceiling in ceilings:
-            if x_name in tests and ceiling in tests[x_name]:
-                analyses[ceiling]["p"] = tests[x_name][ceiling]["p_value"]
-                analyses[ceiling]["p_accuracy"] = tests[x_name][ceiling]["test_params"][
-                    "p_accuracy"
-                ]
-            else:
-                analyses[ceiling]["p"] = float("nan")
-                analyses[ceiling]["p_accuracy"] = float("nan")
-
-        plots[x_name] = p_plot(analyses, loop_data, corner)
-        summaries[x_name] = p_summary(analyses, loop_data)
-
-    # Shut down cluster for parallisation
-    p_cluster_cleanup()
+    # The pool and the export files are closed also when an analysis fails
+    try:
+        # Loop the independent varaibles
+        for id_x in range(num_vars):
+            loop_data = p_create_loop_data(data_x, data_y, scope, flip_x, flip_y, id_x, qr_tau)
+            loop_data["conf"] = test_p_confidence
+            loop_data["seed"], test_params["seed"] = x_seeds[id_x].spawn(2)
+            p_warn_percentage_max(loop_data, bn_data)
+            x_name = loop_data["names"][0]  # Index 0 is always the X variable name
+
+            # We need this for the 'FIT' number, regardless of user preference
+            analisys_ce_fdh = p_nca_wrapper("ce_fdh", loop_data, bn_data, effect_aggregation)
+            loop_data["ce_fdh_ceiling"] = analisys_ce_fdh["ceiling"]
+            loop_data["ce_fdh_peers"] = analisys_ce_fdh["peers"]
+
+            # We need to make sure ce_cm_conf (if present) comes before cr_cm_conf
+            if "ce_cm_conf" in ceilings:
+                analisys_ce_cm_conf = p_nca_wrapper(
+                    "ce_cm_conf", loop_data, bn_data, effect_aggregation
+                )
+                loop_data["ce_cm_conf_columns"] = analisys_ce_cm_conf["line"].get("columns")
+
+            analyses = {}
+            for ceiling in ceilings:
+                if ceiling == "ce_fdh":
+                    analysis = analisys_ce_fdh
+                elif ceiling == "ce_cm_conf":
+                    analysis = analisys_ce_cm_conf
+                else:
+                    analysis = p_nca_wrapper(ceiling, loop_data, bn_data, effect_aggregation)
+
+                if analysis.get("bottleneck") is not None and ceiling not in P_NO_BOTTLENECK:
+                    # One bottleneck column per specification, the export only
+                    # streams the first (bottleneck_x / bottleneck_y) one
+                    for i, spec in enumerate(bn_data["specs"]):
+                        bn = spec["bottlenecks"][ceiling]
+                        if export is not None and i == 0:
+                            p_write_bottleneck(
+                                export[ceiling], bn, x_name, analysis["bottleneck"][i]
+                            )
+                        else:
+                            p_add_bottleneck(bn, x_name, analysis["bottleneck"][i])
+                    if query is not None:
+                        p_add_bottleneck_query(query, ceiling, loop_data, analysis)
+
+                if "bottleneck" in analysis:
+                    del analysis["bottleneck"]
+
+                analyses[ceiling] = analysis
+
+                if ceiling not in peers:
+                    peers[ceiling] = {}
+                peers[ceiling][x_name] = analysis.get("peers")
+
+            test_tuple = p_test(analyses, loop_data, test_params, effect_aggregation)
+            if test_tuple is not None:
+                tests[x_name] = test_tuple["test"]
+                test_time += test_tuple["test_time"]
+
+            # Add P-value/accuracy for displaying in summary
+            for ceiling in ceilings:
+                if x_name in tests and ceiling in tests[x_name]:
+                    analyses[ceiling]["p"] = tests[x_name][ceiling]["p_value"]
+                    analyses[ceiling]["p_accuracy"] = tests[x_name][ceiling]["test_params"][
+                        "p_accuracy"
+                    ]
+                else:
+                    analyses[ceiling]["p"] = float("nan")
+                    analyses[ceiling]["p_accuracy"] = float("nan")
+
+            plots[x_name] = p_plot(analyses, loop_data, corner)
+            summaries[x_name] = p_summary(analyses, loop_data)
+    finally:
+        # Shut down cluster for parallisation, unless an outer analysis started it
+        p_cluster_cleanup(owned_pool)
+        if export is not None:
+            bottleneck_files = p_close_bottleneck_export(export)
 
     # Add the bottlenecks with mpy attribute
     bottlenecks = bn_data["bottlenecks"]
+    if export is not None:
+        bottlenecks = {}
 
     model = {
         "plots": plots,
@@ -223,9 +261,19 @@ def nca_analysis(
         "peers": peers,
         "tests": tests,
         "test_time": p_test_time(test_time),
-        "mpy": bn_data["mpy"],
+        "mpy": bn_data["specs"][0]["mpy"],
         "flip_y": flip_y,
         "show_plots": False,
     }
 
+    if bottleneck_specs is not None:
+        model["bottleneck_specs"] = {
+            (spec["bn_x"], spec["bn_y"]): spec["bottlenecks"] for spec in bn_data["specs"]
+        }
+        model["bottleneck_specs"][(bn_data["bn_x"], bn_data["bn_y"])] = bottlenecks
+    if query is not None:
+        model["bottleneck_query"] = query
+    if export is not None:
+        model["bottleneck_files"] = bottleneck_files
+
     return model
@@ -1,12 +1,59 @@
 import math
 
+import numpy as np
 import pandas as pd
 
+from .p_bottleneck_query import p_query_bottlenecks
 from .p_constants import DASH_COUNT
 from .p_utils import p_get_digits, p_pretty_name, p_pretty_number
 
 
+def nca_bottleneck_query(model, y, ceilings=None):
+    """Required X levels of every condition for arbitrary Y levels.
+
+    Uses the query index stored by ``nca_analysis(..., bottleneck_query=True)``.
+    The Y levels and the returned X levels use the ``bottleneck_y`` and
+    ``bottleneck_x`` options of the analysis.
+
+    Parameters
+    ----------
+    model : dict
+        Result of nca_analysis with bottleneck_query=True.
+    y : float or array-like
+        Y levels to query.
+    ceilings : str or list of str, optional
+        Ceilings to query, defaults to all ceilings with bottlenecks.
+
+    Returns
+    -------
+    dict
+        Bottleneck table per ceiling, in the same format as model["bottlenecks"].
+    """
+    query = model.get("bottleneck_query")
+    if query is None:
+        raise ValueError(
+            "The model has no bottleneck query index, "
+            "use nca_analysis(..., bottleneck_query=True)!\n"
+        )
+
+    if ceilings is None:
+        ceilings = list(query["ceilings"].keys())
+    elif isinstance(ceilings, str):
+        ceilings = [ceilings]
+
+    invalid = [c for c in ceilings if c not in query["ceilings"]]
+    if invalid:
+        raise ValueError(f"No bottleneck query index for ceiling(s) {', '.join(invalid)}!\n")
+
+    levels = np.atleast_1d(np.asarray(y, dtype=float))
+    return p_query_bottlenecks(query, levels, ceilings)
+
+
 def p_display_bottleneck(bottlenecks, title="Bottleneck", pdf=False, path=None):
+    # Nothing to show, e.g. when the bottlenecks were exported to file
+    if len(bottlenecks) == 0:
+        return
+
     if pdf:
         # Put all tables in 1 file
         from .p_graphics import p_close_pdf, p_new_pdf
@@ -42,29 +89,10 @@ def p_display_table_pdf(bn, method, title):
     bn_y_id = bn.attrs.get("bn_y_id")
     rows = len(bn)
     x_length = len(bn.columns) - 1
-    size = bn.attrs.get("size")
     _cutoff = bn.attrs.get("cutoff")  # prefixed with _ as unused
 
     # Prepare data for plotting
-    tmp = pd.DataFrame(index=bn.index, columns=range(x_length))
-
-    for i in range(x_length):
-        col_idx = i + 1  # Skip first column (Y)
-        col_data = bn.iloc[:, col_idx]
-
-        if bn_x == "percentile":
-            # R: cases <- round(size * as.numeric(bn[,i+1]) / 100, digits = 0)
-            numeric_vals = pd.to_numeric(col_data, errors="coerce").fillna(0)
-            cases = (size * numeric_vals / 100).round(0).astype(int)
-
-            # R: cases <- ifelse(bn[,i+1] == "NN", 0, cases)
-            is_nn = col_data == "NN"
-            cases[is_nn] = 0
-
-            # paste0(bn[,i+1], ' (', as.character(cases), ')')
-            tmp.iloc[:, i] = col_data.astype(str) + " (" + cases.astype(str) + ")"
-        else:
-            tmp.iloc[:, i] = col_data
+    tmp = p_pretty_bottleneck(bn)
 
     if tmp.empty:
         return
@@ -139,38 +167,9 @@ def p_display_table_screen(bn, method, title):
     bn_y_id = bn.attrs.get("bn_y_id")
     rows = len(bn)
     x_length = len(bn.columns) - 1
-    size = bn.attrs.get("size")
     cutoff = bn.attrs.get("cutoff")
 
-    tmp = pd.DataFrame(index=bn.index, columns=range(x_length))
-
-    for i in range(x_length):
-        col_idx = i + 1
-        values = bn.iloc[:, col_idx]
-
-        if bn_x == "percentile":
-            # cases <- attr(values, "cases")
-            # In Python, series don't have attrs usually preserved well, or we stored it in bn.attrs?
-            # In nca.py, I added 'cases' to the bottleneck dict.
-            # But here bn is a DataFrame.
-            # Maybe 'cases' is in bn.attrs['cases']?
-            # Or maybe values has it if we used a custom class.
-            # Let's assume we can get cases.
-            # If not, we recalculate like in PDF version?
-            # R code says: cases <- attr(values, "cases")
-            # This implies the column itself has an attribute.
-            # Pandas columns (Series) can have attrs.
-            cases = values.attrs.get("cases")
-            if cases is None:
-                # Fallback: recalculate
-                numeric_vals = pd.to_numeric(values, errors="coerce").fillna(0)
-                cases = (size * numeric_vals / 100).round(0).astype(int)
-                is_nn = values == "NN"
-                cases[is_nn] = 0
-
-            tmp.iloc[:, i] = values.astype(str) + " (" + cases.astype(str) + ")"
-        else:
-            tmp.iloc[:, i] = values
+    tmp = p_pretty_bottleneck(bn)
 
     if tmp.empty:
         return
@@ -212,26 +211,9 @@ def p_display_table_screen_tab(bn, method, title):
     bn_y_id = bn.attrs.get("bn_y_id")
     rows = len(bn)
     x_length = len(bn.columns) - 1
-    size = bn.attrs.get("size")
     cutoff = bn.attrs.get("cutoff")
 
-    tmp = pd.DataFrame(index=bn.index, columns=range(x_length))
-
-    for i in range(x_length):
-        col_idx = i + 1
-        values = bn.iloc[:, col_idx]
-
-        if bn_x == "percentile":
-            cases = values.attrs.get("cases")
-            if cases is None:
-                numeric_vals = pd.to_numeric(values, errors="coerce").fillna(0)
-                cases = (size * numeric_vals / 100).round(0).astype(int)
-                is_nn = values == "NN"
-                cases[is_nn] = 0
-
-            tmp.iloc[:, i] = values.astype(str) + " (" + cases.astype(str) + ")"
-        else:
-            tmp.iloc[:, i] = values
+    tmp = p_pretty_bottleneck(bn)
 
     if tmp.empty:
         return
@@ -310,3 +292,41 @@ def p_display_table_screen_tab(bn, method, title):
 
     print("".join(output))
     print("")
+
+
+def p_pretty_bottleneck(bn):
+    """Render the numeric X columns of a bottleneck table as display strings.
+
+    Cells flagged in the "nn" / "na" masks are shown as "NN" / "NA". For
+    percentile tables the number of cases is appended to every cell.
+    """
+    bn_x = bn.attrs.get("bn_x")
+    bn_x_id = bn.attrs.get("bn_x_id")
+    precision_x = 1 if bn_x_id in [1, 2, 4] else 3
+    size = bn.attrs.get("size")
+    nn_masks = bn.attrs.get("nn", {})
+    na_masks = bn.attrs.get("na", {})
+    all_cases = bn.attrs.get("cases", {})
+
+    tmp = pd.DataFrame(index=bn.index, columns=range(len(bn.columns) - 1))
+
+    for i, name in enumerate(bn.columns[1:]):
+        values = pd.to_numeric(bn[name], errors="coerce").to_numpy(dtype=float)
+        nn = nn_masks.get(name, np.isinf(values))
+        na = na_masks.get(name, np.isnan(values) & ~nn)
+
+        pretty = np.array([p_pretty_number(v, prec=precision_x) for v in values], dtype=object)
+        pretty[nn] = "NN"
+        pretty[na] = "NA"
+
+        if bn_x == "percentile":
+            cases = all_cases.get(name)
+            if cases is None:
+                # R: cases <- round(size * as.numeric(bn[,i+1]) / 100, digits = 0)
+                cases = np.round(size * np.nan_to_num(values, nan=0.0) / 100).astype(int)
+                cases[nn] = 0
+            pretty = [f"{p} ({c})" for p, c in zip(pretty, cases)]
+
+        tmp.iloc[:, i] = pretty
+
+    return tmp
@@ -1,3 +1,5 @@
+import heapq
+import math
 import multiprocessing
 import warnings
 
@@ -7,12 +9,28 @@ import pandas as pd
 from .nca import nca_analysis
 from .nca_plotly import p_display_plotly
 from .p_constants import EPSILON, P_NO_PEER_LINE
-from .p_peers import p_aggregate_peers
-from .p_utils import p_cluster_cleanup, p_start_cluster
-from .p_validate import p_validate_clean
+from .p_leave_one_out import (
+    P_LOO_BOUNDED,
+    P_LOO_CEILINGS,
+    p_loo_bounds,
+    p_loo_data,
+    p_loo_effect,
+    p_loo_loop_data,
+    p_order_extremes,
+    p_order_scope,
+    p_order_stats,
+)
+from .p_peers import p_aggregate_peers, p_peer_layers
+from .p_scope import p_scope
+from .p_utils import p_cluster_cleanup, p_get_pool, p_seed_sequence, p_start_cluster
+from .p_validate import p_validate_clean, p_validate_corner, p_validate_flipx
 
 HIDDEN = "hidden"
 SHOWN = "shown"
+FOUND = "found"
+
+# Ceilings with the FDH (False) or VRS (True) peers as peers
+P_LAYER_CEILINGS = {"ce_fdh": False, "cr_fdh": False, "ce_vrs": True, "cr_vrs": True}
 
 
 def nca_outliers(
@@ -29,11 +47,9 @@ def nca_outliers(
     max_results=25,
     plotly=False,
     condensed=False,
+    random_state=None,
 ):
 
-    # Cleans up any cluster registration
-    p_cluster_cleanup()
-
     input_ok = p_check_input(x, y, ceiling)
     if input_ok is False:
         return None
@@ -42,53 +58,37 @@ def nca_outliers(
         ceiling = "ce_fdh"
 
     cleaned = p_validate_clean(data, x, y, outliers=True)
-    # In R: data <- as.data.frame(p_validate_clean(data, x, y, TRUE))
-    # p_validate_clean returns list(x=..., y=...)
-    # We need to reconstruct a DataFrame
-    x_data = cleaned["x"]
-    y_data = cleaned["y"]
-
-    if hasattr(x_data, "iloc") and x_data.ndim > 1:
-        x_vals = x_data.iloc[:, 0]
-    else:
-        x_vals = x_data
-
-    if hasattr(y_data, "iloc") and y_data.ndim > 1:
-        y_vals = y_data.iloc[:, 0]
-    else:
-        y_vals = y_data
-
-    data = pd.DataFrame({x: x_vals, y: y_vals})
-    # x and y are column names now
+    data = p_outlier_data(cleaned, x, y)
 
+    # Every analysis of the data with outliers removed draws the same streams
+    seed = p_seed_sequence(random_state)
     model = nca_analysis(
-        data, x, y, ceilings=ceiling, corner=corner, flip_x=flip_x, flip_y=flip_y, scope=scope
+        data,
+        x,
+        y,
+        ceilings=ceiling,
+        corner=corner,
+        flip_x=flip_x,
+        flip_y=flip_y,
+        scope=scope,
+        random_state=seed,
     )
 
-    # model['summaries'] is a dict keyed by x name.
-    # In R: model$summaries[[1]]
-    # We assume x is the key.
-    summary = model["summaries"][x]
-    # eff_or = summary['params'][1] # 2nd element in R (1-based) -> index 1 in Python
-    # summary['params'] is a DataFrame. Row "Effect size" is index 1.
-    # We assume single ceiling, so column 0.
-    eff_or = summary["params"].iloc[1, 0]
-    global_scope = summary["global"]
-
-    params = {
-        "model": model,
-        "x": x,
-        "y": y,
-        "ceiling": ceiling,
-        "corner": corner,
-        "flip_x": flip_x,
-        "flip_y": flip_y,
-        "scope": scope,
-        "eff_or": eff_or,
-        "global": global_scope,
-        "min_dif": min_dif,
-        "peers": p_aggregate_peers(model["peers"], x),
-    }
+    params = p_outlier_params(
+        data,
+        model,
+        x,
+        y,
+        ceiling,
+        corner,
+        flip_x,
+        flip_y,
+        scope,
+        min_dif,
+        max_results,
+        condensed,
+        seed,
+    )
 
     org_outliers = p_get_outliers(data, params, 1)
     if k == 1 and org_outliers is None:
@@ -136,6 +136,220 @@ def nca_outliers(
     return p_format_outliers(outliers, max_results, k, min_dif, condensed)
 
 
+def nca_outliers_batch(
+    data,
+    x,
+    y,
+    ceilings=None,
+    corner=None,
+    flip_x=False,
+    flip_y=False,
+    scope=None,
+    k=1,
+    min_dif=1e-2,
+    max_results=25,
+    condensed=False,
+    random_state=None,
+):
+    """Outliers for several conditions and ceilings in one table.
+
+    The data is cleaned and analysed once for all conditions and ceilings,
+    and all evaluations share one worker pool. Every (condition, ceiling)
+    pair gives the same outliers as a separate nca_outliers call.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Data with the conditions and the outcome.
+    x : str or list of str
+        Conditions to screen.
+    y : str
+        Outcome.
+    ceilings : str or list of str, optional
+        Ceilings to screen, defaults to ce_fdh.
+    corner, flip_x, flip_y, scope :
+        As in nca_analysis, per condition or for all conditions.
+    k, min_dif, max_results, condensed, random_state :
+        As in nca_outliers, for every (condition, ceiling) pair.
+
+    Returns
+    -------
+    pandas.DataFrame or None
+        The nca_outliers tables, preceded by the condition and
+        ceiling_technique columns, or None when no outliers were identified.
+    """
+    x = [x] if isinstance(x, str) else list(x)
+    if ceilings is None:
+        ceilings = ["ce_fdh"]
+    elif isinstance(ceilings, str):
+        ceilings = [ceilings]
+    ceilings = [c for c in ceilings if p_check_input(x[0], y, c)]
+    if not ceilings:
+        return None
+
+    corners = p_validate_corner(x, corner) if corner is not None else [None] * len(x)
+    flips_x = p_validate_flipx(x, flip_x)
+    scopes = p_scope(x, scope)
+
+    cleaned = p_validate_clean(data, x, y, outliers=True)
+    seed = p_seed_sequence(random_state)
+    model = nca_analysis(
+        data,
+        x,
+        y,
+        ceilings=ceilings,
+        corner=corner,
+        flip_x=flip_x,
+        flip_y=flip_y,
+        scope=scope,
+        random_state=seed,
+    )
+
+    # Ceilings without a leave-one-out engine are evaluated on the pool,
+    # about one evaluation per row for every condition
+    reanalysis = any(c not in P_LOO_CEILINGS for c in ceilings)
+    condition = reanalysis and len(data) * len(x) > 250
+    owned_pool = p_start_cluster(multiprocessing.cpu_count() > 2 and condition)
+
+    tables = []
+    try:
+        for i, x_name in enumerate(x):
+            x_data = p_outlier_data(cleaned, x_name, y)
+            for ceiling in ceilings:
+                pair_model = p_outlier_model(model, x_name, ceiling)
+                # Reanalyses of one condition draw the streams of condition i
+                x_seed = np.random.SeedSequence(
+                    seed.entropy, spawn_key=seed.spawn_key, n_children_spawned=i
+                )
+                params = p_outlier_params(
+                    x_data,
+                    pair_model,
+                    x_name,
+                    y,
+                    ceiling,
+                    corners[i],
+                    flips_x[i],
+                    flip_y,
+                    scopes[i],
+                    min_dif,
+                    max_results,
+                    condensed,
+                    x_seed,
+                )
+
+                outliers = p_find_outliers(x_data, params, k)
+                if outliers is None:
+                    continue
+
+                outliers.insert(0, "ceiling_technique", ceiling)
+                outliers.insert(0, "condition", x_name)
+                tables.append(outliers)
+    finally:
+        p_cluster_cleanup(owned_pool)
+
+    if not tables:
+        print("\nNo outliers identified")
+        return None
+
+    return pd.concat(tables, ignore_index=True)
+
+
+def p_outlier_data(cleaned, x, y):
+    """Data frame with the cleaned x and y columns of the outlier detection."""
+    x_data = cleaned["x"]
+    y_data = cleaned["y"]
+
+    if hasattr(x_data, "iloc") and x_data.ndim > 1:
+        x_vals = x_data[x] if x in x_data.columns else x_data.iloc[:, 0]
+    else:
+        x_vals = x_data
+
+    if hasattr(y_data, "iloc") and y_data.ndim > 1:
+        y_vals = y_data.iloc[:, 0]
+    else:
+        y_vals = y_data
+
+    return pd.DataFrame({x: x_vals, y: y_vals})
+
+
+def p_outlier_model(model, x, ceiling):
+    """The parts of a multi condition, multi ceiling model for one pair."""
+    summary = dict(model["summaries"][x])
+    summary["params"] = summary["params"][[ceiling]]
+    return {
+        "summaries": {x: summary},
+        "peers": {ceiling: model["peers"][ceiling]},
+        "plots": {x: model["plots"][x]},
+    }
+
+
+def p_outlier_params(
+    data,
+    model,
+    x,
+    y,
+    ceiling,
+    corner,
+    flip_x,
+    flip_y,
+    scope,
+    min_dif,
+    max_results,
+    condensed,
+    seed=None,
+):
+    summary = model["summaries"][x]
+    # summary['params'] is a DataFrame. Row "Effect size" is index 1.
+    # We assume single ceiling, so column 0.
+    eff_or = summary["params"].iloc[1, 0]
+    global_scope = summary["global"]
+
+    params = {
+        "model": model,
+        "x": x,
+        "y": y,
+        "ceiling": ceiling,
+        "corner": corner,
+        "flip_x": flip_x,
+        "flip_y": flip_y,
+        "scope": scope,
+        "eff_or": eff_or,
+        "global": global_scope,
+        "min_dif": min_dif,
+        "max_results": max_results,
+        "condensed": condensed,
+        "peers": p_aggregate_peers(model["peers"], x),
+        "seed": seed,
+    }
+    # Cached frontier for the effect of removing observations
+    params["loo"] = p_loo_data(data, params)
+
+    # Order statistics of X and Y for the scope outliers
+    if params["loo"] is not None:
+        params["scope_stats"] = params["loo"]
+    else:
+        params["scope_stats"] = p_order_stats(p_loo_loop_data(data, params)[0])
+    params["scope_emp"] = p_order_scope(params["scope_stats"], [])
+    return params
+
+
+def p_find_outliers(data, params, k):
+    """Formatted outliers of up to k observations, None without outliers."""
+    max_results = params["max_results"]
+    min_dif = params["min_dif"]
+    condensed = params["condensed"]
+
+    org_outliers = p_get_outliers(data, params, 1)
+    if k == 1:
+        outliers = p_format_outliers(org_outliers, max_results, 1, min_dif, condensed)
+        if outliers is None:
+            return None
+        return outliers.iloc[: min(len(outliers), max_results)]
+
+    outliers = p_get_outliers(data, params, k, org_outliers)
+    return p_format_outliers(outliers, max_results, k, min_dif, condensed)
+
+
 def p_check_input(x, y, ceiling):
     # x and y are strings (column names)
     if not isinstance(x, str):
@@ -175,62 +389,19 @@ def p_get_outliers(data, params, k, org_outliers=None):
         k = len(data)
         warnings.warn(f"Reduced k to {len(data)}", stacklevel=2)
 
-    combos = p_get_combos(data, params, k)
+    # Only the top max_results sets can be shown. All single outliers are
+    # kept, they order the names of the sets and are all plotted
+    bounded = k > 1 and not params["condensed"]
+    top = p_new_top(params["max_results"] if bounded else None)
 
-    # Start a cluster if needed
-    # condition <- detectCores() > 2 && nrow(combos) > 250
-    condition = multiprocessing.cpu_count() > 2 and len(combos) > 250
-    p_start_cluster(condition)
-
-    if condition:
-        print(f"Starting the analysis on {multiprocessing.cpu_count()} cores")
-
-    # Parallel execution logic
-    # In Python, we can use multiprocessing.Pool
-    # But we need to pass function and args.
-    # p_get_outlier needs data, combo, params, k.
-
-    # We need to prepare arguments for map
-    # args = [(data, combos[i], params, k) for i in range(len(combos))]
-
-    # However, passing 'data' (DataFrame) to every process might be slow if large.
-    # But R does it (copy-on-write or serialization).
-
-    # We'll implement sequential for now to ensure correctness,
-    # or use the pool if p_start_cluster set it up.
-    # But p_start_cluster in p_utils sets a global _pool.
-    # We need to access it.
-    from .p_utils import _pool
-
-    outliers_list = []
-
-    if condition and _pool:
-        # Parallel
-        # We need a wrapper function for map because map takes one arg
-        # Or use starmap
-        args = [(data, combos[i], params, k) for i in range(len(combos))]
-
-        # Progress bar logic is hard with simple map.
-        # We'll skip the progress dots for now or implement a callback.
-
-        results = _pool.starmap(p_get_outlier_wrapper, args)
-        outliers_list = [r for r in results if r is not None]
-
-        print(f"\rDone{' ' * 50}\n")
+    # Search the k > 1 sets with pruning when the effects have bounds
+    if k > 1 and params.get("loo") is not None and params["loo"]["ceiling"] in P_LOO_BOUNDED:
+        names = p_get_all_candidates(data, params, k)
+        p_search_outliers(data, names, params, k, org_outliers, top)
     else:
-        # Sequential
-        ids = list(range(0, len(combos), max(1, round(len(combos) / 50))))
-        for idx, combo in enumerate(combos):
-            if condition and idx in ids:
-                print(".", end="", flush=True)
-
-            res = p_get_outlier(data, combo, params, k)
-            if res is not None:
-                outliers_list.append(res)
-
-        if condition:
-            print(f"\rDone{' ' * 50}\n")
+        p_evaluate_combos(data, p_get_combos(data, params, k), params, k, top)
 
+    outliers_list = p_top_outliers(top)
     if not outliers_list:
         return org_outliers
 
@@ -252,80 +423,269 @@ def p_get_outliers(data, params, k, org_outliers=None):
     # outlier[1] <- p_get_names(unlist(tmp), k)$outliers
 
     if org_outliers is not None:
-        # We need to process outliers to reorder names
-        # This seems complex to port exactly without exact data structures.
-        # Let's try.
-
-        # We need to iterate over current outliers and use org_outliers to sort combo elements.
-        # org_outliers is a DataFrame.
-
-        new_outliers_list = []
-        for idx, outlier in outliers.iterrows():
-            old_combo = outlier["combo"]  # This is a list/array of names
-
-            # We need to find dif.rel for each element in old_combo from org_outliers
-            # org_outliers has 'combo' column which is a list of 1 element (since k=1 for org_outliers)
-            # or just the name?
-            # p_get_outlier returns 'combo' as the list of dropped rows.
-            # For k=1, it's a list of 1.
-
-            # Helper to get dif_rel for a single name n
-            def get_dif_rel(n):
-                # Find row in org_outliers where combo contains n
-                # org_outliers['combo'] is a column of lists/arrays
-                # We assume org_outliers was created with k=1, so combo is [n]
-
-                # We can create a map for speed
-                # But let's just search
-                match = org_outliers[org_outliers["combo"].apply(lambda x: x[0] == n)]
-                if not match.empty:
-                    return abs(match.iloc[0]["dif_rel"])
-                return 0
-
-            ord_vals = [get_dif_rel(n) for n in old_combo]
-            # Sort old_combo based on ord_vals descending
-            # zip, sort, unzip
-            sorted_combo = [
-                x
-                for _, x in sorted(zip(ord_vals, old_combo), key=lambda pair: pair[0], reverse=True)
-            ]
-
-            # Update name
-            outlier["outliers"] = p_get_names(sorted_combo, k)["outliers"]
-            new_outliers_list.append(outlier)
-
-        outliers = pd.DataFrame(new_outliers_list)
-
-    p_cluster_cleanup()
+        outliers["outliers"] = p_order_names(outliers, org_outliers)
+        outliers = pd.concat([org_outliers, outliers], ignore_index=True)
+        top["count"] += len(org_outliers)
 
-    if org_outliers is not None:
-        return pd.concat([org_outliers, outliers], ignore_index=True)
+    # Rows found, also the ones that did not make the top
+    outliers.attrs[FOUND] = top["count"]
     return outliers
 
 
-def p_get_outlier_wrapper(data, combo, params, k):
-    return p_get_outlier(data, combo, params, k)
+def p_order_names(outliers, org_outliers):
+    """Names of the combos, ordered on the single outlier |dif_rel| of the rows.
+
+    Rows without a single outlier rank last, ties keep the order of combo.
+    """
+    dif_rel = {}
+    for combo, value in zip(org_outliers["combo"], org_outliers["dif_rel"].abs()):
+        dif_rel.setdefault(combo[0], value)
+
+    names = outliers["combo"].explode()
+    rows = names.index.to_numpy()
+    ranks = names.map(dif_rel).fillna(0).to_numpy(dtype=float)
+
+    order = np.lexsort((-ranks, rows))
+    names = pd.Series(names.to_numpy()[order], index=rows[order]).astype(str)
+    return names.groupby(level=0, sort=False).agg(" - ".join)
+
+
+def p_evaluate_combos(data, combos, params, k, top):
+    # Start a cluster if needed
+    # condition <- detectCores() > 2 && nrow(combos) > 250
+    # Leave-one-out effects are cheaper than sending the data to the workers
+    parallel = params.get("loo") is None
+    condition = parallel and multiprocessing.cpu_count() > 2 and len(combos) > 250
+    owned_pool = p_start_cluster(condition)
+    pool = p_get_pool() if parallel else None
+
+    if condition:
+        print(f"Starting the analysis on {multiprocessing.cpu_count()} cores")
+
+    try:
+        if pool is not None:
+            # Also reuses a pool started by the caller. The analyses in the
+            # workers never see the pool, p_get_pool ignores inherited copies.
+            # The results stream back in order and go straight into the top
+            args = ((data, combo, params, k) for combo in combos)
+            chunksize = max(1, len(combos) // (4 * multiprocessing.cpu_count()))
+            results = pool.imap(p_get_outlier_wrapper, args, chunksize=chunksize)
+            for idx, res in enumerate(results):
+                p_push_outlier(top, res, (idx,))
+
+            if condition:
+                print(f"\rDone{' ' * 50}\n")
+        else:
+            # Sequential
+            ids = list(range(0, len(combos), max(1, round(len(combos) / 50))))
+            for idx, combo in enumerate(combos):
+                if condition and idx in ids:
+                    print(".", end="", flush=True)
+
+                p_push_outlier(top, p_get_outlier(data, combo, params, k), (idx,))
+
+            if condition:
+                print(f"\rDone{' ' * 50}\n")
+    finally:
+        p_cluster_cleanup(owned_pool)
+
+
+def p_new_top(max_results=None):
+    """Collection of the max_results best outliers, or of all outliers if None."""
+    return {"heap": [], "count": 0, "max_results": max_results}
+
+
+def p_push_outlier(top, outlier, order):
+    """Add an outlier (or None) to the top.
+
+    The top is a min-heap on the sort of p_format_outliers: |dif_rel|,
+    |dif_abs|, then fewer names. Equal outliers keep the one first in
+    order, a tuple of positions that is unique per outlier.
+    """
+    if outlier is None:
+        return
+    top["count"] += 1
+
+    key = (
+        abs(outlier["dif_rel"]),
+        abs(outlier["dif_abs"]),
+        -len(outlier["combo"]),
+        tuple(-pos for pos in order),
+    )
+    heapq.heappush(top["heap"], (key, outlier))
+    if top["max_results"] is not None and len(top["heap"]) > top["max_results"]:
+        heapq.heappop(top["heap"])
+
+
+def p_top_outliers(top):
+    """The outliers of the top, in order."""
+    entries = sorted(top["heap"], key=lambda entry: tuple(-pos for pos in entry[0][3]))
+    return [outlier for _, outlier in entries]
+
+
+def p_search_outliers(data, names, params, k, org_outliers, top):
+    """Depth-first search for the sets of 2 to k names with pruning.
+
+    A subtree is skipped when the bounds on its effect sizes can not reach
+    min_dif, or (unless condensed) can not reach the top max_results. The
+    results go into top in the order of p_get_combos; the sets of a subtree
+    pruned on the top max_results are still counted as found (hidden).
+    """
+    # The max_results largest |dif_rel| found so far, including the k = 1 results
+    largest = []
+    if org_outliers is not None:
+        for dif_rel in org_outliers["dif_rel"].abs():
+            p_push_top(largest, dif_rel, params["max_results"])
+
+    # Visit the strongest single outliers first, so the top fills up early
+    single = {}
+    if org_outliers is not None:
+        single = dict(zip(org_outliers["outliers"], org_outliers["dif_rel"].abs()))
+    order = sorted(range(len(names)), key=lambda i: -single.get(names[i], 0))
+    names = [names[i] for i in order]
+
+    def search(start, combo):
+        for i in range(start, len(names)):
+            new_combo = combo + [i]
+            if len(new_combo) > 1:
+                outlier = p_get_outlier(data, [names[j] for j in new_combo], params, k)
+                if outlier is not None:
+                    # Larger sets first, like the padded combinations
+                    positions = sorted(order[j] for j in new_combo)
+                    p_push_outlier(top, outlier, (-len(positions), *positions))
+                    p_push_top(largest, abs(outlier["dif_rel"]), params["max_results"])
+
+            if len(new_combo) < k and i + 1 < len(names):
+                if not prune(new_combo, i + 1):
+                    search(i + 1, new_combo)
+
+    def difs(combo, start):
+        """Lowest and highest |dif_rel| of the sets that extend combo with names[start:]."""
+        eff_lo, eff_hi = p_loo_bounds(
+            params["loo"], [names[j] for j in combo], names[start:], k - len(combo)
+        )
+        ends = [abs(p_get_difs(eff, params["eff_or"])[1]) for eff in [eff_lo, eff_hi]]
+        inside = np.isnan(eff_lo) or eff_lo <= params["eff_or"] <= eff_hi
+        return 0 if inside else min(ends), max(ends)
+
+    def prune(combo, start):
+        lowest, highest = difs(combo, start)
+        if round(highest, 2) < params["min_dif"]:
+            return True
+        full = len(largest) >= params["max_results"]
+        if params["condensed"] or not full or highest >= largest[0]:
+            return False
+
+        top["count"] += found(combo, start, lowest, highest)
+        return True
+
+    def found(combo, start, lowest, highest):
+        """Number of the sets that extend combo with names[start:] and reach min_dif."""
+        if round(highest, 2) < params["min_dif"]:
+            return 0
+        if round(lowest, 2) >= params["min_dif"]:
+            return sum(math.comb(len(names) - start, r) for r in range(1, k - len(combo) + 1))
+
+        count = 0
+        for i in range(start, len(names)):
+            new_combo = combo + [i]
+            if p_get_outlier(data, [names[j] for j in new_combo], params, k) is not None:
+                count += 1
+            if len(new_combo) < k and i + 1 < len(names):
+                count += found(new_combo, i + 1, *difs(new_combo, i + 1))
+        return count
+
+    search(0, [])
+
+
+def p_push_top(top, value, max_results):
+    heapq.heappush(top, value)
+    if len(top) > max_results:
+        heapq.heappop(top)
+
+
+def p_get_outlier_wrapper(args):
+    return p_get_outlier(*args)
 
 
 def p_get_all_names(data, peers, global_scope, params, k):
-    """Get all potential outlier names from peers.
+    """Get all potential outlier names from peers and the scope extremes.
 
-    Note: data, global_scope, and k are kept for API compatibility with R version
-    but not currently used in the simplified implementation.
+    Note: data and global_scope are kept for API compatibility with R version,
+    the scope extremes come from the order statistics of the full data.
     """
-    _ = (data, global_scope, params, k)  # Mark as intentionally unused
-    all_names = list(peers.index)
-    return all_names
+    _ = (data, global_scope)  # Mark as intentionally unused
+
+    # C-LP has no peers, like rownames(NULL) in R
+    names = [] if peers is None else list(peers.index)
+    all_names = names + p_scope_names(params, k)
+    return list(dict.fromkeys(all_names))
+
+
+def p_scope_names(params, k):
+    """Names of the rows of which removing at most k changes the empirical scope."""
+    stats = params["scope_stats"]
+    return list(stats["index"][p_order_extremes(stats, k)])
 
 
 def p_get_combos(data, params, k):
+    ceiling = params["ceiling"]
+    if isinstance(ceiling, list):
+        ceiling = ceiling[0]
+
     # For COLS and QR we need all the points
-    if params["ceiling"][0] in P_NO_PEER_LINE:  # params['ceiling'] is a list?
+    if ceiling in P_NO_PEER_LINE:
         # return(t(combn(rownames(data), k)))
         from itertools import combinations
 
         return list(combinations(data.index, k))
 
+    all_names = p_get_all_candidates(data, params, k)
+    if k == 1:
+        # return (matrix(all.names, ncol = 1))
+        return [[n] for n in all_names]
+
+    # combos <- NULL
+    # counter <- k
+    # while (counter > 1) ...
+    # This logic generates combinations of size k from all_names,
+    # but also combinations of size < k padded with NA?
+    # R: tmp <- cbind(tmp, matrix(NA, ncol = k - counter, nrow = nrow(tmp)))
+    # This suggests we look for outliers of size k, k-1, ... 2?
+    # But the loop goes counter > 1.
+
+    combos = []
+    from itertools import combinations
+
+    counter = k
+    while counter > 1:
+        tmp = list(combinations(all_names, counter))
+        # Pad with None
+        padded = [list(c) + [None] * (k - counter) for c in tmp]
+        combos.extend(padded)
+        counter -= 1
+
+    return combos
+
+
+def p_get_all_candidates(data, params, k):
+    """Names of the peers of the first k peer layers."""
+    ceiling = params["ceiling"]
+    if isinstance(ceiling, list):
+        ceiling = ceiling[0]
+
+    # Label all layers at once instead of an analysis per layer
+    if ceiling in P_LAYER_CEILINGS:
+        loop_data, _ = p_loo_loop_data(data, params)
+        layers = p_peer_layers(loop_data, k, vrs=P_LAYER_CEILINGS[ceiling])
+
+        # By layer, and within a layer in the order of p_peers
+        u = loop_data["x"].to_numpy(dtype=float) * (-1 if loop_data["flip_x"] else 1)
+        v = loop_data["y"].to_numpy(dtype=float) * (-1 if loop_data["flip_y"] else 1)
+        order = np.lexsort((v, u, layers.to_numpy()))
+        names = [name for name in layers.index[order] if layers[name] <= k]
+        return list(dict.fromkeys(names + p_scope_names(params, k)))
+
     # all.names <- p_get_all_names(...)
     all_names = p_get_all_names(data, params["peers"], params["global"], params, k)
 
@@ -343,72 +703,39 @@ def p_get_combos(data, params, k):
             flip_x=params["flip_x"],
             flip_y=params["flip_y"],
             scope=params["scope"],
+            random_state=params.get("seed"),
         )
 
         global_scope = model["summaries"][params["x"]]["global"]
         # all.names <- c(all.names, p_get_all_names(...))
         new_names = p_get_all_names(
-            data, p_aggregate_peers(model["peers"], 1), global_scope, params, k
+            data, p_aggregate_peers(model["peers"], params["x"]), global_scope, params, k
         )
         all_names.extend(new_names)
 
         counter -= 1
 
-    all_names = list(set(all_names))  # unique
-    if k == 1:
-        # return (matrix(all.names, ncol = 1))
-        return [[n] for n in all_names]
-
-    # combos <- NULL
-    # counter <- k
-    # while (counter > 1) ...
-    # This logic generates combinations of size k from all_names,
-    # but also combinations of size < k padded with NA?
-    # R: tmp <- cbind(tmp, matrix(NA, ncol = k - counter, nrow = nrow(tmp)))
-    # This suggests we look for outliers of size k, k-1, ... 2?
-    # But the loop goes counter > 1.
-
-    combos = []
-    from itertools import combinations
-
-    counter = k
-    while counter > 1:
-        tmp = list(combinations(all_names, counter))
-        # Pad with None
-        padded = [list(c) + [None] * (k - counter) for c in tmp]
-        combos.extend(padded)
-        counter -= 1
-
-    return combos
+    # unique, in order of the layers
+    return list(dict.fromkeys(all_names))
 
 
 def p_get_outlier(data, combo, params, k):
     # combo is a list/tuple
     combo = [c for c in combo if c is not None]
-    # data.new <- data[-(which(rownames(data) %in% combo)),]
-    data_new = data.drop(combo, errors="ignore")
 
-    values = p_get_values(data_new, params)
-    eff_nw, dif_abs, dif_rel, global_new = values
+    if params.get("loo") is not None:
+        eff_nw, scope_new = p_loo_effect(params["loo"], combo)
+        dif_abs, dif_rel = p_get_difs(eff_nw, params["eff_or"])
+    else:
+        # data.new <- data[-(which(rownames(data) %in% combo)),]
+        data_new = data.drop(combo, errors="ignore")
+        eff_nw, dif_abs, dif_rel, scope_new = p_get_values(data_new, params)
 
     if round(abs(dif_rel), 2) < params["min_dif"]:
         return None
 
-    zone_scope = p_zone_scope(combo, params, global_new)
-    zone, scope = zone_scope
-
-    # Extra check: 'ceiling' outliers must be on COLS and C_LP lines
-    # if (all(k == 1, params$ceiling[1] %in% c("cols", "c_lp"), scope == ""))
-    ceiling_type = params["ceiling"]
-    if isinstance(ceiling_type, list):
-        ceiling_type = ceiling_type[0]
-
-    if k == 1 and ceiling_type in ["cols", "c_lp"] and scope == "":
-        # line <- params$model$plots[[1]]$lines[[1]]
-        # We need to access the line parameters from the plot object or summary.
-        # In Python nca_analysis returns plots dict.
-        # We need to know structure of plot object.
-        pass  # Placeholder
+    zone_scope = p_zone_scope(combo, params, scope_new)
+    zone, scope, scope_shrink = zone_scope
 
     names = p_get_names(combo, k)
     result = {
@@ -419,6 +746,7 @@ def p_get_outlier(data, combo, params, k):
         "dif_rel": dif_rel,
         "ceiling": zone,
         "scope": scope,
+        "scope_shrink": scope_shrink,
         "combo": combo,
     }
     return result
@@ -434,29 +762,39 @@ def p_get_values(data_new, params):
         flip_x=params["flip_x"],
         flip_y=params["flip_y"],
         scope=params["scope"],
+        random_state=params.get("seed"),
     )
 
     # eff.nw <- model.new$summaries[[1]]$params[2]
     # summary['params'] is a DataFrame. Row "Effect size" is index 1.
     eff_nw = model_new["summaries"][params["x"]]["params"].iloc[1, 0]
+    dif_abs, dif_rel = p_get_difs(eff_nw, params["eff_or"])
+
+    # Empirical scope: x min, x max, y min, y max
+    scope_new = list(model_new["summaries"][params["x"]]["global"].iloc[2:6, 0])
+    return [eff_nw, dif_abs, dif_rel, scope_new]
 
-    dif_abs = 0 if eff_nw is None or np.isnan(eff_nw) else eff_nw - params["eff_or"]
+
+def p_get_difs(eff_nw, eff_or):
+    dif_abs = 0 if eff_nw is None or np.isnan(eff_nw) else eff_nw - eff_or
 
     zero_dif_rel = 0 if dif_abs < EPSILON else float("inf")
 
-    if params["eff_or"] < EPSILON:
+    if eff_or < EPSILON:
         dif_rel = zero_dif_rel
     else:
-        dif_rel = 100 * dif_abs / params["eff_or"]
+        dif_rel = 100 * dif_abs / eff_or
 
-    global_new = model_new["summaries"][params["x"]]["global"]
-    return [eff_nw, dif_abs, dif_rel, global_new]
+    return [dif_abs, dif_rel]
 
 
-def p_zone_scope(combo, params, global_new):
-    """Determine if outlier affects ceiling zone and/or scope."""
-    _ = global_new  # Mark as intentionally unused (kept for API compatibility)
-    found_scope = False  # Simplified: scope checking not fully implemented
+def p_zone_scope(combo, params, scope_new):
+    """Determine if outlier affects ceiling zone and/or scope.
+
+    The last element is the percentage by which the empirical scope area shrinks.
+    """
+    found_scope = not np.array_equal(scope_new, params["scope_emp"])
+    scope_shrink = p_scope_shrink(params["scope_emp"], scope_new)
 
     ceiling_type = params["ceiling"]
     if isinstance(ceiling_type, list):
@@ -467,9 +805,18 @@ def p_zone_scope(combo, params, global_new):
     else:
         # found_ceiling <- any(combo %in% rownames(params$peers))
         # params['peers'] is a DataFrame of peers
-        found_ceiling = any(c in params["peers"].index for c in combo)
+        peers = params["peers"]
+        found_ceiling = peers is not None and any(c in peers.index for c in combo)
+
+    return ["X" if found_ceiling else "", "X" if found_scope else "", scope_shrink]
+
 
-    return ["X" if found_ceiling else "", "X" if found_scope else ""]
+def p_scope_shrink(scope_emp, scope_new):
+    emp_area = (scope_emp[1] - scope_emp[0]) * (scope_emp[3] - scope_emp[2])
+    new_area = (scope_new[1] - scope_new[0]) * (scope_new[3] - scope_new[2])
+    if np.isnan(new_area) or emp_area < EPSILON:
+        return 0
+    return 100 * (emp_area - new_area) / emp_area
 
 
 def p_get_names(combo, k):
@@ -505,7 +852,7 @@ def p_format_outliers(outliers, max_results, k, min_dif, condensed):
         by=["abs_dif_rel", "abs_dif_abs", "len"], ascending=[False, False, True]
     )
 
-    org_length = len(outliers)
+    org_length = outliers.attrs.get(FOUND, len(outliers))
 
     if k != 1:
         if len(outliers) > 1 and condensed:
@@ -541,7 +888,10 @@ def p_format_outliers(outliers, max_results, k, min_dif, condensed):
     # outliers[, 5] <- round(outliers[, 5], digits = 1) -> dif.rel
     if "dif_rel" in outliers.columns:
         outliers["dif_rel"] = outliers["dif_rel"].astype(float).round(1)
+    if "scope_shrink" in outliers.columns:
+        outliers["scope_shrink"] = outliers["scope_shrink"].astype(float).round(1)
 
+    outliers.attrs.pop(FOUND, None)
     if org_length > len(outliers):
         outliers.attrs[SHOWN] = len(outliers)
         outliers.attrs[HIDDEN] = org_length - len(outliers)
@@ -5,6 +5,7 @@ from .nca_plotly import p_display_plotly
 from .nca_plots import p_display_plot
 from .nca_summary import p_display_summary
 from .nca_tests import p_display_test
+from .p_bottleneck_table import P_BOTTLENECK_COLUMN_ATTRS
 from .p_peers import p_aggregate_peers
 
 
@@ -79,7 +80,8 @@ def nca_output(
 
             bn[method] = bn_method.iloc[:, cols_to_select]
 
-            atts = ["bn_x", "bn_y", "bn_y_id", "size", "cutoff"]
+            atts = ["bn_x", "bn_x_id", "bn_y", "bn_y_id", "size", "cutoff"]
+            atts += P_BOTTLENECK_COLUMN_ATTRS
             for att in atts:
                 # attr(bn[[method]], att) <- attr(model$bottlenecks[[method]], att)
                 if att in bn_method.attrs:
@@ -1,9 +1,27 @@
+import itertools
 import math
+import multiprocessing
 
 import numpy as np
 import pandas as pd
 
-from .nca import nca_analysis
+from .p_power import P_POWER_PARALLEL, p_power_interval, p_power_task, p_power_tasks
+from .p_power_store import (
+    p_open_power_store,
+    p_read_power_store,
+    p_store_run,
+    p_store_seed,
+    p_stored_cells,
+    p_write_power_store,
+)
+from .p_power_table import (
+    p_design_rows,
+    p_interpolate_power,
+    p_power_se,
+    p_read_power_table,
+    p_write_power_table,
+)
+from .p_utils import p_cluster_cleanup, p_get_pool, p_seed_sequence, p_start_cluster
 
 
 def nca_power(
@@ -16,13 +34,25 @@ def nca_power(
     distribution_y="uniform",
     rep=100,
     test_rep=200,
+    random_state=None,
+    tolerance=None,
+    store=None,
+    checkpoint=None,
 ):
+    """Simulated power of the permutation test, one row per design.
 
+    Notes
+    -----
+    Only CE-FDH and CR-FDH have batched kernels, which simulate and test
+    all repetitions of a cell with array operations. The other ceilings
+    (CE-VRS, CR-VRS, C-LP, QR, ...) run ``p_nca_wrapper`` on every simulated
+    and permuted dataset, which is orders of magnitude slower: a grid of a
+    dozen cells takes minutes instead of seconds. Use ``tolerance`` to stop
+    cells early, and ``checkpoint`` to resume long runs.
+    """
     if n is None:
         n = [20, 50, 100]
 
-    from .nca_random import nca_random
-
     # Ensure inputs are lists/arrays where appropriate or handle scalars
     # R's c() creates a vector. Python list or scalar.
     # We normalize to numpy arrays for iteration.
@@ -38,6 +68,9 @@ def nca_power(
     if np.any(to_array(slope) <= 0):
         print("The slope needs to be larger than 0\n")
         return None
+    if tolerance is not None and not 0 < tolerance < 1:
+        print("The tolerance needs to be larger than 0 and smaller than 1\n")
+        return None
 
     # Make sure we're not doing extra work
     distribution_x = np.unique(to_array(distribution_x))
@@ -47,92 +80,311 @@ def nca_power(
     slope = np.unique(to_array(slope))
     ceiling = np.unique(to_array(ceiling))
 
-    # Calculate the total number of iterations
-    n_iterations = (
-        rep
-        * len(distribution_x)
-        * len(distribution_y)
-        * len(n)
-        * len(effect)
-        * len(slope)
-        * len(ceiling)
-    )
+    # One cell per combination, in the order of the result table
+    cells = []
+    for distr_x, distr_y, ceil, sample_size, effect_loop, slope_loop in itertools.product(
+        distribution_x, distribution_y, ceiling, n, effect, slope
+    ):
+        cells.append(
+            {
+                "n": sample_size,
+                "ES": effect_loop,
+                "slope": slope_loop,
+                "ceiling": ceil,
+                "distr.x": distr_x,
+                "distr.y": distr_y,
+                "intercept": p_intercept(slope_loop, effect_loop),
+            }
+        )
 
-    # Define the variables that will store results
-    results = pd.DataFrame(
-        columns=["n", "ES", "slope", "ceiling", "p", "distr.x", "distr.y", "power"]
-    )
+    results = p_power_grid(cells, p, rep, test_rep, random_state, tolerance, checkpoint=checkpoint)
 
-    # Counter of iterations (single samples)
-    count = 0
-
-    for distr_x in distribution_x:
-        for distr_y in distribution_y:
-            for ceil in ceiling:
-                for sample_size in n:
-                    for effect_loop in effect:
-                        for slope_loop in slope:
-                            intercept = p_intercept(slope_loop, effect_loop)
-
-                            # Initialize vectors to store p-values and power results
-                            pval = np.zeros(rep)
-                            sig_results = np.zeros(rep)
-
-                            for r in range(rep):
-                                count += 1
-                                print(f"\rIteration {count} of {n_iterations}", end="")
-
-                                df = nca_random(
-                                    sample_size,
-                                    intercept,
-                                    slope_loop,
-                                    distribution_x=distr_x,
-                                    distribution_y=distr_y,
-                                )
-
-                                # Get column names from the generated data
-                                x_col = df.columns[0]  # First column is X
-                                y_col = df.columns[-1]  # Last column is Y
-
-                                model = nca_analysis(
-                                    df, x_col, y_col, ceilings=[ceil], test_rep=test_rep, scope=[0, 1, 0, 1]
-                                )
-
-                                # Estimated p-value
-                                # model['summaries']['X']['params'][6] (R 1-based) -> index 5 (Python 0-based)
-                                x_name = x_col
-
-                                try:
-                                    # We need to ensure we access the correct value.
-                                    # In nca_summary.R (to be ported), params is constructed.
-                                    # I will assume index 5 corresponds to p-value.
-                                    p_val = model["summaries"][x_name]["params"][5]
-                                    pval[r] = p_val
-                                    sig_results[r] = p_val <= p
-                                except Exception:
-                                    # If something goes wrong (e.g. no p-value), treat as not significant?
-                                    pval[r] = 1.0
-                                    sig_results[r] = 0
-
-                            # Store the results for this iteration
-                            res_row = pd.DataFrame(
-                                {
-                                    "n": [sample_size],
-                                    "ES": [effect_loop],
-                                    "slope": [slope_loop],
-                                    "ceiling": [ceil],
-                                    "p": [np.mean(pval)],
-                                    "distr.x": [distr_x],
-                                    "distr.y": [distr_y],
-                                    "power": [np.mean(sig_results)],
-                                }
-                            )
-                            results = pd.concat([results, res_row], ignore_index=True)
+    if store is not None:
+        p_write_power_table(store, results, p, test_rep, rep)
 
     print("\n\n")
     return results
 
 
+def nca_sample_size(
+    power=0.80,
+    effect=0.10,
+    slope=1,
+    ceiling="ce_fdh",
+    p=0.05,
+    distribution_x="uniform",
+    distribution_y="uniform",
+    rep=100,
+    test_rep=200,
+    n_min=10,
+    n_max=10000,
+    n_tolerance=0.05,
+    random_state=None,
+):
+    """Smallest sample size that reaches a target power.
+
+    The power of one design is simulated as in ``nca_power``. The search
+    doubles n until the target is reached, then bisects the bracket on a
+    log scale. Every n is simulated with the same random streams, which
+    keeps the simulated power close to monotone in n.
+
+    Parameters
+    ----------
+    power : float
+        Target power, between 0 and 1.
+    effect, slope, ceiling, p, distribution_x, distribution_y, rep, test_rep
+        A single design, as in ``nca_power``.
+    n_min, n_max : int
+        Range of the search.
+    n_tolerance : float
+        The search stops when the bracket is at most this fraction wide,
+        or when it holds two neighbouring sample sizes.
+    random_state : int, optional
+        Seed of the simulations.
+
+    Returns
+    -------
+    dict
+        ``n`` the smallest sample size found with the target power (None if
+        n_max does not reach it), ``power`` its simulated power and
+        ``table`` the simulated sample sizes in the format of ``nca_power``.
+    """
+    if not 0 < power < 1:
+        print("The power needs to be larger than 0 and smaller than 1\n")
+        return None
+    if not 0 < effect < 1:
+        print("The effect size needs to be larger than 0 and smaller than 1\n")
+        return None
+    if slope <= 0:
+        print("The slope needs to be larger than 0\n")
+        return None
+    if not 2 <= n_min < n_max:
+        print("The sample sizes need to satisfy 2 <= n_min < n_max\n")
+        return None
+
+    cell = {
+        "ES": effect,
+        "slope": slope,
+        "ceiling": ceiling,
+        "distr.x": distribution_x,
+        "distr.y": distribution_y,
+        "intercept": p_intercept(slope, effect),
+    }
+
+    # Every n starts from a copy of the same seed sequence
+    sequence = p_seed_sequence(random_state)
+    evaluated = {}
+
+    def simulate(sample_size):
+        if sample_size not in evaluated:
+            row = p_power_grid([dict(cell, n=sample_size)], p, rep, test_rep, sequence, None, False)
+            evaluated[sample_size] = row.iloc[0].to_dict()
+            print(f"\rn = {sample_size}, power {evaluated[sample_size]['power']:.3f}", end="")
+        return evaluated[sample_size]["power"]
+
+    # A single pool for all simulations
+    condition = rep * test_rep > P_POWER_PARALLEL
+    owned_pool = p_start_cluster(multiprocessing.cpu_count() > 1 and condition)
+    try:
+        low, high = None, n_min
+        while simulate(high) < power:
+            if high >= n_max:
+                high = None
+                break
+            low, high = high, min(2 * high, n_max)
+
+        # The target is reached at high and not at low
+        while low is not None and high is not None and high - low > 1:
+            if high / low <= 1 + n_tolerance:
+                break
+
+            middle = min(max(int(round(math.sqrt(low * high))), low + 1), high - 1)
+            if simulate(middle) >= power:
+                high = middle
+            else:
+                low = middle
+    finally:
+        p_cluster_cleanup(owned_pool)
+
+    print("\n\n")
+    if high is None:
+        print(f"No sample size up to {n_max} reaches a power of {power}\n")
+
+    table = pd.DataFrame(
+        [evaluated[sample_size] for sample_size in sorted(evaluated)],
+        columns=["n", "ES", "slope", "ceiling", "p", "distr.x", "distr.y", "power"],
+    )
+    return {
+        "n": high,
+        "power": None if high is None else evaluated[high]["power"],
+        "table": table,
+    }
+
+
+def nca_power_lookup(
+    store,
+    n,
+    effect=0.10,
+    slope=1,
+    ceiling="ce_fdh",
+    p=0.05,
+    distribution_x="uniform",
+    distribution_y="uniform",
+    test_rep=200,
+    max_se=0.05,
+    rep=100,
+    random_state=None,
+):
+    """Power of one design from a power table, simulated only when needed.
+
+    The table is a CSV file that ``nca_power(..., store=path)`` fills. Points
+    that are not in the table are interpolated from the tabulated points of
+    the same design (ceiling, distributions, slope, p and test_rep), using
+    that the power grows with n and with the effect size.
+
+    Parameters
+    ----------
+    store : str
+        Path of the power table.
+    n, effect : int or list, float or list
+        Sample sizes and effect sizes to look up, all combinations.
+    slope, ceiling, p, distribution_x, distribution_y, test_rep
+        The design, as in ``nca_power``.
+    max_se : float
+        Points with a larger standard error are simulated with rep
+        repetitions, and added to the table.
+    rep : int
+        Repetitions of a simulated point.
+    random_state : int, optional
+        Seed of the simulations.
+
+    Returns
+    -------
+    DataFrame
+        The design columns of ``nca_power`` and the power, with its standard
+        error ``se`` and ``source``: table, interpolated or simulated.
+    """
+    effects = np.atleast_1d(effect)
+    if np.any(effects <= 0) or np.any(effects >= 1):
+        print("The effect size needs to be larger than 0 and smaller than 1\n")
+        return None
+    if slope <= 0:
+        print("The slope needs to be larger than 0\n")
+        return None
+
+    design = {
+        "slope": slope,
+        "ceiling": ceiling,
+        "distr.x": distribution_x,
+        "distr.y": distribution_y,
+    }
+    table = p_read_power_table(store)
+    points = p_design_rows(table, ceiling, distribution_x, distribution_y, slope, p, test_rep)
+
+    rows = []
+    cells = []
+    for sample_size, effect_size in itertools.product(np.atleast_1d(n), effects):
+        power, se, source = p_interpolate_power(points, sample_size, effect_size)
+        rows.append(dict(design, n=sample_size, ES=effect_size, power=power, se=se, source=source))
+        if se > max_se:
+            intercept = p_intercept(slope, effect_size)
+            cells.append(dict(design, n=sample_size, ES=effect_size, intercept=intercept))
+
+    # The uncertain points are simulated together, and stored for later lookups
+    if len(cells) > 0:
+        simulated = p_power_grid(cells, p, rep, test_rep, random_state)
+        p_write_power_table(store, simulated, p, test_rep, rep)
+        print("\n\n")
+
+        simulated = simulated.set_index(["n", "ES"])["power"]
+        for row in rows:
+            if row["se"] > max_se:
+                power = simulated.loc[(row["n"], row["ES"])]
+                row.update(power=power, se=p_power_se(power, rep), source="simulated")
+
+    columns = ["n", "ES", "slope", "ceiling", "distr.x", "distr.y", "power", "se", "source"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def p_power_grid(
+    cells, p, rep, test_rep, random_state=None, tolerance=None, progress=True, checkpoint=None
+):
+    """Simulate the power of the cells, one row per cell in the given order.
+
+    With a checkpoint every completed cell is stored, and the cells that a
+    run with the same settings and seed completed are read back instead.
+    """
+    sequence = p_seed_sequence(random_state)
+    rows = [None] * len(cells)
+    if checkpoint is not None:
+        store = p_open_power_store(checkpoint)
+        stored = p_read_power_store(store)
+        run = p_store_run(rep, test_rep, p, tolerance, sequence)
+        if random_state is None and p_store_seed(stored, run) is not None:
+            sequence = p_store_seed(stored, run)
+            run = p_store_run(rep, test_rep, p, tolerance, sequence)
+
+        for cell_index, row in p_stored_cells(stored, run, cells).items():
+            rows[cell_index] = dict(cells[cell_index], **row)
+
+    # Blocks of repetitions with their own random streams, the results do
+    # not depend on the number of workers. Cells are seeded by their index,
+    # so skipping the stored cells leaves the streams of the others intact.
+    seeds = sequence.spawn(len(cells))
+    sequential = tolerance is not None
+    blocks = [[] for _ in cells]
+    open_cells = [cell_index for cell_index in range(len(cells)) if rows[cell_index] is None]
+
+    condition = len(cells) * rep * test_rep > P_POWER_PARALLEL
+    owned_pool = p_start_cluster(multiprocessing.cpu_count() > 1 and condition)
+    pool = p_get_pool()
+
+    try:
+        # Fixed runs take all blocks at once, sequential runs add one block
+        # per open cell until its interval is narrow enough
+        while open_cells:
+            tasks = p_power_tasks(cells, seeds, blocks, open_cells, rep, test_rep, sequential)
+            waiting = dict.fromkeys(open_cells, 0)
+            for task in tasks:
+                waiting[task[0]] += 1
+
+            if pool is not None:
+                results = pool.imap_unordered(p_power_task, tasks)
+            else:
+                results = map(p_power_task, tasks)
+
+            # Cells are aggregated as soon as all of their blocks are in
+            for cell_index, block_index, pval in results:
+                blocks[cell_index].append((block_index, pval))
+                waiting[cell_index] -= 1
+                if waiting[cell_index] > 0:
+                    continue
+
+                pval = np.concatenate([values for _, values in sorted(blocks[cell_index])])
+                significant = np.sum(pval <= p)
+                lower, upper = p_power_interval(significant, len(pval))
+                if sequential and len(pval) < rep and upper - lower > tolerance:
+                    continue
+
+                power = significant / len(pval)
+                rows[cell_index] = dict(cells[cell_index], p=np.mean(pval), power=power)
+                if sequential:
+                    interval = {"rep": len(pval), "ci.lower": lower, "ci.upper": upper}
+                    rows[cell_index].update(interval)
+                if checkpoint is not None:
+                    p_write_power_store(store, cell_index, rows[cell_index], run)
+                open_cells.remove(cell_index)
+                if progress:
+                    print(f"\rCell {len(cells) - len(open_cells)} of {len(cells)}", end="")
+    finally:
+        p_cluster_cleanup(owned_pool)
+
+    columns = ["n", "ES", "slope", "ceiling", "p", "distr.x", "distr.y", "power"]
+    if sequential:
+        columns += ["rep", "ci.lower", "ci.upper"]
+    return pd.DataFrame(rows, columns=columns)
+
+
 def p_intercept(slope, effect):
     # Assume intercept >= 0, line through roof, y on x == 0 should be >= 1
     intercept = 1 - math.sqrt(2 * effect * slope)
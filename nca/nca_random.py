@@ -1,6 +1,11 @@
+import json
+import os
+
 import numpy as np
 import pandas as pd
-from scipy.stats import truncnorm
+from scipy.special import ndtr, ndtri
+
+from .p_utils import p_seed_sequence
 
 p_errors = {
     "n": "n should be an integer > 1!",
@@ -11,6 +16,11 @@ p_errors = {
     "distribution": "The distribution types need to be 'uniform' or 'normal'!",
 }
 
+# Largest number of candidate rows drawn at once
+P_SAMPLE_BLOCK = 1_000_000
+
+P_FILE_FORMATS = [".npy", ".parquet"]
+
 
 def nca_random(
     n,
@@ -23,6 +33,7 @@ def nca_random(
     mean_y=0.5,
     sd_x=0.2,
     sd_y=0.2,
+    random_state=None,
 ):
 
     # Validate inputs
@@ -34,75 +45,252 @@ def nca_random(
     if error is not None:
         raise ValueError(p_errors[error])
 
-    # Prepare data structure
-    cols = []
-    if len(slopes) == 1:
-        cols.append("X")
-    else:
-        for i in range(len(slopes)):
-            cols.append(f"X{i+1}")
-    cols.append("Y")
-
-    data_list = []
-
-    # Generate n points
-    # We can optimize this loop but rejection sampling is inherently iterative or batch-based.
-    # Given n is usually small (20-100 in defaults), loop is fine.
-
-    for _ in range(int(n)):
-        while True:
-            y_value = p_value(distribution_y, mean_y, sd_y)
-
-            row_vals = []
-            all_good = True
-
-            for idx, slope in enumerate(slopes):
-                x_value = p_value(distribution_x, mean_x, sd_x)
-                row_vals.append(x_value)
+    cols = p_columns(slopes)
+
+    x_values, y_values = p_sample(
+        int(n),
+        intercepts,
+        slopes,
+        corner,
+        distribution_x,
+        distribution_y,
+        mean_x,
+        mean_y,
+        sd_x,
+        sd_y,
+        p_random_rng(random_state),
+    )
+    df = pd.DataFrame(np.column_stack([x_values, y_values]), columns=cols)
 
-                intercept = intercepts[idx]
-
-                val_line = intercept + slope * x_value
+    # Sort by Y
+    df = df.sort_values(by="Y").reset_index(drop=True)
+    df.index = df.index + 1
 
-                if corner in [1, 2]:
-                    if y_value >= min(1, val_line):
-                        all_good = False
+    df.attrs.update(p_attributes(distribution_x, distribution_y, mean_x, mean_y, sd_x, sd_y))
 
-                if corner in [3, 4]:
-                    if y_value <= max(0, val_line):
-                        all_good = False
+    return df
 
-            if all_good:
-                row_vals.append(y_value)
-                data_list.append(row_vals)
-                break
 
-    df = pd.DataFrame(data_list, columns=cols)
+def nca_random_chunks(
+    n,
+    intercepts,
+    slopes,
+    corner=1,
+    distribution_x="uniform",
+    distribution_y="uniform",
+    mean_x=0.5,
+    mean_y=0.5,
+    sd_x=0.2,
+    sd_y=0.2,
+    chunk_size=1_000_000,
+    random_state=None,
+):
+    """Generate the points of ``nca_random`` in chunks, for datasets too large for memory.
+
+    The points follow the same distribution and corner as ``nca_random``,
+    but are not sorted on Y: the chunks hold the points in drawing order.
+
+    Parameters
+    ----------
+    n, intercepts, slopes, corner, distribution_x, distribution_y, mean_x, mean_y, sd_x, sd_y
+        As in ``nca_random``.
+    random_state : int, SeedSequence or Generator, optional
+        Seed of the points, the global numpy state without one.
+    chunk_size : int
+        Number of points per chunk, the last chunk holds the rest.
+
+    Yields
+    ------
+    DataFrame
+        Chunks with the columns and attributes of ``nca_random``, indexed
+        by the position of the points in the dataset.
+    """
+    tmp = p_validate_inputs(n, intercepts, slopes, corner, distribution_x, distribution_y)
+    if tmp["error"] is not None:
+        raise ValueError(p_errors[tmp["error"]])
+    if chunk_size < 1:
+        raise ValueError("chunk_size should be an integer > 0!")
+
+    cols = p_columns(tmp["slopes"])
+    attributes = p_attributes(distribution_x, distribution_y, mean_x, mean_y, sd_x, sd_y)
+    rng = p_random_rng(random_state)
+
+    for start in range(0, int(n), int(chunk_size)):
+        size = min(int(chunk_size), int(n) - start)
+        x_values, y_values = p_sample(
+            size,
+            tmp["intercepts"],
+            tmp["slopes"],
+            corner,
+            distribution_x,
+            distribution_y,
+            mean_x,
+            mean_y,
+            sd_x,
+            sd_y,
+            rng,
+        )
+        chunk = pd.DataFrame(
+            np.column_stack([x_values, y_values]),
+            columns=cols,
+            index=pd.RangeIndex(start + 1, start + size + 1),
+        )
+        chunk.attrs.update(attributes)
+        yield chunk
+
+
+def nca_random_file(path, n, intercepts, slopes, chunk_size=1_000_000, **kwargs):
+    """Write a dataset of ``nca_random_chunks`` to a .npy or .parquet file.
+
+    A .npy file is filled as a memory map, one row per point, with the
+    columns and attributes in a JSON file next to it (path + '.json'). A
+    Parquet file gets one row group per chunk and the attributes in its
+    schema metadata. Other arguments go to ``nca_random_chunks``.
+
+    Returns
+    -------
+    str
+        The path of the written file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in P_FILE_FORMATS:
+        raise ValueError(f"The file needs to be one of {', '.join(P_FILE_FORMATS)} files!")
+
+    chunks = nca_random_chunks(n, intercepts, slopes, chunk_size=chunk_size, **kwargs)
+
+    if extension == ".npy":
+        data = None
+        for chunk in chunks:
+            if data is None:
+                data = np.lib.format.open_memmap(
+                    path, mode="w+", dtype=np.float64, shape=(int(n), chunk.shape[1])
+                )
+                metadata = {"columns": list(chunk.columns), "attrs": chunk.attrs}
+            data[chunk.index[0] - 1 : chunk.index[-1]] = chunk.to_numpy()
+        data.flush()
+        del data
+
+        with open(path + ".json", "w") as file:
+            json.dump(metadata, file)
+        return path
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Parquet export needs pyarrow, install ncapackage[parquet]") from exc
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = table.schema.with_metadata(
+                    {b"nca_random": json.dumps(chunk.attrs).encode()}
+                )
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return path
+
+
+def p_random_rng(random_state):
+    # Without a random_state the points come from the global numpy state
+    if random_state is None:
+        return None
+    return np.random.default_rng(p_seed_sequence(random_state))
+
+
+def p_columns(slopes):
+    if len(slopes) == 1:
+        return ["X", "Y"]
+    return [f"X{i + 1}" for i in range(len(slopes))] + ["Y"]
 
-    # Sort by Y
-    df = df.sort_values(by="Y").reset_index(drop=True)
-    df.index = df.index + 1
 
-    # Attributes
-    df.attrs["distribution.x"] = distribution_x
-    df.attrs["distribution.y"] = distribution_y
+def p_attributes(distribution_x, distribution_y, mean_x, mean_y, sd_x, sd_y):
+    attributes = {"distribution.x": distribution_x, "distribution.y": distribution_y}
     if distribution_x == "normal":
-        df.attrs["mean.x"] = mean_x
-        df.attrs["sd.x"] = sd_x
+        attributes["mean.x"] = mean_x
+        attributes["sd.x"] = sd_x
     if distribution_y == "normal":
-        df.attrs["mean.y"] = mean_y
-        df.attrs["sd.y"] = sd_y
-
-    return df
+        attributes["mean.y"] = mean_y
+        attributes["sd.y"] = sd_y
+    return attributes
 
 
-def p_value(distribution, mean, sd):
+def p_sample(
+    n,
+    intercepts,
+    slopes,
+    corner,
+    distribution_x,
+    distribution_y,
+    mean_x,
+    mean_y,
+    sd_x,
+    sd_y,
+    rng=None,
+):
+    """X values (n x slopes) and Y values of n points in the empty corner.
+
+    Candidate rows are drawn in blocks and tested against all lines at once.
+    A row is accepted on the same condition as one by one, so the accepted
+    rows, kept in their order of drawing, have the same distribution.
+    """
+    intercepts = np.asarray(intercepts, dtype=float)
+    slopes = np.asarray(slopes, dtype=float)
+
+    x_blocks = []
+    y_blocks = []
+    count = drawn = 0
+    while count < n:
+        # Oversize the block on the acceptance rate so far
+        rate = max(count / drawn, 0.01) if drawn > 0 else 0.5
+        size = min(int(np.ceil((n - count) / rate * 1.2)) + 8, P_SAMPLE_BLOCK)
+
+        y_values = p_values(distribution_y, mean_y, sd_y, size, rng)
+        x_values = p_values(distribution_x, mean_x, sd_x, (size, len(slopes)), rng)
+        lines = intercepts + slopes * x_values
+
+        if corner in [1, 2]:
+            accepted = np.all(y_values[:, None] < np.minimum(1, lines), axis=1)
+        else:
+            accepted = np.all(y_values[:, None] > np.maximum(0, lines), axis=1)
+
+        drawn += size
+        accepted = np.flatnonzero(accepted)[: n - count]
+        count += len(accepted)
+        x_blocks.append(x_values[accepted])
+        y_blocks.append(y_values[accepted])
+
+    return np.concatenate(x_blocks), np.concatenate(y_blocks)
+
+
+def p_values(distribution, mean, sd, size, rng=None):
+    """A block of values, normal ones truncated to [0, 1] by inverse CDF.
+
+    Without a generator the values come from the global numpy state.
+    """
+    uniform = (np.random if rng is None else rng).uniform(0, 1, size)
     if distribution == "uniform":
-        return np.random.uniform(0, 1)
-    # rtruncnorm(1, a=0, b=1, mean=mean, sd=sd)
-    # scipy truncnorm takes a, b as standardized limits
+        return uniform
+    return p_truncnorm(uniform, mean, sd)
+
+
+def p_truncnorm(uniform, mean, sd):
+    # rtruncnorm(n, a=0, b=1, mean=mean, sd=sd), as quantiles of uniform values
     a, b = (0 - mean) / sd, (1 - mean) / sd
-    return truncnorm.rvs(a, b, loc=mean, scale=sd)
+    if a > 0:
+        # Both bounds in the upper tail, the survival function keeps the precision
+        low, high = ndtr(-a), ndtr(-b)
+        z = -ndtri(low - uniform * (low - high))
+    else:
+        low, high = ndtr(a), ndtr(b)
+        z = ndtri(low + uniform * (high - low))
+    return np.clip(mean + sd * z, 0, 1)
 
 
 def p_validate_inputs(n, intercepts, slopes, corner, distribution_x, distribution_y):
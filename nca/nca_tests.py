@@ -7,7 +7,7 @@ import pandas as pd
 from scipy.stats import norm
 
 from .p_graphics import p_new_pdf, p_new_window
-from .p_utils import _pool, p_pretty_name
+from .p_utils import p_get_pool, p_pretty_name, p_rng
 
 
 def p_test(analyses, loop_data, test_params, effect_aggregation):
@@ -34,10 +34,16 @@ def p_test(analyses, loop_data, test_params, effect_aggregation):
     samples = []
     seen_samples = set()
 
+    # The permutations and the analyses of the samples each get a stream,
+    # so workers draw the same numbers as a serial run
+    seed = test_params.get("seed")
+    rng = p_rng(seed)
+    sample_seeds = [None] * test_params["rep"] if seed is None else seed.spawn(test_params["rep"])
+
     # Generate samples
     for _ in range(test_params["rep"]):
         while True:
-            s = tuple(np.random.permutation(h))
+            s = tuple(rng.permutation(h))
             if test_params["rep"] <= 720:
                 if s not in seen_samples:
                     seen_samples.add(s)
@@ -51,11 +57,12 @@ def p_test(analyses, loop_data, test_params, effect_aggregation):
         print(f"Do test for  : {ceiling}-{x_name}")
 
         tasks = []
-        for sample in samples:
-            tasks.append((ceiling, loop_data, sample, effect_aggregation, y_org))
+        for sample, sample_seed in zip(samples, sample_seeds):
+            tasks.append((ceiling, loop_data, sample, effect_aggregation, y_org, sample_seed))
 
-        if _pool:
-            results = _pool.starmap(p_test_worker, tasks)
+        pool = p_get_pool()
+        if pool is not None:
+            results = pool.starmap(p_test_worker, tasks)
         else:
             results = [p_test_worker(*t) for t in tasks]
 
@@ -108,10 +115,11 @@ def p_test(analyses, loop_data, test_params, effect_aggregation):
     return {"test": test, "test_time": time.time() - start_time}
 
 
-def p_test_worker(ceiling, loop_data, sample_indices, effect_aggregation, y_org):
+def p_test_worker(ceiling, loop_data, sample_indices, effect_aggregation, y_org, seed=None):
     from .p_ceiling import p_nca_wrapper
 
     ld = loop_data.copy()
+    ld["seed"] = seed
     if hasattr(y_org, "iloc"):
         ld["y"] = y_org.iloc[sample_indices].reset_index(drop=True)
     else:
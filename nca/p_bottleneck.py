@@ -1,8 +1,7 @@
 import numpy as np
-import pandas as pd
 
 from .p_constants import EPSILON
-from .p_utils import p_if_min_else_max, p_pretty_number
+from .p_utils import p_if_min_else_max, p_is_number
 
 
 def p_bottleneck(loop_data, bn_data, slope, intercept):
@@ -11,7 +10,6 @@ def p_bottleneck(loop_data, bn_data, slope, intercept):
 
     theo = loop_data["scope_theo"]
     flip_x = loop_data["flip_x"]
-    precision_x = 1 if bn_data["bn_x_id"] in [1, 2, 4] else 3
 
     if np.isnan(intercept) or np.isnan(slope):
         mpx = p_mpx_single_peer(bn_data, theo, flip_x)
@@ -21,20 +19,7 @@ def p_bottleneck(loop_data, bn_data, slope, intercept):
 
     cases = p_cases(loop_data, mpx)
 
-    nn_value = p_nn_value(mpx, loop_data, bn_data)
-    na_value = p_na_value(mpx, loop_data, bn_data)
-
-    mpx_actual = mpx.copy()
-    mpx = p_transform_mpx(loop_data, mpx, bn_data["bn_x_id"])
-    pretty_mpx = p_pretty_mpx(loop_data, mpx, nn_value, na_value, precision_x)
-
-    df = pd.DataFrame(pretty_mpx, columns=[loop_data["names"][0]])  # Index 0 is current X
-    df.attrs["mpx_actual"] = mpx_actual
-
-    if bn_data["bn_x_id"] == 4:
-        df.attrs["cases"] = cases
-
-    return df
+    return p_bottleneck_specs(loop_data, bn_data, mpx, cases)
 
 
 def p_bottleneck_ce(loop_data, bn_data, peers, type_):
@@ -44,7 +29,6 @@ def p_bottleneck_ce(loop_data, bn_data, peers, type_):
     theo = loop_data["scope_theo"]
     flip_x = loop_data["flip_x"]
     flip_y = loop_data["flip_y"]
-    precision_x = 1 if bn_data["bn_x_id"] in [1, 2, 4] else 3
 
     if type_ == "fdh":
         mpx = p_bottleneck_fdh(bn_data, peers, flip_y)
@@ -57,70 +41,113 @@ def p_bottleneck_ce(loop_data, bn_data, peers, type_):
     cases = p_cases(loop_data, mpx)
 
     mpx = p_edge_cases(mpx, bn_data, theo, flip_x, False)
-    nn_value = p_nn_value(mpx, loop_data, bn_data)
-    na_value = p_na_value(mpx, loop_data, bn_data)
 
-    mpx_actual = mpx.copy()
-    mpx = p_transform_mpx(loop_data, mpx, bn_data["bn_x_id"])
-    pretty_mpx = p_pretty_mpx(loop_data, mpx, nn_value, na_value, precision_x)
+    return p_bottleneck_specs(loop_data, bn_data, mpx, cases)
+
+
+def p_bottleneck_specs(loop_data, bn_data, mpx, cases):
+    """Bottleneck columns for every bottleneck specification, one per spec.
+
+    The mpx is computed once for the Y levels of all specifications. Each
+    specification takes its own rows and converts them to its bottleneck_x.
+    Bottleneck data without specifications is a single specification.
+    """
+    bottlenecks = []
+    for spec in bn_data.get("specs", [bn_data]):
+        rows = spec.get("rows", slice(None))
+        spec_mpx = mpx[rows]
+
+        nn_value = p_nn_value(spec_mpx, loop_data, spec)
+        na_value = p_na_value(spec_mpx, loop_data, spec)
+
+        bottlenecks.append(
+            p_bottleneck_values(loop_data, spec, spec_mpx, nn_value, na_value, cases[rows])
+        )
+
+    return bottlenecks
 
-    df = pd.DataFrame(pretty_mpx, columns=[loop_data["names"][0]])  # Index 0 is current X
-    df.attrs["mpx_actual"] = mpx_actual
 
-    if bn_data["bn_x_id"] == 4:
-        df.attrs["cases"] = cases
+def p_bottleneck_values(loop_data, bn_data, mpx, nn_value, na_value, cases):
+    """Build the numeric bottleneck column for the current X.
 
-    return df
+    Values are kept as floats in the ``bottleneck_x`` representation. Cells
+    that display as "NN" or "NA" hold NaN and are flagged in the masks, unless
+    the cutoff supplies a numeric substitute for them.
+    """
+    actual = mpx.flatten().copy()
+    values = p_transform_mpx(loop_data, mpx, bn_data["bn_x_id"]).flatten().astype(float)
+
+    nn = np.isinf(values)
+    na = np.isnan(values)
+
+    if p_is_number(nn_value):
+        values[nn] = nn_value
+        nn[:] = False
+    else:
+        values[nn] = np.nan
+
+    if p_is_number(na_value):
+        values[na] = na_value
+        na[:] = False
+
+    return {
+        "values": values,
+        "nn": nn,
+        "na": na,
+        "actual": actual,
+        "cases": cases.flatten() if bn_data["bn_x_id"] == 4 else None,
+    }
 
 
 def p_bottleneck_fdh(bn_data, peers, flip_y):
     mpy = bn_data["mpy"]
-    mpx = np.full((len(mpy), 1), np.nan)
-    x_peers = peers.iloc[:, 0].values
-    y_peers = peers.iloc[:, 1].values
+    peers_arr = np.asarray(peers, dtype=float).reshape(-1, 2)
+    idx = p_peer_index(mpy, peers_arr[:, 1], flip_y)
 
-    for j in range(len(mpy)):
-        if flip_y:
-            indices = np.where(y_peers < (mpy[j, 0] + EPSILON))[0]
-        else:
-            indices = np.where(y_peers > (mpy[j, 0] - EPSILON))[0]
+    mpx = np.full(idx.shape, np.nan)
+    found = idx < len(peers_arr)
+    mpx[found] = peers_arr[idx[found], 0]
 
-        if len(indices) == 0:
-            mpx[j, 0] = np.nan
-        else:
-            mpx[j, 0] = x_peers[indices[0]]
-
-    return mpx
+    return mpx.reshape(-1, 1)
 
 
 def p_bottleneck_vrs(bn_data, peers, flip_y):
-    mpy = bn_data["mpy"]
-    mpx = np.full((len(mpy), 1), np.nan)
-    x_peers = peers.iloc[:, 0].values
-    y_peers = peers.iloc[:, 1].values
-    peers_arr = peers.values
-
-    def calculate_x(y, peers_data, index):
-        p1 = peers_data[index - 1]
-        p2 = peers_data[index]
-        return p1[0] + (y - p1[1]) * (p1[0] - p2[0]) / (p1[1] - p2[1])
-
-    for j in range(len(mpy)):
-        if flip_y:
-            indices = np.where(y_peers < (mpy[j, 0] + EPSILON))[0]
-        else:
-            indices = np.where(y_peers > (mpy[j, 0] - EPSILON))[0]
+    mpy = bn_data["mpy"].flatten()
+    peers_arr = np.asarray(peers, dtype=float).reshape(-1, 2)
+    idx = p_peer_index(mpy, peers_arr[:, 1], flip_y)
 
-        if len(indices) == 0:
-            mpx[j, 0] = np.nan
-        else:
-            idx = indices[0]
-            if idx == 0:
-                mpx[j, 0] = x_peers[idx]
-            else:
-                mpx[j, 0] = calculate_x(mpy[j, 0], peers_arr, idx)
+    mpx = np.full(idx.shape, np.nan)
+    first = idx == 0
+    mpx[first] = peers_arr[0, 0] if len(peers_arr) > 0 else np.nan
 
-    return mpx
+    # Interpolate between the previous and the first qualifying peer
+    between = (idx > 0) & (idx < len(peers_arr))
+    p1 = peers_arr[idx[between] - 1]
+    p2 = peers_arr[idx[between]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mpx[between] = p1[:, 0] + (mpy[between] - p1[:, 1]) * (p1[:, 0] - p2[:, 0]) / (
+            p1[:, 1] - p2[:, 1]
+        )
+
+    return mpx.reshape(-1, 1)
+
+
+def p_peer_index(mpy, y_peers, flip_y):
+    """Index of the first peer reaching each mpy level (len(y_peers) if none).
+
+    The running max (min when flip_y) of the peer Y values is monotone, so the
+    first qualifying peer is found with a binary search per level.
+    """
+    mpy = np.asarray(mpy, dtype=float).flatten()
+    if len(y_peers) == 0:
+        return np.zeros(len(mpy), dtype=int)
+
+    if flip_y:
+        running = -np.minimum.accumulate(y_peers)
+        return np.searchsorted(running, -(mpy + EPSILON), side="right")
+
+    running = np.maximum.accumulate(y_peers)
+    return np.searchsorted(running, mpy - EPSILON, side="right")
 
 
 def p_mpx_single_peer(bn_data, theo, flip_x):
@@ -145,12 +172,10 @@ def p_transform_mpx(loop_data, mpx, bn_x_id):
     elif bn_x_id == 2:
         mpx = 100 * mpx / theo[1]
     elif bn_x_id == 4:
-        x_sorted = np.sort(loop_data["x"])
+        x_ref = p_sorted_x(loop_data, flip_x)
         if flip_x:
-            x_ref = np.sort(-loop_data["x"])
             tmp = -mpx - EPSILON
         else:
-            x_ref = x_sorted
             tmp = mpx - EPSILON
 
         indices = np.searchsorted(x_ref, tmp.flatten(), side="right")
@@ -167,7 +192,7 @@ def p_nn_value(mpx, loop_data, bn_data):
 
     flip_x = loop_data["flip_x"]
     theo = loop_data["scope_emp"]
-    nn_value = p_if_min_else_max(not flip_x, mpx, na_rm=True)
+    nn_value = p_if_min_else_max(not flip_x, mpx.flatten(), na_rm=True)
 
     return p_transform_value(loop_data, nn_value, theo, bn_data["bn_x_id"])
 
@@ -178,7 +203,7 @@ def p_na_value(mpx, loop_data, bn_data):
 
     flip_x = loop_data["flip_x"]
     theo = loop_data["scope_theo"]
-    na_value = p_if_min_else_max(flip_x, mpx, na_rm=True)
+    na_value = p_if_min_else_max(flip_x, mpx.flatten(), na_rm=True)
 
     return p_transform_value(loop_data, na_value, theo, bn_data["bn_x_id"])
 
@@ -192,35 +217,13 @@ def p_transform_value(loop_data, value, theo, bn_x_id):
     elif bn_x_id == 2:
         value = 100 * value / theo[1]
     elif bn_x_id == 4:
-        x_sorted = np.sort(loop_data["x"])
+        x_sorted = p_sorted_x(loop_data)
         idx = np.searchsorted(x_sorted, value, side="right")
         value = 100 * idx / len(x_sorted)
 
     return value
 
 
-def p_pretty_mpx(loop_data, mpx, nn_value, na_value, precision_x):
-    """Format mpx values for display.
-
-    Note: loop_data kept for API compatibility.
-    """
-    _ = loop_data  # API compatibility
-
-    def subst(x):
-        if np.isnan(x):
-            return p_pretty_number(na_value, str(na_value), prec=precision_x)
-        if np.isinf(x):
-            nn_val = nn_value
-            if isinstance(nn_val, float) and np.isinf(nn_val):
-                nn_val = "NN"
-            return p_pretty_number(nn_val, str(nn_val), prec=precision_x)
-        return p_pretty_number(x, prec=precision_x)
-
-    flat_mpx = mpx.flatten()
-    res = [subst(x) for x in flat_mpx]
-    return np.array(res).reshape(-1, 1)
-
-
 def p_edge_cases(mpx, bn_data, theo, flip_x, use_epsilon=False):
     tmp = EPSILON if use_epsilon else 0
 
@@ -238,16 +241,29 @@ def p_edge_cases(mpx, bn_data, theo, flip_x, use_epsilon=False):
 
 
 def p_cases(loop_data, mpx):
-    x = loop_data["x"]
     flip_x = loop_data["flip_x"]
     mpx_cases = mpx + (EPSILON if flip_x else -EPSILON)
 
-    x_sorted = np.sort(x)
+    x_sorted = p_sorted_x(loop_data)
     indices = np.searchsorted(x_sorted, mpx_cases.flatten(), side="right")
     cases = indices
     return cases.reshape(-1, 1)
 
 
+def p_sorted_x(loop_data, flip=False):
+    """Sorted X (or sorted -X when flip) of the current condition.
+
+    Uses the arrays from p_create_loop_data, so the bottleneck helpers do not
+    sort X again for every ceiling.
+    """
+    key = "x_sorted_flip" if flip else "x_sorted"
+    if loop_data.get(key) is not None:
+        return loop_data[key]
+
+    x_sorted = np.sort(np.asarray(loop_data["x"], dtype=float))
+    return -x_sorted[::-1] if flip else x_sorted
+
+
 def p_bottleneck_id(name):
     if name == "percentage.range":
         return 1
@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+P_EXPORT_FORMATS = ["csv", "parquet"]
+
+# Rows per Parquet row group, a condition (sorted on Y) spans several groups
+# so the Y statistics of the groups can skip them in scans by Y level
+P_EXPORT_ROW_GROUP = 1000
+
+
+def p_open_bottleneck_export(bn_data, export, path=None):
+    """Prepare one bottleneck export file per ceiling.
+
+    Files are named like the PDF output: bottlenecks.<ceiling>.<format>
+    """
+    if export not in P_EXPORT_FORMATS:
+        raise ValueError(f"Bottleneck export needs to be one of {', '.join(P_EXPORT_FORMATS)}!\n")
+
+    writers = {}
+    for ceiling in bn_data["bottlenecks"]:
+        file_name = f"bottlenecks.{ceiling}.{export}"
+        if path is not None:
+            file_name = os.path.join(path, file_name)
+
+        writers[ceiling] = {"file_name": file_name, "format": export, "writer": None}
+
+    return writers
+
+
+def p_write_bottleneck(writer, bn, x_name, bottleneck):
+    """Append the bottleneck rows of one X to the export file of a ceiling.
+
+    Rows are in long format (one per condition and Y level), sorted on Y.
+    Parquet files get row groups of at most P_EXPORT_ROW_GROUP rows of one
+    condition, and a page index.
+    """
+    levels = bn.iloc[:, 0].to_numpy(dtype=float)
+    order = np.argsort(levels, kind="stable")
+
+    rows = {
+        "condition": np.full(len(levels), str(x_name), dtype=object),
+        "y": levels[order],
+        "value": bottleneck["values"][order],
+        "actual": bottleneck["actual"][order],
+        "nn": bottleneck["nn"][order],
+        "na": bottleneck["na"][order],
+    }
+    if bottleneck.get("cases") is not None:
+        rows["cases"] = bottleneck["cases"][order]
+    rows = pd.DataFrame(rows)
+
+    if writer["format"] == "csv":
+        first = writer["writer"] is None
+        rows.to_csv(writer["file_name"], mode="w" if first else "a", header=first, index=False)
+        writer["writer"] = writer["file_name"]
+        return
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Parquet export needs pyarrow, install ncapackage[parquet]") from exc
+
+    table = pa.Table.from_pandas(rows, preserve_index=False)
+    if writer["writer"] is None:
+        writer["writer"] = pq.ParquetWriter(
+            writer["file_name"], table.schema, write_page_index=True
+        )
+    writer["writer"].write_table(table, row_group_size=P_EXPORT_ROW_GROUP)
+
+
+def p_close_bottleneck_export(writers):
+    """Close the export files, returns the file name per ceiling."""
+    for writer in writers.values():
+        if writer["format"] == "parquet" and writer["writer"] is not None:
+            writer["writer"].close()
+            writer["writer"] = None
+
+    return {ceiling: writer["file_name"] for ceiling, writer in writers.items()}
@@ -0,0 +1,98 @@
+import numpy as np
+
+from .p_bottleneck import p_bottleneck, p_bottleneck_ce, p_sorted_x
+from .p_bottleneck_table import p_add_bottleneck, p_low_high, p_new_bottleneck
+
+# Step ceilings and the frontier type used for their bottlenecks
+P_QUERY_STEP_TYPES = {"ce_fdh": "fdh", "ce_vrs": "vrs"}
+
+
+def p_bottleneck_query_data(y, bn_data, flip_y):
+    """Start a bottleneck query index with the bottleneck options of the analysis."""
+    y_low, y_high = p_low_high(y, bn_data["y_scope"], bn_data["bn_y_id"])
+    y_vals = y.iloc[:, 0] if hasattr(y, "iloc") and y.ndim > 1 else y
+    y_vals = np.asarray(y_vals, dtype=float)
+
+    query = {att: bn_data[att] for att in ["bn_x", "bn_x_id", "bn_y", "bn_y_id", "size", "cutoff"]}
+    query["flip_y"] = flip_y
+    query["y_low"] = y_low
+    query["y_high"] = y_high
+    # Only percentile levels need the Y distribution
+    query["y_sorted"] = np.sort(y_vals[~np.isnan(y_vals)]) if bn_data["bn_y_id"] == 4 else None
+    query["conditions"] = {}
+    query["ceilings"] = {}
+
+    return query
+
+
+def p_add_bottleneck_query(query, ceiling, loop_data, analysis):
+    """Store the frontier (step ceilings) or line of a ceiling for the current X."""
+    x_name = loop_data["names"][0]
+
+    if x_name not in query["conditions"]:
+        query["conditions"][x_name] = {
+            "x_sorted": p_sorted_x(loop_data),
+            "x_sorted_flip": p_sorted_x(loop_data, True),
+            "flip_x": loop_data["flip_x"],
+            "flip_y": loop_data["flip_y"],
+            "scope_emp": loop_data["scope_emp"],
+            "scope_theo": loop_data["scope_theo"],
+        }
+
+    if ceiling in P_QUERY_STEP_TYPES:
+        peers = analysis["peers"]
+        peers = np.empty((0, 2)) if peers is None else np.asarray(peers, dtype=float)
+        frontier = {"type": P_QUERY_STEP_TYPES[ceiling], "peers": peers.reshape(-1, 2)}
+    else:
+        frontier = {"type": "line", "slope": analysis["slope"], "intercept": analysis["intercept"]}
+
+    query["ceilings"].setdefault(ceiling, {})[x_name] = frontier
+
+
+def p_query_mpy(query, levels):
+    """Convert Y levels in the bottleneck_y representation to actual Y values."""
+    bn_y_id = query["bn_y_id"]
+
+    if bn_y_id == 3:
+        return levels
+
+    # With flip_y the percentages count down from the top of the Y scope
+    if query["flip_y"]:
+        levels = 100 - levels
+
+    if bn_y_id == 4:
+        # Same as np.quantile (linear), but on the stored sorted Y
+        y_sorted = query["y_sorted"]
+        positions = np.clip(levels / 100, 0, 1) * (len(y_sorted) - 1)
+        return np.interp(positions, np.arange(len(y_sorted)), y_sorted)
+
+    y_low = 0 if bn_y_id == 2 else query["y_low"]
+    return y_low + levels / 100 * (query["y_high"] - y_low)
+
+
+def p_query_bottlenecks(query, levels, ceilings):
+    """Bottleneck tables for the requested Y levels, one per ceiling."""
+    mpy = p_query_mpy(query, levels).reshape(-1, 1)
+    bn_data = {att: query[att] for att in ["bn_x", "bn_x_id", "bn_y", "bn_y_id", "size", "cutoff"]}
+    bn_data["mpy"] = mpy
+
+    bottlenecks = {}
+    for ceiling in ceilings:
+        bn = p_new_bottleneck(levels.reshape(-1, 1), bn_data)
+
+        for x_name, frontier in query["ceilings"][ceiling].items():
+            loop_data = query["conditions"][x_name]
+            if frontier["type"] == "line":
+                bottleneck = p_bottleneck(
+                    loop_data, bn_data, frontier["slope"], frontier["intercept"]
+                )
+            else:
+                bottleneck = p_bottleneck_ce(
+                    loop_data, bn_data, frontier["peers"], frontier["type"]
+                )
+            # Query data has a single bottleneck specification
+            p_add_bottleneck(bn, x_name, bottleneck[0])
+
+        bottlenecks[ceiling] = bn
+
+    return bottlenecks
@@ -7,14 +7,24 @@ from .p_constants import P_NO_BOTTLENECK
 
 p_bottleneck_options = ["percentage.range", "percentage.max", "actual", "percentile"]
 
+# Attributes of a bottleneck table that hold one entry per X column
+P_BOTTLENECK_COLUMN_ATTRS = ["nn", "na", "actual", "cases"]
+
 
 def p_bottleneck_data(
-    x, y, scope, flip_y, ceilings, bottleneck_x, bottleneck_y, steps, step_size, cutoff
+    x,
+    y,
+    scope,
+    flip_y,
+    ceilings,
+    bottleneck_x,
+    bottleneck_y,
+    steps,
+    step_size,
+    cutoff,
+    bottleneck_specs=None,
 ):
-    bn_x = p_validate_bottleneck(bottleneck_x, "x")
-    bn_y = p_validate_bottleneck(bottleneck_y, "y")
-    bn_x_id = p_bottleneck_id(bn_x)
-    bn_y_id = p_bottleneck_id(bn_y)
+    specs = p_validate_bottleneck_specs(bottleneck_x, bottleneck_y, bottleneck_specs)
 
     # Use the first scope vector for Y calculations
     y_scope = scope
@@ -25,32 +35,84 @@ def p_bottleneck_data(
             y_scope = None
         # else: scope is likely [min, max, min, max] so we use it as is
 
-    mp, mpy = p_mp_mpy(y, y_scope, steps, step_size, bn_y_id, flip_y)
-
-    mp = pd.DataFrame(mp)
+    # One set of Y levels per bottleneck_y, stacked so mpx is computed once
+    levels = {}
+    start = 0
+    for _, bn_y in specs:
+        if bn_y not in levels:
+            mp, mpy = p_mp_mpy(y, y_scope, steps, step_size, p_bottleneck_id(bn_y), flip_y)
+            levels[bn_y] = (mp, mpy, slice(start, start + len(mpy)))
+            start += len(mpy)
 
-    mp.attrs["bn.x"] = bn_x
-    mp.attrs["bn.y"] = bn_y
-    mp.attrs["bn.y.id"] = bn_y_id
-    mp.attrs["size"] = len(x)
-    mp.attrs["cutoff"] = cutoff
-
-    bottlenecks = {}
     valid_ceilings = [c for c in ceilings if c not in P_NO_BOTTLENECK]
 
-    for ceil in valid_ceilings:
-        bottlenecks[ceil] = mp.copy()
-
-    return {
-        "bottlenecks": bottlenecks,
-        "bn_x": bn_x,
-        "bn_y": bn_y,
-        "bn_x_id": bn_x_id,
-        "bn_y_id": bn_y_id,
-        "mpy": mpy,
-        "cutoff": cutoff,
-        "steps": steps,
-    }
+    bn_specs = []
+    for bn_x, bn_y in specs:
+        mp, mpy, rows = levels[bn_y]
+        spec = {
+            "bn_x": bn_x,
+            "bn_y": bn_y,
+            "bn_x_id": p_bottleneck_id(bn_x),
+            "bn_y_id": p_bottleneck_id(bn_y),
+            "mpy": mpy,
+            "rows": rows,
+            "size": len(x),
+            "cutoff": cutoff,
+        }
+        spec["bottlenecks"] = {ceil: p_new_bottleneck(mp, spec) for ceil in valid_ceilings}
+        bn_specs.append(spec)
+
+    # The first specification is the bottleneck_x / bottleneck_y pair
+    bn_data = {att: bn_specs[0][att] for att in ["bn_x", "bn_y", "bn_x_id", "bn_y_id"]}
+    bn_data.update(
+        {
+            "mpy": np.vstack([mpy for _, mpy, _ in levels.values()]),
+            "y_scope": y_scope,
+            "size": len(x),
+            "cutoff": cutoff,
+            "steps": steps,
+            "bottlenecks": bn_specs[0]["bottlenecks"],
+            "specs": bn_specs,
+        }
+    )
+    return bn_data
+
+
+def p_validate_bottleneck_specs(bottleneck_x, bottleneck_y, bottleneck_specs):
+    """List of unique (bottleneck_x, bottleneck_y) pairs, the default pair first."""
+    specs = [(p_validate_bottleneck(bottleneck_x, "x"), p_validate_bottleneck(bottleneck_y, "y"))]
+
+    for spec in bottleneck_specs or []:
+        if isinstance(spec, str) or len(spec) != 2:
+            raise ValueError("Bottleneck specs need to be (bottleneck_x, bottleneck_y) pairs!\n")
+        spec = (p_validate_bottleneck(spec[0], "x"), p_validate_bottleneck(spec[1], "y"))
+        if spec not in specs:
+            specs.append(spec)
+
+    return specs
+
+
+def p_new_bottleneck(mp, bn_data):
+    """Create an empty bottleneck table with the Y levels as first column."""
+    bn = pd.DataFrame(mp)
+
+    for att in ["bn_x", "bn_x_id", "bn_y", "bn_y_id", "size", "cutoff"]:
+        bn.attrs[att] = bn_data[att]
+
+    # Per-X masks and raw values, filled by p_add_bottleneck
+    for att in P_BOTTLENECK_COLUMN_ATTRS:
+        bn.attrs[att] = {}
+
+    return bn
+
+
+def p_add_bottleneck(bn, x_name, bottleneck):
+    """Add the numeric bottleneck column of one X to a bottleneck table."""
+    bn[x_name] = bottleneck["values"]
+
+    for att in P_BOTTLENECK_COLUMN_ATTRS:
+        if bottleneck.get(att) is not None:
+            bn.attrs.setdefault(att, {})[x_name] = bottleneck[att]
 
 
 def p_mp_mpy(y, scope, steps, step_size, bn_y_id, flip_y):
@@ -142,8 +204,8 @@ def p_mp_mpy_perc(y, scope, steps, step_size, bn_y_id, flip_y):
         probs = np.arange(0, 1 + step / 1000, step)
 
     if bn_y_id == 4:
-        y_vals = y.iloc[:, 0] if hasattr(y, "iloc") else y
-        values = np.quantile(y_vals, probs)
+        y_vals = y.iloc[:, 0] if hasattr(y, "iloc") and y.ndim > 1 else y
+        values = np.nanquantile(y_vals, probs)
     else:
         values = py_low + probs * (py_high - py_low)
 
@@ -3,7 +3,7 @@ import math
 import numpy as np
 from scipy.stats import iqr
 
-from .p_utils import p_if_min_else_max
+from .p_utils import p_if_min_else_max, p_rng
 
 
 def p_columns(loop_data, is_confidence):
@@ -189,13 +189,16 @@ def p_bootstrap(y, columns, loop_data):
     else:
         y_norm = (y - y_min) / y_range
 
+    # One stream for all columns, seeded per analysis
+    rng = p_rng(loop_data.get("seed"))
+
     start = 0
     for col in range(columns.shape[1]):
         count = int(columns[0, col])
         end = start + count
 
         z = y_norm[start:end]
-        ci = p_bootstrap_column(z, count, conf, conf_rep)
+        ci = p_bootstrap_column(z, count, conf, conf_rep, rng)
 
         columns[4, col] = (ci * y_range) + y_min
         start = end
@@ -203,7 +206,7 @@ def p_bootstrap(y, columns, loop_data):
     return columns
 
 
-def p_bootstrap_column(z, n, conf, nrep):
+def p_bootstrap_column(z, n, conf, nrep, rng=np.random):
     n2 = n * 2
     zeta_hat = np.max(z)
     zeta_star = np.zeros(nrep)
@@ -214,10 +217,10 @@ def p_bootstrap_column(z, n, conf, nrep):
     h = (2**0.2) * hr
 
     for b in range(nrep):
-        ind = np.floor(np.random.uniform(0, 1, n) * n2).astype(int)
+        ind = np.floor(rng.uniform(0, 1, n) * n2).astype(int)
         zs = zr[ind]
 
-        t1 = zs + h * np.random.normal(0, 1, n)
+        t1 = zs + h * rng.normal(0, 1, n)
         zss = np.where(t1 <= zeta_hat, t1, 2 * zeta_hat - t1)
 
         t2 = np.mean(zs)
@@ -5,7 +5,8 @@ def get_fit(ceiling, fdh_ceiling):
     if math.isnan(ceiling) or math.isnan(fdh_ceiling):
         return float("nan")
 
-    if ceiling > fdh_ceiling:
+    # Without a CE-FDH ceiling zone there is no fit
+    if ceiling > fdh_ceiling or fdh_ceiling == 0:
         return float("nan")
 
     return 100 - 100 * abs(ceiling - fdh_ceiling) / fdh_ceiling
@@ -0,0 +1,548 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+from scipy.stats import linregress
+
+from .p_ceiling import p_ce_ceiling, p_ceiling
+from .p_loop_data import p_create_loop_data, p_scope_theo
+from .p_peers import p_peers
+from .p_scope import p_scope
+from .p_validate import p_validate_corner, p_validate_flipx
+
+# Ceilings with a leave-one-out engine, and the peers (p_peers method) they use
+P_LOO_CEILINGS = {"ce_fdh": "fdh", "ce_vrs": "vrs", "cr_fdh": "fdh", "cr_vrs": "vrs", "cols": "fdh"}
+
+# Ceilings with bounds on the effects of further removals (p_loo_bounds)
+P_LOO_BOUNDED = ["ce_fdh", "ce_vrs"]
+
+# Line ceilings, fitted on the peers or (COLS) on all points
+P_LOO_LINES = ["cr_fdh", "cr_vrs", "cols"]
+
+# Relative size below which a downdated fit is refitted (zero slope, or all X equal)
+P_LOO_TOLERANCE = 1e-9
+
+
+def p_loo_data(data, params):
+    """Cache the loop data and the FDH frontier for leave-one-out effects.
+
+    Line ceilings also cache the sums of their least squares fit. Returns
+    None for ceilings without a leave-one-out engine.
+    """
+    ceiling = params["ceiling"]
+    if isinstance(ceiling, list):
+        ceiling = ceiling[0]
+    if ceiling not in P_LOO_CEILINGS:
+        return None
+
+    loop_data, scope = p_loo_loop_data(data, params)
+
+    # Work in coordinates where the frontier always runs up and to the right
+    x_vals = loop_data["x"].to_numpy(dtype=float)
+    y_vals = loop_data["y"].to_numpy(dtype=float)
+    u = -x_vals if loop_data["flip_x"] else x_vals
+    v = -y_vals if loop_data["flip_y"] else y_vals
+
+    peers = p_peers(loop_data)
+    index = loop_data["x"].index
+
+    loo = p_order_stats(loop_data)
+    loo.update(
+        {
+            "ceiling": ceiling,
+            "method": P_LOO_CEILINGS[ceiling],
+            "loop_data": loop_data,
+            "scope": scope,
+            "u": u,
+            "v": v,
+            "u_order": np.argsort(u, kind="stable"),
+            "peers": index.get_indexer(peers.index)
+            if peers is not None
+            else np.array([], dtype=int),
+        }
+    )
+    if ceiling in P_LOO_LINES:
+        loo.update(p_loo_line_data(loo))
+
+    return loo
+
+
+def p_loo_loop_data(data, params):
+    """Loop data of the outlier data, with the flips and scope of nca_analysis."""
+    x = [params["x"]]
+    flip_x = params["flip_x"]
+    flip_y = params["flip_y"]
+    if params["corner"] is not None:
+        corner = p_validate_corner(x, params["corner"])
+        flip_y = all(c in [3, 4] for c in corner)
+        flip_x = [c in [2, 4] for c in corner]
+    flip_x = p_validate_flipx(x, flip_x)
+    scope = p_scope(x, params["scope"])
+
+    loop_data = p_create_loop_data(data[x], data[params["y"]], scope, flip_x, bool(flip_y), 0, 0.95)
+    return loop_data, scope[0]
+
+
+def p_loo_effect(loo, combo):
+    """Effect size and empirical scope after removing the rows in combo.
+
+    Only the frontier between the kept neighbours of the removed peers is
+    recomputed, the scope comes from the order statistics of X and Y.
+    """
+    removed = loo["index"].get_indexer(pd.Index(combo))
+    removed = np.unique(removed[removed >= 0])
+
+    loop_data = p_loo_scoped(loo, removed)
+    if loo["ceiling"] in P_LOO_LINES:
+        return p_loo_line_effect(loo, loop_data, removed), loop_data["scope_emp"]
+
+    peers = p_loo_peers(loo, removed)
+    if peers is None:
+        return float("nan"), loop_data["scope_emp"]
+
+    ceiling = p_ce_ceiling(loop_data, peers, loo["method"])
+    return ceiling / loop_data["scope_area"], loop_data["scope_emp"]
+
+
+def p_loo_scoped(loo, removed):
+    """Loop data with the scope of the data without the removed positions."""
+    loop_data = dict(loo["loop_data"])
+    loop_data["scope_emp"] = p_loo_scope(loo, removed)
+    loop_data["scope_theo"] = p_scope_theo(loop_data["scope_emp"], loo["scope"])
+    theo = loop_data["scope_theo"]
+    loop_data["scope_area"] = (theo[1] - theo[0]) * (theo[3] - theo[2])
+    return loop_data
+
+
+def p_loo_line_data(loo):
+    """Points and sums of the least squares fit of a line ceiling.
+
+    The sums are taken around the mean of the points, so removing points
+    from them (a downdate) keeps the precision of a refit.
+    """
+    loop_data = loo["loop_data"]
+    x_vals = loop_data["x"].to_numpy(dtype=float)
+    y_vals = loop_data["y"].to_numpy(dtype=float)
+
+    if loo["ceiling"] == "cols":
+        points = np.arange(len(x_vals))
+    else:
+        peers = p_peers(loop_data, vrs=loo["method"] == "vrs")
+        points = (
+            loo["index"].get_indexer(peers.index) if peers is not None else np.array([], dtype=int)
+        )
+
+    center = (x_vals[points].mean(), y_vals[points].mean()) if len(points) > 0 else (0.0, 0.0)
+    line = {
+        "line_points": points,
+        "line_center": center,
+        "line_sums": p_line_sums(x_vals[points] - center[0], y_vals[points] - center[1]),
+    }
+
+    # COLS moves the line to the highest (lowest if flip_y) residual, which
+    # is reached on the upper hull of the points
+    if loo["ceiling"] == "cols":
+        sign = -1 if loop_data["flip_y"] else 1
+        line["line_hull"] = p_upper_hull(x_vals, sign * y_vals)
+
+    return line
+
+
+def p_line_sums(x, y):
+    """Sufficient statistics of a least squares line: n, Sx, Sy, Sxx, Sxy, Syy."""
+    return np.array([len(x), x.sum(), y.sum(), (x * x).sum(), (x * y).sum(), (y * y).sum()])
+
+
+def p_loo_line_effect(loo, loop_data, removed):
+    """Effect size of a line ceiling without the removed positions.
+
+    The fit is downdated with the points that leave (and updated with the
+    peers that enter) instead of refitted.
+    """
+    x_vals = loop_data["x"].to_numpy(dtype=float)
+    y_vals = loop_data["y"].to_numpy(dtype=float)
+    points = loo["line_points"]
+
+    if loo["ceiling"] == "cols":
+        leaving = np.intersect1d(points, removed)
+        entering = np.array([], dtype=int)
+        new_points = np.setdiff1d(points, removed)
+    elif np.isin(removed, loo["peers"]).any():
+        peers = p_loo_peers(loo, removed)
+        if peers is None:
+            return float("nan")
+        if len(np.unique(peers.values, axis=0)) <= 1:
+            return 0.0
+        new_points = loo["index"].get_indexer(peers.index)
+        leaving = np.setdiff1d(points, new_points)
+        entering = np.setdiff1d(new_points, points)
+    else:
+        # Removing rows below the frontier keeps the peers
+        if len(np.unique(np.column_stack([x_vals[points], y_vals[points]]), axis=0)) <= 1:
+            return 0.0
+        leaving = entering = np.array([], dtype=int)
+        new_points = points
+
+    cx, cy = loo["line_center"]
+    sums = (
+        loo["line_sums"]
+        - p_line_sums(x_vals[leaving] - cx, y_vals[leaving] - cy)
+        + p_line_sums(x_vals[entering] - cx, y_vals[entering] - cy)
+    )
+    n, sx, sy, sxx, sxy, syy = sums
+    if n < 2:
+        return float("nan")
+
+    # Cancellation leaves rounding errors in a (near) zero variance or slope,
+    # which decide between a flat line and no line: refit those exactly
+    denominator = n * sxx - sx * sx
+    numerator = n * sxy - sx * sy
+    if denominator <= P_LOO_TOLERANCE * n * sxx or abs(numerator) <= P_LOO_TOLERANCE * np.sqrt(
+        max(denominator, 0) * n * syy
+    ):
+        return p_loo_refit(loo, loop_data, x_vals[new_points], y_vals[new_points])
+
+    slope = numerator / denominator
+    intercept = cy + (sy - slope * sx) / n - slope * cx
+
+    if loo["ceiling"] == "cols":
+        sign = -1 if loop_data["flip_y"] else 1
+        intercept = sign * p_hull_max(loo, x_vals, sign * y_vals, sign * slope, removed)
+
+    # A line end on the edge of the scope decides between a full and an
+    # empty zone, as does the rounding of the refit
+    theo = loop_data["scope_theo"]
+    ends = slope * np.array(theo[:2]) + intercept
+    if np.isclose(
+        ends[:, None], theo[2:], rtol=0, atol=P_LOO_TOLERANCE * (theo[3] - theo[2])
+    ).any():
+        return p_loo_refit(loo, loop_data, x_vals[new_points], y_vals[new_points])
+
+    return p_ceiling(loop_data, slope, intercept) / loop_data["scope_area"]
+
+
+def p_loo_refit(loo, loop_data, x, y):
+    """Effect size of the line fitted on x and y as p_nca_cols and p_nca_cr_fdh / _vrs do."""
+    if len(np.unique(x)) <= 1:
+        return float("nan")
+
+    if loo["ceiling"] != "cols":
+        slope, intercept = np.polyfit(x, y, 1)
+        return p_ceiling(loop_data, slope, intercept) / loop_data["scope_area"]
+
+    slope, intercept = linregress(x, y)[:2]
+    residuals = y - (slope * x + intercept)
+    intercept += np.min(residuals) if loop_data["flip_y"] else np.max(residuals)
+    return p_ceiling(loop_data, slope, intercept) / loop_data["scope_area"]
+
+
+def p_upper_hull(x, w):
+    """Positions of the upper convex hull of (x, w), on increasing x."""
+    order = np.lexsort((w, x))
+    hull = []
+    for i in order:
+        # Of the points with the same x only the highest is on the hull
+        while hull and x[hull[-1]] == x[i]:
+            hull.pop()
+        while len(hull) >= 2:
+            a, b = hull[-2], hull[-1]
+            cross = (x[b] - x[a]) * (w[i] - w[a]) - (w[b] - w[a]) * (x[i] - x[a])
+            if cross < 0:
+                break
+            hull.pop()
+        hull.append(i)
+    return np.array(hull, dtype=int)
+
+
+def p_hull_max(loo, x, w, slope, removed):
+    """Highest w - slope * x of the points that are not removed.
+
+    The best hull vertex follows from a binary search on the hull edges.
+    Only when that vertex is removed all points are scanned.
+    """
+    hull = loo["line_hull"]
+    edges = np.diff(w[hull]) / np.diff(x[hull])
+    best = hull[np.searchsorted(-edges, -slope, side="left")]
+    if best not in removed:
+        return w[best] - slope * x[best]
+
+    kept = np.ones(len(x), dtype=bool)
+    kept[removed] = False
+    if not kept.any():
+        return float("nan")
+    return np.max(w[kept] - slope * x[kept])
+
+
+def p_loo_scope(loo, removed):
+    """Empirical scope of the data without the removed positions."""
+    return p_order_scope(loo, removed)
+
+
+def p_order_stats(loop_data):
+    """Order statistics of X and Y, for the empirical scope after removals."""
+    x_vals = loop_data["x"].to_numpy(dtype=float)
+    y_vals = loop_data["y"].to_numpy(dtype=float)
+    return {
+        "index": loop_data["x"].index,
+        "x_vals": x_vals,
+        "y_vals": y_vals,
+        "x_order": np.argsort(x_vals, kind="stable"),
+        "y_order": np.argsort(y_vals, kind="stable"),
+    }
+
+
+def p_order_scope(stats, removed):
+    """Empirical scope without the removed positions, from the order statistics.
+
+    Only the len(removed) + 1 most extreme values of every side are read.
+    """
+    x_vals = stats["x_vals"]
+    y_vals = stats["y_vals"]
+
+    def first_kept(order):
+        for pos in order[: len(removed) + 1]:
+            if pos not in removed:
+                return pos
+        return None
+
+    ends = [
+        first_kept(stats["x_order"]),
+        first_kept(stats["x_order"][::-1]),
+        first_kept(stats["y_order"]),
+        first_kept(stats["y_order"][::-1]),
+    ]
+    if any(pos is None for pos in ends):
+        return [float("nan")] * 4
+
+    return [x_vals[ends[0]], x_vals[ends[1]], y_vals[ends[2]], y_vals[ends[3]]]
+
+
+def p_order_extremes(stats, k):
+    """Positions of which removing at most k changes the empirical scope.
+
+    On every side these are the values beyond the (k + 1)-th most extreme
+    value; ties with that value keep the side in place.
+    """
+    extremes = []
+    for values, order in ((stats["x_vals"], stats["x_order"]), (stats["y_vals"], stats["y_order"])):
+        for side in (order, order[::-1]):
+            if len(side) <= k:
+                extremes.extend(side)
+                continue
+            limit = values[side[k]]
+            extremes.extend(pos for pos in side[:k] if values[pos] != limit)
+
+    return list(dict.fromkeys(extremes))
+
+
+def p_loo_peers(loo, removed):
+    """Peers of the data without the removed positions.
+
+    Points that were only dominated by a run of removed peers lie in the box
+    between the kept peers before and after that run. The frontier is
+    recomputed for the kept peers and the points in these boxes only.
+    """
+    loop_data = loo["loop_data"]
+    n = len(loo["u"])
+    if n - len(removed) < 2:
+        return None
+
+    peers = loo["peers"]
+    is_removed = np.isin(peers, removed)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[peers[~is_removed]] = True
+
+    u = loo["u"]
+    v = loo["v"]
+    i = 0
+    while i < len(peers):
+        if not is_removed[i]:
+            i += 1
+            continue
+
+        j = i
+        while j < len(peers) and is_removed[j]:
+            j += 1
+
+        u_high = u[peers[j]] if j < len(peers) else np.inf
+        v_low = v[peers[i - 1]] if i > 0 else -np.inf
+        keep |= (u >= u[peers[i]]) & (u < u_high) & (v > v_low) & (v <= v[peers[j - 1]])
+        i = j
+
+    keep[removed] = False
+    candidates = {
+        "x": loop_data["x"].iloc[keep],
+        "y": loop_data["y"].iloc[keep],
+        "flip_x": loop_data["flip_x"],
+        "flip_y": loop_data["flip_y"],
+    }
+
+    if keep.sum() == 1:
+        return pd.DataFrame({"x": candidates["x"], "y": candidates["y"]})
+
+    return p_peers(candidates, vrs=loo["method"] == "vrs")
+
+
+def p_loo_bounds(loo, combo, candidates, r):
+    """Lower and upper effect size after removing combo and at most r candidates.
+
+    The ceiling zone only grows when the frontier drops and shrinks with the
+    scope, so the extremes follow from the frontier and scope of removing
+    nothing more and of removing the r most influential candidates.
+    """
+    positions = loo["index"].get_indexer(pd.Index(combo))
+    removed = np.unique(positions[positions >= 0])
+    options = loo["index"].get_indexer(pd.Index(candidates))
+    options = np.setdiff1d(options[options >= 0], removed)
+
+    # Scope of removing nothing more, and the smallest scope after r removals
+    emp_max = p_loo_scope(loo, removed)
+    emp_min = p_loo_scope_min(loo, removed, options, r)
+    if np.isnan(emp_max).any() or np.isnan(emp_min).any():
+        return float("nan"), float("inf")
+
+    theo_max = p_scope_theo(emp_max, loo["scope"])
+    theo_min = p_scope_theo(emp_min, loo["scope"])
+    area_max = (theo_max[1] - theo_max[0]) * (theo_max[3] - theo_max[2])
+    area_min = (theo_min[1] - theo_min[0]) * (theo_min[3] - theo_min[2])
+    if area_min <= 0:
+        return 0.0, float("inf")
+
+    loop_data = loo["loop_data"]
+    rect_max = p_loo_rect(theo_max, loop_data["flip_x"], loop_data["flip_y"])
+    rect_min = p_loo_rect(theo_min, loop_data["flip_x"], loop_data["flip_y"])
+
+    # Largest zone: lowest step frontier any r removals can leave. This is
+    # also a bound for VRS, which covers at least the FDH area
+    u_steps, v_steps = p_loo_lowest_frontier(loo, removed, options, r)
+    zone_max = p_zone_area(u_steps, v_steps, rect_max)
+
+    # Smallest zone: the frontier without further removals
+    peers = p_loo_peers(loo, removed)
+    if peers is None:
+        return float("nan"), float("inf")
+    u_peers = peers["x"].to_numpy(dtype=float) * (-1 if loop_data["flip_x"] else 1)
+    v_peers = peers["y"].to_numpy(dtype=float) * (-1 if loop_data["flip_y"] else 1)
+    zone_min = p_zone_area(u_peers, v_peers, rect_min, linear=loo["method"] == "vrs")
+
+    return zone_min / area_max, zone_max / area_min
+
+
+def p_loo_scope_min(loo, removed, options, r):
+    """Smallest empirical scope after removing at most r of the options."""
+    x_vals = loo["loop_data"]["x"].to_numpy(dtype=float)
+    y_vals = loo["loop_data"]["y"].to_numpy(dtype=float)
+
+    fixed = np.ones(len(x_vals), dtype=bool)
+    fixed[removed] = False
+    fixed[options] = False
+
+    def inner(values, last):
+        # The (r + 1)-th most extreme option can not be removed
+        kept = values[fixed]
+        extremes = np.sort(values[options])
+        if last:
+            extremes = extremes[::-1]
+        bounds = [kept.max() if last else kept.min()] if len(kept) > 0 else []
+        if len(extremes) > r:
+            bounds.append(extremes[r])
+        if not bounds:
+            return float("nan")
+        return max(bounds) if last else min(bounds)
+
+    return [inner(x_vals, False), inner(x_vals, True), inner(y_vals, False), inner(y_vals, True)]
+
+
+def p_loo_rect(theo, flip_x, flip_y):
+    """Scope in the coordinates of p_loo_data (u, v)."""
+    u_range = [-theo[1], -theo[0]] if flip_x else [theo[0], theo[1]]
+    v_range = [-theo[3], -theo[2]] if flip_y else [theo[2], theo[3]]
+    return u_range + v_range
+
+
+def p_loo_lowest_frontier(loo, removed, options, r):
+    """Step frontier that stays after removing any r of the options.
+
+    A level is still reached when a point outside the options reaches it, or
+    when more than r options do.
+    """
+    order = loo["u_order"]
+    u = loo["u"][order]
+    v = loo["v"][order]
+
+    is_removed = np.isin(order, removed)
+    is_option = np.isin(order, options)
+
+    heights = np.where(is_removed | is_option, -np.inf, v)
+
+    # Height reached by the (r + 1)-th highest option so far
+    option_heights = np.full(len(order), -np.inf)
+    highest = []
+    for i in np.flatnonzero(is_option):
+        heapq.heappush(highest, v[i])
+        if len(highest) > r + 1:
+            heapq.heappop(highest)
+        if len(highest) == r + 1:
+            option_heights[i] = highest[0]
+
+    heights = np.maximum(heights, option_heights)
+    return u, np.maximum.accumulate(heights)
+
+
+def p_zone_area(u, v, rect, linear=False):
+    """Area of rect that is not covered by the frontier through (u, v).
+
+    Points are sorted on u with v rising. A point covers everything right
+    of and below it. Linear frontiers (VRS) connect the points with lines.
+    """
+    u_low, u_high, v_low, v_high = rect
+    total = (u_high - u_low) * (v_high - v_low)
+    if len(u) == 0:
+        return total
+
+    if not linear:
+        starts = np.clip(u, u_low, u_high)
+        ends = np.clip(np.append(u[1:], np.inf), u_low, u_high)
+        heights = np.clip(v, v_low, v_high) - v_low
+        return total - float(np.sum((ends - starts) * heights))
+
+    covered = 0.0
+    for i in range(len(u)):
+        if i + 1 < len(u):
+            covered += p_clipped_integral(u[i], u[i + 1], v[i], v[i + 1], rect)
+        else:
+            covered += p_clipped_integral(u[i], np.inf, v[i], v[i], rect)
+
+    return total - covered
+
+
+def p_clipped_integral(u1, u2, v1, v2, rect):
+    """Integral of the line from (u1, v1) to (u2, v2), clipped to rect, above v_low."""
+    u_low, u_high, v_low, v_high = rect
+    start = max(u1, u_low)
+    end = min(u2, u_high)
+    if end <= start:
+        return 0.0
+
+    def height(u):
+        if v1 == v2 or np.isinf(u2):
+            return v1
+        return v1 + (u - u1) * (v2 - v1) / (u2 - u1)
+
+    # Split the line where it crosses the bottom and top of rect
+    points = [start, end]
+    if v1 != v2 and not np.isinf(u2):
+        for level in (v_low, v_high):
+            cross = u1 + (level - v1) * (u2 - u1) / (v2 - v1)
+            if start < cross < end:
+                points.append(cross)
+    points = sorted(points)
+
+    area = 0.0
+    for a, b in zip(points[:-1], points[1:]):
+        h_a = min(max(height(a), v_low), v_high) - v_low
+        h_b = min(max(height(b), v_low), v_high) - v_low
+        area += 0.5 * (h_a + h_b) * (b - a)
+
+    return area
@@ -37,32 +37,10 @@ def p_create_loop_data(x, y, scope, flip_x, flip_y, id_x, qr_tau):
     # Define the scope params
     scope_emp = [np.min(x_clean), np.max(x_clean), np.min(y_clean), np.max(y_clean)]
 
-    if current_scope is None:
-        scope_theo = scope_emp
-    else:
-        s = current_scope
-
-        # min_x
-        v1 = [scope_emp[0], s[0], s[1]]
-        v1 = [v for v in v1 if not np.isnan(v)]
-        min_x = np.min(v1)
-
-        # max_x
-        v2 = [scope_emp[1], s[0], s[1]]
-        v2 = [v for v in v2 if not np.isnan(v)]
-        max_x = np.max(v2)
+    scope_theo = p_scope_theo(scope_emp, current_scope)
 
-        # min_y
-        v3 = [scope_emp[2], s[2], s[3]]
-        v3 = [v for v in v3 if not np.isnan(v)]
-        min_y = np.min(v3)
-
-        # max_y
-        v4 = [scope_emp[3], s[2], s[3]]
-        v4 = [v for v in v4 if not np.isnan(v)]
-        max_y = np.max(v4)
-
-        scope_theo = [min_x, max_x, min_y, max_y]
+    if current_scope is not None:
+        s = current_scope
 
         s_x_sorted = np.sort([s[0], s[1]])
         t_x_sorted = np.sort([scope_theo[0], scope_theo[1]])
@@ -77,9 +55,14 @@ def p_create_loop_data(x, y, scope, flip_x, flip_y, id_x, qr_tau):
 
     scope_area = (scope_theo[1] - scope_theo[0]) * (scope_theo[3] - scope_theo[2])
 
+    # Shared by the bottleneck and case count calculations of all ceilings
+    x_sorted = np.sort(x_clean.to_numpy(dtype=float))
+
     return {
         "x": x_clean,
         "y": y_clean,
+        "x_sorted": x_sorted,
+        "x_sorted_flip": -x_sorted[::-1],
         "idx": id_x,
         "scope_emp": scope_emp,
         "scope_theo": scope_theo,
@@ -89,3 +72,33 @@ def p_create_loop_data(x, y, scope, flip_x, flip_y, id_x, qr_tau):
         "flip_y": flip_y,
         "qr_tau": qr_tau,
     }
+
+
+def p_scope_theo(scope_emp, scope):
+    """Theoretical scope: the given scope extended to include the empirical scope."""
+    if scope is None:
+        return scope_emp
+
+    s = scope
+
+    # min_x
+    v1 = [scope_emp[0], s[0], s[1]]
+    v1 = [v for v in v1 if not np.isnan(v)]
+    min_x = np.min(v1)
+
+    # max_x
+    v2 = [scope_emp[1], s[0], s[1]]
+    v2 = [v for v in v2 if not np.isnan(v)]
+    max_x = np.max(v2)
+
+    # min_y
+    v3 = [scope_emp[2], s[2], s[3]]
+    v3 = [v for v in v3 if not np.isnan(v)]
+    min_y = np.min(v3)
+
+    # max_y
+    v4 = [scope_emp[3], s[2], s[3]]
+    v4 = [v for v in v4 if not np.isnan(v)]
+    max_y = np.max(v4)
+
+    return [min_x, max_x, min_y, max_y]
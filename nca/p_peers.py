@@ -1,3 +1,5 @@
+import bisect
+
 import numpy as np
 import pandas as pd
 
@@ -68,6 +70,66 @@ def p_peers(loop_data, vrs=False):
     return peers_df
 
 
+def p_peer_layers(loop_data, k=None, vrs=False):
+    """Peer layer of every observation.
+
+    Layer 1 are the peers, layer 2 the peers after removing layer 1, etc.
+    FDH layers of all observations follow from one sweep over the sorted
+    data. VRS layers peel the hull k times, deeper observations get k + 1.
+    """
+    x = loop_data["x"]
+    y = loop_data["y"]
+    layers = np.zeros(len(x), dtype=int)
+
+    if vrs:
+        remaining = np.ones(len(x), dtype=bool)
+        layer = 1
+        while remaining.any() and (k is None or layer <= k):
+            peers = p_peers(
+                {
+                    "x": x[remaining],
+                    "y": y[remaining],
+                    "flip_x": loop_data["flip_x"],
+                    "flip_y": loop_data["flip_y"],
+                },
+                vrs=True,
+            )
+            positions = (
+                np.flatnonzero(remaining) if peers is None else x.index.get_indexer(peers.index)
+            )
+            layers[positions] = layer
+            remaining[positions] = False
+            layer += 1
+        layers[remaining] = layer
+        return pd.Series(layers, index=x.index)
+
+    # Coordinates where the peers run up and to the right
+    u = x.to_numpy(dtype=float) * (-1 if loop_data["flip_x"] else 1)
+    v = y.to_numpy(dtype=float) * (-1 if loop_data["flip_y"] else 1)
+
+    # Observations with the same u come highest first, so every observation
+    # comes after the ones dominating it. Each layer keeps its highest v, an
+    # observation joins the first layer that does not reach its v.
+    order = np.lexsort((-v, u))
+    tails = []  # -highest v per layer, ascending
+    prev = None
+    for pos in order:
+        if prev is not None and u[pos] == u[prev] and v[pos] == v[prev]:
+            # Duplicates are peers together
+            layers[pos] = layers[prev]
+            continue
+
+        i = bisect.bisect_right(tails, -v[pos])
+        if i == len(tails):
+            tails.append(-v[pos])
+        else:
+            tails[i] = -v[pos]
+        layers[pos] = i + 1
+        prev = pos
+
+    return pd.Series(layers, index=x.index)
+
+
 def p_invalid_peers(peers, x3, y3, flip_x, flip_y):
     if len(peers) < 2:
         return False
@@ -153,7 +215,8 @@ def p_aggregate_peers(model_peers, x):
             #    current_peers = model_peers[ceiling][keys[x-1]]
             pass
 
-        if current_peers is not None:
+        # Line peers of COLS and QR are arrays without row names
+        if isinstance(current_peers, pd.DataFrame):
             peers_list.append(current_peers)
 
     if not peers_list:
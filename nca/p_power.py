@@ -0,0 +1,227 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import beta
+
+from .nca_random import p_values
+from .p_ceiling import p_nca_wrapper
+from .p_loop_data import p_create_loop_data
+
+# Ceilings with a batched effect kernel, the others are analysed per dataset
+P_POWER_KERNELS = ["ce_fdh", "cr_fdh"]
+
+# Theoretical scope of the simulated data
+P_POWER_SCOPE = [0, 1, 0, 1]
+
+# Number of values in one batch of permuted datasets
+P_POWER_CHUNK = 2_000_000
+
+# Number of repetitions in one task of the grid
+P_POWER_BLOCK = 25
+
+# Number of permutations (cells x rep x test_rep) from which a pool pays off
+P_POWER_PARALLEL = 100_000
+
+# Confidence of the power interval for sequential stopping
+P_POWER_CONFIDENCE = 0.95
+
+
+def p_power_tasks(cells, seeds, blocks, open_cells, rep, test_rep, sequential=False):
+    """Next blocks of P_POWER_BLOCK repetitions of the open cells.
+
+    Every block gets the next child of the seed sequence of its cell, so a
+    block draws the same numbers on any worker, and the blocks of a
+    sequential run are those of a fixed run.
+    """
+    tasks = []
+    for cell_index in open_cells:
+        done = sum(len(values) for _, values in blocks[cell_index])
+        sizes = [min(P_POWER_BLOCK, rep - start) for start in range(done, rep, P_POWER_BLOCK)]
+        if sequential:
+            sizes = sizes[:1]
+
+        first = len(blocks[cell_index])
+        for i, (size, seed) in enumerate(zip(sizes, seeds[cell_index].spawn(len(sizes)))):
+            tasks.append((cell_index, first + i, seed, cells[cell_index], size, test_rep))
+
+    return tasks
+
+
+def p_power_interval(significant, rep, confidence=P_POWER_CONFIDENCE):
+    """Clopper-Pearson interval of the power, significant out of rep."""
+    alpha = 1 - confidence
+    lower, upper = 0.0, 1.0
+    if significant > 0:
+        lower = float(beta.ppf(alpha / 2, significant, rep - significant + 1))
+    if significant < rep:
+        upper = float(beta.ppf(1 - alpha / 2, significant + 1, rep - significant))
+    return lower, upper
+
+
+def p_power_task(task):
+    """P-values of one block of repetitions, tagged with its cell and block."""
+    cell_index, block_index, seed, cell, size, test_rep = task
+    pvalues = p_power_cell(
+        np.random.default_rng(seed),
+        cell["ceiling"],
+        int(cell["n"]),
+        cell["intercept"],
+        cell["slope"],
+        cell["distr.x"],
+        cell["distr.y"],
+        size,
+        test_rep,
+    )
+    return cell_index, block_index, pvalues
+
+
+def p_power_cell(rng, ceiling, n, intercept, slope, distr_x, distr_y, rep, test_rep):
+    """P-values of the permutation test of rep simulated datasets of one cell."""
+    x, y = p_power_sample(rng, rep, n, intercept, slope, distr_x, distr_y)
+
+    if ceiling not in P_POWER_KERNELS:
+        return np.array([p_power_pvalue(rng, ceiling, x[r], y[r], test_rep) for r in range(rep)])
+
+    # The permutations move Y along the X values, sorted once per dataset
+    order = np.argsort(x, axis=1)
+    x = np.take_along_axis(x, order, axis=1)
+    y = np.take_along_axis(y, order, axis=1)
+    observed = p_power_effects(ceiling, x, y)
+
+    pvalues = np.empty(rep)
+    chunk = max(1, P_POWER_CHUNK // (max(1, test_rep) * n))
+    for start in range(0, rep, chunk):
+        rows = slice(start, start + chunk)
+        y_perm = rng.permuted(np.repeat(y[rows, None, :], test_rep, axis=1), axis=2)
+        nulls = p_power_effects(ceiling, x[rows, None, :], y_perm)
+        pvalues[rows] = p_power_pvalues(nulls, observed[rows], test_rep)
+
+    return pvalues
+
+
+def p_power_sample(rng, rep, n, intercept, slope, distr_x, distr_y):
+    """X and Y of rep datasets of n points below the line (corner 1), as in nca_random.
+
+    Candidates are drawn for all datasets at once, every dataset takes its
+    first accepted candidates until it has n points.
+    """
+    x = np.empty((rep, n))
+    y = np.empty((rep, n))
+    count = np.zeros(rep, dtype=int)
+    drawn = accepted = 0
+
+    while True:
+        active = np.flatnonzero(count < n)
+        if len(active) == 0:
+            return x, y
+
+        need = n - count[active]
+        rate = max(accepted / drawn, 0.01) if drawn > 0 else 0.5
+        size = int(np.ceil(need.max() / rate * 1.2)) + 8
+
+        x_new = p_values(distr_x, 0.5, 0.2, (len(active), size), rng)
+        y_new = p_values(distr_y, 0.5, 0.2, (len(active), size), rng)
+        ok = y_new < np.minimum(1, intercept + slope * x_new)
+        drawn += ok.size
+        accepted += ok.sum()
+
+        rank = np.cumsum(ok, axis=1)
+        take = ok & (rank <= need[:, None])
+        rows, cols = np.nonzero(take)
+        positions = count[active][rows] + rank[rows, cols] - 1
+        x[active[rows], positions] = x_new[rows, cols]
+        y[active[rows], positions] = y_new[rows, cols]
+        count[active] += take.sum(axis=1)
+
+
+def p_power_effects(ceiling, x, y):
+    """Effect sizes of datasets along the last axis, with X sorted ascending.
+
+    X and Y broadcast, so a set of permuted Y values shares its X values.
+    """
+    t0, t1, t2, t3 = P_POWER_SCOPE
+    area = (t1 - t0) * (t3 - t2)
+    heights = np.maximum.accumulate(y, axis=-1)
+
+    if ceiling == "ce_fdh":
+        # Left of the first point, and above the steps up to the next point
+        gaps = np.diff(x, axis=-1, append=t1)
+        zone = (x[..., 0] - t0) * (t3 - t2) + np.sum(gaps * (t3 - heights), axis=-1)
+        return zone / area
+
+    # CR-FDH: least squares line through the peers, the points above all
+    # points with a smaller X
+    previous = np.concatenate(
+        [np.full(heights.shape[:-1] + (1,), -np.inf), heights[..., :-1]], axis=-1
+    )
+    peers = y > previous
+    x = np.broadcast_to(x, y.shape)
+
+    m = peers.sum(axis=-1)
+    sx = np.sum(x * peers, axis=-1)
+    sy = np.sum(y * peers, axis=-1)
+    sxx = np.sum(x * x * peers, axis=-1)
+    sxy = np.sum(x * y * peers, axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (m * sxy - sx * sy) / (m * sxx - sx * sx)
+        intercept = (sy - slope * sx) / m
+        ceiling = p_power_line_ceiling(slope, intercept)
+
+    # A single peer has no line, and no ceiling zone
+    return np.where(m > 1, ceiling, 0) / area
+
+
+def p_power_line_ceiling(slope, intercept):
+    """p_ceiling for arrays of lines, without flips."""
+    t0, t1, t2, t3 = P_POWER_SCOPE
+    area = (t1 - t0) * (t3 - t2)
+
+    y_left = slope * t0 + intercept
+    y_right = slope * t1 + intercept
+
+    # Rising lines, cut off at the bottom and the top of the scope
+    x_low = np.where(y_left < t2, (t2 - intercept) / slope, t0)
+    y_low = np.where(y_left < t2, t2, y_left)
+    x_high = np.where(y_right > t3, (t3 - intercept) / slope, t1)
+    y_high = np.where(y_right > t3, t3, y_right)
+    rising = (
+        0.5 * (x_high - x_low) * (y_high - y_low)
+        + (t1 - t0) * (t3 - y_high)
+        + (x_low - t0) * (t3 - t2)
+        - (x_low - t0) * (t3 - y_high)
+    )
+
+    return np.select(
+        [
+            np.isnan(slope) | np.isnan(intercept) | (slope < 0),
+            (y_left > t3) & (y_right > t3),
+            (y_left < t2) & (y_right < t2),
+            slope == 0,
+        ],
+        [np.nan, np.nan, area, (t1 - t0) * (t3 - intercept)],
+        rising,
+    )
+
+
+def p_power_pvalues(nulls, observed, test_rep):
+    """P-values of p_test, for the null effects along the last axis."""
+    valid = ~np.isnan(nulls)
+    count = np.sum(valid & (nulls >= observed[..., None]), axis=-1)
+    pvalues = (count + 1) / (valid.sum(axis=-1) + 1)
+    return np.maximum(pvalues, 1 / test_rep)
+
+
+def p_power_pvalue(rng, ceiling, x, y, test_rep):
+    """P-value of the permutation test of one dataset, for any ceiling."""
+    loop_data = p_create_loop_data(
+        pd.DataFrame({"X": x}), pd.Series(y, name="Y"), [P_POWER_SCOPE], [False], False, 0, 0.95
+    )
+    observed = p_nca_wrapper(ceiling, loop_data, None, [])["effect"]
+
+    nulls = np.empty(test_rep)
+    for i in range(test_rep):
+        ld = dict(loop_data)
+        ld["y"] = pd.Series(y[rng.permutation(len(y))])
+        nulls[i] = p_nca_wrapper(ceiling, ld, None, [])["effect"]
+
+    return p_power_pvalues(nulls, np.asarray(observed), test_rep)
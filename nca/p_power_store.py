@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import uuid
+
+import numpy as np
+import pandas as pd
+
+P_STORE_FORMATS = {".csv": "csv", ".parquet": "parquet", ".sqlite": "sqlite", ".db": "sqlite"}
+
+# Columns that identify the run and the cell of a stored row
+P_STORE_RUN = ["run.seed", "run.rep", "run.test_rep", "run.p", "run.tolerance"]
+P_STORE_CELL = ["n", "ES", "slope", "ceiling", "distr.x", "distr.y"]
+
+# Every row has all result columns, so fixed and sequential runs share a store
+P_STORE_RESULT = ["p", "power", "rep", "ci.lower", "ci.upper"]
+P_STORE_COLUMNS = ["cell"] + P_STORE_CELL + P_STORE_RESULT + P_STORE_RUN
+
+
+def p_open_power_store(path):
+    """Prepare the result store of a resumable nca_power run.
+
+    The format follows the extension: rows are appended to a CSV file,
+    written as one part per cell to a Parquet directory, or inserted in
+    the 'power' table of a SQLite database.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in P_STORE_FORMATS:
+        raise ValueError(
+            f"The power store needs to be one of {', '.join(P_STORE_FORMATS)} files!\n"
+        )
+
+    return {"path": path, "format": P_STORE_FORMATS[extension]}
+
+
+def p_read_power_store(store):
+    """All stored rows, an empty data frame for a new store."""
+    path = store["path"]
+    if not os.path.exists(path):
+        return pd.DataFrame()
+
+    if store["format"] == "csv":
+        return pd.read_csv(path, dtype={"run.seed": str}, float_precision="round_trip")
+
+    if store["format"] == "parquet":
+        if len(os.listdir(path)) == 0:
+            return pd.DataFrame()
+        return pd.read_parquet(path)
+
+    with sqlite3.connect(path) as connection:
+        exists = connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'power'"
+        ).fetchone()
+        if exists is None:
+            return pd.DataFrame()
+        return pd.read_sql("SELECT * FROM power", connection, dtype={"run.seed": str})
+
+
+def p_store_run(rep, test_rep, p, tolerance, sequence):
+    """The run columns of a stored row, the seed sequence as a JSON object.
+
+    The entropy can be an integer or a sequence of integers. The number of
+    spawned children is kept, so the rebuilt sequence spawns the same cells.
+    """
+    entropy = sequence.entropy
+    entropy = int(entropy) if np.ndim(entropy) == 0 else [int(part) for part in entropy]
+    seed = json.dumps(
+        {
+            "entropy": entropy,
+            "spawn_key": [int(part) for part in sequence.spawn_key],
+            "n_children_spawned": int(sequence.n_children_spawned),
+        },
+        sort_keys=True,
+    )
+    return {
+        "run.seed": seed,
+        "run.rep": rep,
+        "run.test_rep": test_rep,
+        "run.p": p,
+        "run.tolerance": np.nan if tolerance is None else tolerance,
+    }
+
+
+def p_store_seed(stored, run):
+    """Seed of an earlier run with the same settings, to resume a run without a seed."""
+    if len(stored) == 0:
+        return None
+
+    match = p_match_run(stored, run, seed=False)
+    if not match.any():
+        return None
+
+    seed = json.loads(stored.loc[match, "run.seed"].iloc[-1])
+    return np.random.SeedSequence(
+        seed["entropy"],
+        spawn_key=seed["spawn_key"],
+        n_children_spawned=seed["n_children_spawned"],
+    )
+
+
+def p_stored_cells(stored, run, cells):
+    """Rows of the cells completed by a run with the same settings and seed."""
+    if len(stored) == 0:
+        return {}
+
+    done = {}
+    for _, row in stored[p_match_run(stored, run)].iterrows():
+        cell_index = int(row["cell"])
+        if cell_index < len(cells) and p_same_cell(row, cells[cell_index]):
+            done[cell_index] = row.drop(["cell"] + P_STORE_RUN).dropna().to_dict()
+
+    return done
+
+
+def p_match_run(stored, run, seed=True):
+    match = np.ones(len(stored), dtype=bool)
+    for column in P_STORE_RUN:
+        if column == "run.seed":
+            if seed:
+                match &= stored[column].astype(str).to_numpy() == run[column]
+            continue
+
+        values = stored[column].to_numpy(dtype=float)
+        if np.isnan(run[column]):
+            match &= np.isnan(values)
+        else:
+            match &= np.isclose(values, run[column])
+
+    return match
+
+
+def p_same_cell(row, cell):
+    for column in P_STORE_CELL:
+        if isinstance(cell[column], str):
+            if str(row[column]) != cell[column]:
+                return False
+        elif not np.isclose(float(row[column]), float(cell[column])):
+            return False
+    return True
+
+
+def p_write_power_store(store, cell_index, row, run):
+    """Store the row of one completed cell."""
+    row = dict({"rep": run["run.rep"]}, **row)
+    rows = pd.DataFrame([dict(row, cell=cell_index, **run)]).reindex(columns=P_STORE_COLUMNS)
+    path = store["path"]
+
+    if store["format"] == "csv":
+        first = not os.path.exists(path)
+        rows.to_csv(path, mode="w" if first else "a", header=first, index=False)
+        return
+
+    if store["format"] == "parquet":
+        os.makedirs(path, exist_ok=True)
+        rows.to_parquet(os.path.join(path, f"part-{cell_index}-{uuid.uuid4().hex}.parquet"))
+        return
+
+    with sqlite3.connect(path) as connection:
+        rows.to_sql("power", connection, if_exists="append", index=False)
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# A table holds the power of designs, a design is one combination of the key
+P_TABLE_KEY = ["ceiling", "distr.x", "distr.y", "slope", "p", "test_rep"]
+P_TABLE_COLUMNS = P_TABLE_KEY + ["n", "ES", "power", "rep"]
+
+
+def p_read_power_table(path):
+    """The rows of a power table, repeated points pooled over their repetitions."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=P_TABLE_COLUMNS)
+
+    table = pd.read_csv(path)
+    table["significant"] = table["power"] * table["rep"]
+    table = table.groupby(P_TABLE_KEY + ["n", "ES"], as_index=False, sort=False)[
+        ["significant", "rep"]
+    ].sum()
+    table["power"] = table["significant"] / table["rep"]
+
+    return table[P_TABLE_COLUMNS]
+
+
+def p_write_power_table(path, results, p, test_rep, rep):
+    """Append the rows of an nca_power result to a power table.
+
+    Rows of sequential runs carry their own number of repetitions.
+    """
+    rows = results.assign(p=p, test_rep=test_rep)
+    if "rep" not in rows.columns:
+        rows["rep"] = rep
+
+    first = not os.path.exists(path)
+    rows[P_TABLE_COLUMNS].to_csv(path, mode="w" if first else "a", header=first, index=False)
+
+
+def p_design_rows(table, ceiling, distr_x, distr_y, slope, p, test_rep):
+    """The tabulated points of one design."""
+    if len(table) == 0:
+        return table
+
+    match = (
+        (table["ceiling"] == ceiling)
+        & (table["distr.x"] == distr_x)
+        & (table["distr.y"] == distr_y)
+        & np.isclose(table["slope"].astype(float), slope)
+        & np.isclose(table["p"].astype(float), p)
+        & (table["test_rep"] == test_rep)
+    )
+    return table[match]
+
+
+def p_interpolate_power(rows, n, effect):
+    """Power, standard error and source at (n, effect) from the tabulated points of a design.
+
+    The power grows with n and with the effect size, so every point with a
+    smaller (or equal) n and effect is a lower bound and every point with a
+    larger n and effect an upper bound. The estimate lies between the
+    tightest bounds, in log n and effect. Its standard error combines the
+    simulation error of the bounds with a uniform spread over the gap
+    between them. Without a bound on both sides the error is infinite.
+    """
+    if len(rows) == 0:
+        return np.nan, np.inf, "interpolated"
+
+    rows_n = rows["n"].to_numpy(dtype=float)
+    rows_es = rows["ES"].to_numpy(dtype=float)
+    power = rows["power"].to_numpy(dtype=float)
+    rep = rows["rep"].to_numpy(dtype=float)
+
+    se = p_power_se(power, rep)
+
+    exact = np.isclose(rows_n, n) & np.isclose(rows_es, effect)
+    if exact.any():
+        i = np.flatnonzero(exact)[0]
+        return power[i], se[i], "table"
+
+    below = np.flatnonzero((rows_n <= n) & (rows_es <= effect))
+    above = np.flatnonzero((rows_n >= n) & (rows_es >= effect))
+    if len(below) == 0 or len(above) == 0:
+        return np.nan, np.inf, "interpolated"
+
+    low = below[np.argmax(power[below])]
+    high = above[np.argmin(power[above])]
+
+    # Position between the bounds, on the axes where they differ
+    positions = []
+    if rows_n[high] > rows_n[low]:
+        positions.append(np.log(n / rows_n[low]) / np.log(rows_n[high] / rows_n[low]))
+    if rows_es[high] > rows_es[low]:
+        positions.append((effect - rows_es[low]) / (rows_es[high] - rows_es[low]))
+    t = np.mean(positions)
+
+    # Simulation noise can invert the bounds, the gap is then closed
+    gap = max(power[high] - power[low], 0)
+    estimate = (1 - t) * power[low] + t * power[high]
+    if gap == 0:
+        estimate = (power[low] + power[high]) / 2
+
+    error = np.sqrt(((1 - t) * se[low]) ** 2 + (t * se[high]) ** 2 + gap**2 / 12)
+    return estimate, error, "interpolated"
+
+
+def p_power_se(power, rep):
+    """Simulation error of a power, with the zero variance at 0 or 1 avoided."""
+    shrunk = (power * rep + 1) / (rep + 2)
+    return np.sqrt(shrunk * (1 - shrunk) / rep)
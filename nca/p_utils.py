@@ -1,12 +1,14 @@
 import math
 import multiprocessing
+import os
 import platform
 import warnings
 
 import numpy as np
 
-# Global variable to hold the pool if we use one
+# Global variable to hold the pool if we use one, and the process that owns it
 _pool = None
+_pool_pid = None
 
 
 def p_generate_title(x_name, y_name):
@@ -219,28 +221,71 @@ def p_accuracy(loop_data, above):
 
 
 def p_start_cluster(condition):
+    """Start the worker pool if condition holds and no pool is running.
+
+    Returns True when this call created the pool. Nested analyses reuse a
+    running pool, only the caller that created it may shut it down.
+    """
+    global _pool, _pool_pid
+    if p_get_pool() is not None or not condition:
+        return False
+
+    if "windows" in platform.system().lower():
+        print("Preparing the analysis, this might take a few seconds...")
+
+    try:
+        cores = multiprocessing.cpu_count()
+        _pool = multiprocessing.Pool(processes=cores)
+        _pool_pid = os.getpid()
+    except Exception as e:
+        print(f"Failed to start cluster: {e}")
+        return False
+
+    return True
+
+
+def p_get_pool():
+    """The running worker pool, or None.
+
+    Worker processes inherit a copy of the pool object, they never use it.
+    """
     global _pool
-    if condition:
-        if "windows" in platform.system().lower():
-            print("Preparing the analysis, this might take a few seconds...")
+    if _pool is not None and _pool_pid != os.getpid():
+        _pool = None
+    return _pool
 
-        try:
-            cores = multiprocessing.cpu_count()
-            _pool = multiprocessing.Pool(processes=cores)
-        except Exception as e:
-            print(f"Failed to start cluster: {e}")
-    else:
-        # Do parallel, this prohibits warnings on %dopar%
-        # In Python, we just don't use the pool.
-        if _pool:
-            _pool.close()
-            _pool.join()
-            _pool = None
-
-
-def p_cluster_cleanup():
+
+def p_cluster_cleanup(owned=True):
+    """Shut down the worker pool, if owned (the result of p_start_cluster)."""
     global _pool
-    if _pool:
+    if owned and p_get_pool() is not None:
         _pool.close()
         _pool.join()
         _pool = None
+
+
+def p_seed_sequence(random_state=None):
+    """Seed sequence of a random_state, the root of all random streams of a call.
+
+    random_state is an int, a SeedSequence, a Generator, or None to draw the
+    seed from the global numpy state (so np.random.seed still applies). A
+    SeedSequence is copied, every call with it spawns the same children.
+    """
+    if isinstance(random_state, np.random.SeedSequence):
+        return np.random.SeedSequence(
+            random_state.entropy,
+            spawn_key=random_state.spawn_key,
+            n_children_spawned=random_state.n_children_spawned,
+        )
+    if isinstance(random_state, np.random.Generator):
+        return np.random.SeedSequence(int(random_state.integers(2**63)))
+    if random_state is None:
+        return np.random.SeedSequence(int(np.random.randint(2**63, dtype=np.int64)))
+    return np.random.SeedSequence(random_state)
+
+
+def p_rng(seed):
+    """Generator of a seed sequence, or the global numpy state without one."""
+    if seed is None:
+        return np.random
+    return np.random.default_rng(seed)
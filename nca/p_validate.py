@@ -1,5 +1,6 @@
 import warnings
 
+import numpy as np
 import pandas as pd
 
 from . import p_loop_data
@@ -9,21 +10,55 @@ from .p_constants import CEILINGS
 def p_validate_clean(data, x, y, outliers=False):
     """Validate and clean input data.
 
+    Only the x and y columns are read. Numeric columns are used as they are,
+    without a copy, other columns are converted with NaN for values that are
+    not numbers. The data is a DataFrame, a dict of arrays, or a 2D NumPy
+    array with x and y as column positions.
+
     Note: outliers parameter is kept for API compatibility with R version.
     """
     _ = outliers  # API compatibility
-    if not isinstance(y, str) and len(y) != 1:
+    if isinstance(y, (list, tuple, pd.Index, np.ndarray)) and len(y) != 1:
         raise ValueError("Dependent variable can only be a single column!\n\n")
 
-    data_clean = data.copy()
-    for col in data_clean.columns:
-        data_clean[col] = pd.to_numeric(data_clean[col], errors="coerce")
+    names = []
+    for name in p_column_names(x) + p_column_names(y):
+        if name not in names:
+            names.append(name)
+    data_clean = p_numeric_columns(data, names)
 
     p_loop_data.scope_warnings_nca = False
 
     return {"x": data_clean[x], "y": data_clean[y]}
 
 
+def p_column_names(columns):
+    if isinstance(columns, (list, tuple, pd.Index, np.ndarray)):
+        return list(columns)
+    return [columns]
+
+
+def p_numeric_columns(data, names):
+    """Data frame of the named columns, sharing the memory of numeric columns."""
+    if isinstance(data, np.ndarray) and data.dtype.names is None:
+        if data.ndim != 2:
+            raise ValueError(
+                "A NumPy array needs 2 dimensions, with x and y as column positions!\n"
+            )
+        columns = {name: pd.Series(data[:, name], copy=False) for name in names}
+    elif isinstance(data, pd.DataFrame):
+        columns = {name: data[name] for name in names}
+    else:
+        # Dicts of arrays and structured arrays
+        columns = {name: pd.Series(data[name], copy=False) for name in names}
+
+    for name, values in columns.items():
+        if not pd.api.types.is_numeric_dtype(values):
+            columns[name] = pd.to_numeric(values, errors="coerce")
+
+    return pd.DataFrame(columns, copy=False)
+
+
 def p_validate_ceilings(methods):
     if methods is None:
         methods = []
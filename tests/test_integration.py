@@ -334,6 +334,7 @@ class TestVersionAndImports:
         assert hasattr(nca, 'nca_random')
         assert hasattr(nca, 'nca_outliers')
         assert hasattr(nca, 'nca_power')
+        assert hasattr(nca, 'nca_bottleneck_query')
         
         # Check they are callable
         assert callable(nca.nca_analysis)
@@ -2,6 +2,7 @@ import os
 import sys
 import unittest
 
+import numpy as np
 import pandas as pd
 
 # Add the parent directory to sys.path to import nca
@@ -9,6 +10,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from nca.nca import nca_analysis
 from nca.nca_random import nca_random
+from nca.p_utils import p_cluster_cleanup, p_start_cluster
 
 
 class TestNCAAnalysis(unittest.TestCase):
@@ -56,5 +58,121 @@ class TestNCAAnalysis(unittest.TestCase):
             self.assertIn("outliers", outliers.columns)
 
 
+class TestRandomState(unittest.TestCase):
+    def setUp(self):
+        self.data = nca_random(40, [0.1, 0.2], [1, 0.8], random_state=1)
+        self.args = {"ceilings": ["ce_fdh", "ce_vrs"], "test_rep": 30}
+
+    def p_results(self, model):
+        tests = model["tests"]
+        return [model["summaries"][x]["params"].to_numpy(dtype=float) for x in ["X1", "X2"]] + [
+            tests[x][c]["data"] for x in tests for c in tests[x]
+        ]
+
+    def assertSameResults(self, first, second):
+        for a, b in zip(self.p_results(first), self.p_results(second)):
+            np.testing.assert_array_equal(a, b)
+
+    def test_seed_reproducible(self):
+        first = nca_analysis(self.data, ["X1", "X2"], "Y", random_state=3, **self.args)
+        second = nca_analysis(self.data, ["X1", "X2"], "Y", random_state=3, **self.args)
+        other = nca_analysis(self.data, ["X1", "X2"], "Y", random_state=4, **self.args)
+
+        self.assertSameResults(first, second)
+        self.assertFalse(np.array_equal(self.p_results(first)[2], self.p_results(other)[2]))
+
+    def test_generator_and_global_state(self):
+        first = nca_analysis(
+            self.data, ["X1", "X2"], "Y", random_state=np.random.default_rng(5), **self.args
+        )
+        second = nca_analysis(
+            self.data, ["X1", "X2"], "Y", random_state=np.random.default_rng(5), **self.args
+        )
+        self.assertSameResults(first, second)
+
+        # Without a random_state the seed comes from the global numpy state
+        np.random.seed(6)
+        first = nca_analysis(self.data, ["X1", "X2"], "Y", **self.args)
+        np.random.seed(6)
+        second = nca_analysis(self.data, ["X1", "X2"], "Y", **self.args)
+        self.assertSameResults(first, second)
+
+    def test_pool_reproducible(self):
+        serial = nca_analysis(self.data, ["X1", "X2"], "Y", random_state=7, **self.args)
+
+        owned = p_start_cluster(True)
+        try:
+            parallel = nca_analysis(self.data, ["X1", "X2"], "Y", random_state=7, **self.args)
+        finally:
+            p_cluster_cleanup(owned)
+
+        self.assertSameResults(serial, parallel)
+
+    def test_bootstrap_seeded(self):
+        # The bootstrap of the confidence ceilings draws from the seed of the analysis
+        from nca.p_confidence import p_bootstrap
+
+        y = np.sort(self.data["Y"].to_numpy())
+        columns = np.vstack([np.full(8, 5.0), np.zeros((4, 8))])
+        loop_data = {"conf": 0.95, "conf_rep": 50, "flip_y": False}
+        results = []
+        for seed in [1, 1, 2]:
+            loop_data["seed"] = np.random.SeedSequence(seed)
+            results.append(p_bootstrap(y, columns.copy(), loop_data))
+
+        np.testing.assert_array_equal(results[0], results[1])
+        self.assertFalse(np.array_equal(results[0], results[2]))
+
+    def test_random_data(self):
+        first = nca_random(50, 0.2, 0.8, distribution_x="normal", random_state=8)
+        second = nca_random(50, 0.2, 0.8, distribution_x="normal", random_state=8)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_outliers_reproducible(self):
+        from nca.nca_outliers import nca_outliers
+
+        data = self.data.iloc[:15]
+        first = nca_outliers(data, "X1", "Y", ceiling="ce_vrs", random_state=9)
+        second = nca_outliers(data, "X1", "Y", ceiling="ce_vrs", random_state=9)
+        pd.testing.assert_frame_equal(first, second)
+
+
 if __name__ == "__main__":
     unittest.main()
+
+
+class TestInputData(unittest.TestCase):
+    def setUp(self):
+        self.data = nca_random(60, [0.1, 0.2], [1, 0.8], random_state=4)
+        self.args = {"ceilings": ["ce_fdh", "cr_fdh"]}
+
+    def p_params(self, model, names):
+        return [model["summaries"][name]["params"].to_numpy(dtype=float) for name in names]
+
+    def test_only_referenced_columns(self):
+        from nca.p_validate import p_validate_clean
+
+        data = self.data.assign(Label=["a"] * len(self.data), Code=["1", "x"] * 30)
+        cleaned = p_validate_clean(data, ["X1", "Code"], "Y")
+
+        # Numeric columns share memory, text columns are converted
+        self.assertTrue(np.shares_memory(cleaned["y"].to_numpy(), data["Y"].to_numpy()))
+        self.assertEqual(list(cleaned["x"].columns), ["X1", "Code"])
+        self.assertEqual(cleaned["x"]["Code"].isna().sum(), 30)
+        self.assertEqual(data["Code"].iloc[0], "1")
+
+    def test_dict_and_array(self):
+        model = nca_analysis(self.data, ["X1", "X2"], "Y", **self.args)
+        expected = self.p_params(model, ["X1", "X2"])
+
+        columns = {name: self.data[name].to_numpy() for name in self.data.columns}
+        model = nca_analysis(columns, ["X1", "X2"], "Y", **self.args)
+        for a, b in zip(self.p_params(model, ["X1", "X2"]), expected):
+            np.testing.assert_array_equal(a, b)
+
+        model = nca_analysis(self.data.to_numpy(), [0, 1], 2, **self.args)
+        for a, b in zip(self.p_params(model, [0, 1]), expected):
+            np.testing.assert_array_equal(a, b)
+
+        model = nca_analysis(self.data.to_numpy(), 1, 2, **self.args)
+        np.testing.assert_array_equal(self.p_params(model, [1])[0], expected[1])
@@ -0,0 +1,70 @@
+"""Tests for nca_bottleneck_query - bottlenecks at arbitrary Y levels."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nca import nca_analysis, nca_bottleneck_query, nca_random
+
+
+@pytest.fixture
+def test_data():
+    """Create reproducible test data with two X variables."""
+    np.random.seed(42)
+    return nca_random(n=80, intercepts=[0.2, 0.1], slopes=[0.8, 1.2])
+
+
+CEILINGS = ['ce_fdh', 'ce_vrs', 'cr_fdh', 'cols']
+
+
+class TestBottleneckQuery:
+    """Test queries against the precomputed bottleneck index."""
+
+    @pytest.mark.parametrize('bottleneck_x', ['percentage.range', 'actual', 'percentile'])
+    @pytest.mark.parametrize('flip_y', [False, True])
+    def test_matches_bottleneck_tables(self, test_data, bottleneck_x, flip_y):
+        """Test querying the table levels reproduces the bottleneck tables."""
+        model = nca_analysis(
+            test_data, ['X1', 'X2'], 'Y', ceilings=CEILINGS,
+            bottleneck_x=bottleneck_x, flip_y=flip_y, bottleneck_query=True
+        )
+
+        for ceiling, bn in model['bottlenecks'].items():
+            result = nca_bottleneck_query(model, bn.iloc[:, 0], ceiling)[ceiling]
+            for x in ['X1', 'X2']:
+                np.testing.assert_allclose(result[x], bn[x], equal_nan=True)
+                np.testing.assert_array_equal(result.attrs['nn'][x], bn.attrs['nn'][x])
+                np.testing.assert_array_equal(result.attrs['na'][x], bn.attrs['na'][x])
+
+    def test_arbitrary_levels(self, test_data):
+        """Test levels off the steps grid and in actual Y values."""
+        model = nca_analysis(
+            test_data, ['X1', 'X2'], 'Y', ceilings=['ce_fdh'],
+            bottleneck_x='actual', bottleneck_y='actual', bottleneck_query=True
+        )
+        result = nca_bottleneck_query(model, [0.33, 0.73])
+
+        assert list(result.keys()) == ['ce_fdh']
+        bn = result['ce_fdh']
+        assert isinstance(bn, pd.DataFrame)
+        assert list(bn.iloc[:, 0]) == [0.33, 0.73]
+
+        # Required X is the X of the first peer reaching the Y level
+        peers = model['peers']['ce_fdh']['X1']
+        expected = peers[peers['y'] > 0.73 - 1e-10].iloc[0]['x']
+        assert bn['X1'].iloc[1] == pytest.approx(expected)
+
+    def test_without_index(self, test_data):
+        """Test a model without query index raises."""
+        model = nca_analysis(test_data, ['X1', 'X2'], 'Y', ceilings=['ce_fdh'])
+        assert 'bottleneck_query' not in model
+        with pytest.raises(ValueError):
+            nca_bottleneck_query(model, 0.5)
+
+    def test_unknown_ceiling(self, test_data):
+        """Test querying a ceiling that was not analysed raises."""
+        model = nca_analysis(
+            test_data, ['X1', 'X2'], 'Y', ceilings=['ce_fdh'], bottleneck_query=True
+        )
+        with pytest.raises(ValueError):
+            nca_bottleneck_query(model, 0.5, 'cr_fdh')
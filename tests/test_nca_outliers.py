@@ -237,13 +237,18 @@ class TestNcaOutliersCeilings:
             pass
 
     def test_c_lp(self, test_data):
-        """Test with C-LP ceiling - may not support outlier detection."""
-        try:
-            result = nca_outliers(test_data, 'X', 'Y', ceiling='c_lp')
-            assert result is None or isinstance(result, pd.DataFrame)
-        except (ValueError, TypeError, AttributeError):
-            # C-LP may not fully support outlier detection in some cases
-            pass
+        """Test with C-LP ceiling, which has no peers."""
+        result = nca_outliers(test_data, 'X', 'Y', ceiling='c_lp')
+        assert result is None or isinstance(result, pd.DataFrame)
+
+    @pytest.mark.parametrize('seed,flip_x,flip_y', [
+        (0, False, True), (2, True, False), (3, False, True), (4, True, False)])
+    def test_c_lp_flipped(self, seed, flip_x, flip_y):
+        """Test C-LP reanalyses that leave a zero CE-FDH ceiling."""
+        np.random.seed(seed)
+        data = nca_random(n=20, intercepts=[0.1], slopes=[1.0]).round(2)
+        result = nca_outliers(data, 'X', 'Y', ceiling='c_lp', flip_x=flip_x, flip_y=flip_y)
+        assert result is None or isinstance(result, pd.DataFrame)
 
 
 class TestNcaOutliersOutputFormat:
@@ -318,3 +323,328 @@ class TestNcaOutliersWithScope:
             scope=[np.nan, 1, 0, np.nan]
         )
         assert result is None or isinstance(result, pd.DataFrame)
+
+
+class TestLeaveOneOut:
+    """Test the leave-one-out effects against a full reanalysis."""
+
+    @pytest.fixture
+    def test_data(self):
+        """Create test data with tied values."""
+        rng = np.random.default_rng(7)
+        x = rng.integers(0, 8, 40).astype(float)
+        y = np.clip(x + rng.integers(-3, 4, 40), 0, None)
+        return pd.DataFrame({'X': x, 'Y': y}, index=[f'r{i}' for i in range(40)])
+
+    @pytest.mark.parametrize('ceiling', ['ce_fdh', 'ce_vrs', 'cr_fdh', 'cr_vrs', 'cols'])
+    @pytest.mark.parametrize('corner,scope', [(1, None), (2, None), (3, None), (1, [-1, 9, -1, 12])])
+    def test_matches_reanalysis(self, test_data, ceiling, corner, scope):
+        """Test removing peers, pairs of peers and other rows."""
+        from nca.p_leave_one_out import p_loo_data, p_loo_effect
+
+        model = nca_analysis(test_data, 'X', 'Y', ceilings=[ceiling], corner=corner, scope=scope)
+        params = {
+            'x': 'X', 'y': 'Y', 'ceiling': [ceiling], 'corner': corner,
+            'flip_x': False, 'flip_y': False, 'scope': scope,
+        }
+        loo = p_loo_data(test_data, params)
+
+        if ceiling == 'cols':
+            # COLS fits all points, its line peers have no row names
+            peers = list(test_data.index[:6])
+        else:
+            # Without a ceiling zone the peers are an empty array
+            peers = list(getattr(model['peers'][ceiling]['X'], 'index', []))
+        combos = [[p] for p in peers] + [peers[i:i + 2] for i in range(len(peers) - 1)]
+        combos += [['r0'], ['r1', 'r2']]
+
+        for combo in combos:
+            data_new = test_data.drop(combo)
+            expected = nca_analysis(data_new, 'X', 'Y', ceilings=[ceiling], corner=corner, scope=scope)
+            eff_nw, scope_new = p_loo_effect(loo, combo)
+
+            assert eff_nw == pytest.approx(expected['summaries']['X']['params'].iloc[1, 0], nan_ok=True)
+            assert scope_new == pytest.approx(list(expected['summaries']['X']['global'].iloc[2:6, 0]))
+
+    @pytest.mark.parametrize('ceiling', ['cr_fdh', 'cols'])
+    @pytest.mark.parametrize('flip_y,scope', [(False, None), (True, None), (True, [0, 4, 0, 4])])
+    def test_degenerate_lines(self, ceiling, flip_y, scope):
+        """Test removals that leave a flat line, or a line end on the scope, as the reanalysis."""
+        from itertools import combinations
+
+        from nca.p_leave_one_out import p_loo_data, p_loo_effect
+
+        data = pd.DataFrame(
+            {'X': [0.0, 0.0, 2.0, 2.0, 1.0, 1.0, 2.0], 'Y': [0.0, 2.0, 2.0, 0.0, 3.0, 1.0, 1.0]},
+            index=[f'r{i}' for i in range(7)],
+        )
+        params = {
+            'x': 'X', 'y': 'Y', 'ceiling': [ceiling], 'corner': None,
+            'flip_x': False, 'flip_y': flip_y, 'scope': scope,
+        }
+        loo = p_loo_data(data, params)
+
+        for combo in [list(c) for k in (1, 2, 3) for c in combinations(data.index, k)]:
+            data_new = data.drop(combo)
+            if data_new['X'].nunique() < 2:
+                continue
+            expected = nca_analysis(
+                data_new, 'X', 'Y', ceilings=[ceiling], flip_y=flip_y, scope=scope
+            )['summaries']['X']['params'].iloc[1, 0]
+            eff_nw, _ = p_loo_effect(loo, combo)
+            assert eff_nw == pytest.approx(expected, nan_ok=True), combo
+
+    def test_other_ceilings(self, test_data):
+        """Test ceilings without leave-one-out engine use the reanalysis."""
+        from nca.p_leave_one_out import p_loo_data
+
+        params = {
+            'x': 'X', 'y': 'Y', 'ceiling': ['qr'], 'corner': None,
+            'flip_x': False, 'flip_y': False, 'scope': None,
+        }
+        assert p_loo_data(test_data, params) is None
+
+    @pytest.mark.parametrize('ceiling', ['cr_fdh', 'cr_vrs', 'cols'])
+    def test_line_outliers_match_reanalysis(self, test_data, monkeypatch, ceiling):
+        """Test the outlier table of line ceilings equals the one of the reanalysis."""
+        import sys
+
+        data = test_data.iloc[:20]
+        result = nca_outliers(data, 'X', 'Y', ceiling=ceiling, k=2, max_results=100)
+        monkeypatch.setattr(sys.modules['nca.nca_outliers'], 'p_loo_data', lambda data, params: None)
+        expected = nca_outliers(data, 'X', 'Y', ceiling=ceiling, k=2, max_results=100)
+
+        # Rounding differences of the fits may swap rows with equal effects
+        result = result.sort_values('outliers').reset_index(drop=True)
+        expected = expected.sort_values('outliers').reset_index(drop=True)
+        pd.testing.assert_frame_equal(result, expected)
+
+
+class TestOutlierSearch:
+    """Test the pruned search for k > 1 against all combinations."""
+
+    @pytest.fixture
+    def test_data(self):
+        """Create test data."""
+        np.random.seed(3)
+        return nca_random(n=15, intercepts=[0.1], slopes=[1.0])
+
+    @pytest.mark.parametrize('ceiling', ['ce_fdh', 'ce_vrs'])
+    @pytest.mark.parametrize('condensed', [False, True])
+    def test_matches_all_combinations(self, test_data, monkeypatch, ceiling, condensed):
+        """Test pruning does not change the outliers."""
+        import sys
+
+        kwargs = {'ceiling': ceiling, 'k': 3, 'max_results': 10, 'condensed': condensed}
+        pruned = nca_outliers(test_data, 'X', 'Y', **kwargs)
+
+        # Bounds that never prune
+        module = sys.modules['nca.nca_outliers']
+        monkeypatch.setattr(module, 'p_loo_bounds', lambda *args: (0.0, float('inf')))
+        full = nca_outliers(test_data, 'X', 'Y', **kwargs)
+
+        assert isinstance(pruned, pd.DataFrame)
+        pd.testing.assert_frame_equal(pruned.reset_index(drop=True), full.reset_index(drop=True))
+
+        # Sets pruned on the top still count as hidden
+        assert pruned.attrs.get('hidden') == full.attrs.get('hidden')
+        assert pruned.attrs.get('shown') == full.attrs.get('shown')
+
+    def test_bounds_contain_effects(self, test_data):
+        """Test the effect of every completion lies within the bounds."""
+        from itertools import combinations
+
+        from nca.p_leave_one_out import p_loo_bounds, p_loo_data, p_loo_effect
+
+        test_data.index = [f'r{i}' for i in range(len(test_data))]
+        params = {
+            'x': 'X', 'y': 'Y', 'ceiling': ['ce_fdh'], 'corner': None,
+            'flip_x': False, 'flip_y': False, 'scope': None,
+        }
+        loo = p_loo_data(test_data, params)
+        peers = list(test_data.index[loo['peers']])
+        candidates = [n for n in test_data.index if n not in peers[:1]][:8]
+
+        eff_lo, eff_hi = p_loo_bounds(loo, peers[:1], candidates, 2)
+        for r in range(3):
+            for extra in combinations(candidates, r):
+                eff, _ = p_loo_effect(loo, peers[:1] + list(extra))
+                assert eff_lo - 1e-12 <= eff <= eff_hi + 1e-12
+
+
+class TestPeerLayers:
+    """Test the peer layers against removing the peers layer by layer."""
+
+    @pytest.mark.parametrize('vrs', [False, True])
+    @pytest.mark.parametrize('flip_x,flip_y', [(False, False), (True, False), (False, True)])
+    def test_layers_match_peeling(self, vrs, flip_x, flip_y):
+        """Test every layer are the peers left after removing the layers above."""
+        from nca.p_peers import p_peer_layers, p_peers
+
+        rng = np.random.default_rng(11)
+        x = pd.Series(rng.integers(0, 6, 60).astype(float))
+        y = pd.Series(rng.integers(0, 6, 60).astype(float))
+        loop_data = {'x': x, 'y': y, 'flip_x': flip_x, 'flip_y': flip_y}
+
+        layers = p_peer_layers(loop_data, 4, vrs=vrs)
+
+        remaining = pd.Series(True, index=x.index)
+        for layer in range(1, 5):
+            peers = p_peers(
+                {'x': x[remaining], 'y': y[remaining], 'flip_x': flip_x, 'flip_y': flip_y},
+                vrs=vrs
+            )
+            assert set(peers.index) == set(layers.index[layers == layer])
+            remaining[peers.index] = False
+
+        if vrs:
+            assert (layers[remaining] == 5).all()
+        else:
+            assert (layers[remaining] >= 5).all()
+
+
+class TestClusterReuse:
+    """Test nested analyses reuse the worker pool of the caller."""
+
+    def test_outliers_keep_outer_pool(self):
+        """Test the outlier run uses and keeps a pool it did not start."""
+        from nca import p_utils
+
+        # QR has no leave-one-out engine, its sets are evaluated on the pool
+        np.random.seed(42)
+        data = nca_random(n=15, intercepts=[0.2], slopes=[0.7])
+        expected = nca_outliers(data, 'X', 'Y', ceiling='qr', k=2)
+
+        assert p_utils.p_start_cluster(True)
+        pool = p_utils.p_get_pool()
+        try:
+            assert not p_utils.p_start_cluster(True)
+            result = nca_outliers(data, 'X', 'Y', ceiling='qr', k=2)
+            nca_analysis(data, 'X', 'Y', ceilings=['ce_fdh'])
+            assert p_utils.p_get_pool() is pool
+
+            # A cleanup by a caller that did not start the pool does nothing
+            p_utils.p_cluster_cleanup(False)
+            assert p_utils.p_get_pool() is pool
+        finally:
+            p_utils.p_cluster_cleanup(True)
+
+        assert p_utils.p_get_pool() is None
+        pd.testing.assert_frame_equal(result, expected)
+
+
+class TestOrderNames:
+    """Test the names of multi-point outliers are ordered on single influence."""
+
+    def test_order_names(self):
+        """Test names follow |dif_rel| of the single outliers, ties keep the combo order."""
+        from nca.nca_outliers import p_order_names
+
+        org_outliers = pd.DataFrame({
+            'combo': [[3], [7], [5]],
+            'dif_rel': [0.1, -0.4, 0.1],
+        })
+        outliers = pd.DataFrame({'combo': [[3, 7], [5, 3, 7], [1, 5, 3], [2, 4]]})
+
+        names = p_order_names(outliers, org_outliers)
+        assert list(names) == ['7 - 3', '7 - 5 - 3', '5 - 3 - 1', '2 - 4']
+
+
+class TestOutliersBatch:
+    """Test the batch outlier detection against separate nca_outliers calls."""
+
+    @pytest.mark.parametrize('k', [1, 2])
+    def test_matches_separate_calls(self, k):
+        """Test every (condition, ceiling) pair equals its nca_outliers table."""
+        from nca import nca_outliers_batch
+
+        np.random.seed(3)
+        data = nca_random(n=30, intercepts=[0.2, 0.1], slopes=[0.7, 1.1])
+        ceilings = ['ce_fdh', 'cr_fdh', 'cols', 'c_lp']
+        result = nca_outliers_batch(data, ['X1', 'X2'], 'Y', ceilings=ceilings, k=k, corner=[1, 2])
+
+        assert list(result.columns[:2]) == ['condition', 'ceiling_technique']
+        for x, corner in [('X1', 1), ('X2', 2)]:
+            for ceiling in ceilings:
+                expected = nca_outliers(data[[x, 'Y']], x, 'Y', ceiling=ceiling, k=k, corner=corner)
+                rows = result[(result['condition'] == x) & (result['ceiling_technique'] == ceiling)]
+                pd.testing.assert_frame_equal(
+                    rows.drop(columns=['condition', 'ceiling_technique']).reset_index(drop=True),
+                    expected.reset_index(drop=True),
+                )
+
+    def test_invalid_ceiling(self):
+        """Test OLS is skipped like in nca_outliers."""
+        from nca import nca_outliers_batch
+
+        np.random.seed(3)
+        data = nca_random(n=30, intercepts=[0.2, 0.1], slopes=[0.7, 1.1])
+        assert nca_outliers_batch(data, ['X1', 'X2'], 'Y', ceilings='ols') is None
+        result = nca_outliers_batch(data, ['X1', 'X2'], 'Y', ceilings=['ols', 'ce_fdh'])
+        assert set(result['ceiling_technique']) == {'ce_fdh'}
+
+
+class TestScopeOutliers:
+    """Test scope outliers from the order statistics of X and Y."""
+
+    @pytest.fixture
+    def test_data(self):
+        """Create test data with a tied minimum of X and an isolated maximum of Y."""
+        x = [0.0, 0.0, 0.2, 0.4, 0.5, 0.6, 0.8, 1.0]
+        y = [0.1, 0.2, 0.3, 0.5, 0.2, 0.9, 0.6, 0.7]
+        return pd.DataFrame({'X': x, 'Y': y}, index=[f'r{i}' for i in range(8)])
+
+    def test_order_extremes(self, test_data):
+        """Test the rows of which removing at most k rows changes the scope."""
+        from nca.p_leave_one_out import p_order_extremes, p_order_scope, p_order_stats
+
+        loop_data = {'x': test_data['X'], 'y': test_data['Y']}
+        stats = p_order_stats(loop_data)
+
+        # The tied X minimum only moves when both rows are removed
+        assert set(test_data.index[p_order_extremes(stats, 1)]) == {'r7', 'r0', 'r5'}
+        # r4 ties with r1 on the second lowest Y, removing it never moves the minimum
+        assert set(test_data.index[p_order_extremes(stats, 2)]) == {'r0', 'r1', 'r7', 'r6', 'r5'}
+
+        assert p_order_scope(stats, []) == [0.0, 1.0, 0.1, 0.9]
+        assert p_order_scope(stats, np.array([0, 5])) == [0.0, 1.0, 0.2, 0.7]
+
+    def test_scope_column(self, test_data):
+        """Test removing a scope extreme is marked in the scope column."""
+        result = nca_outliers(test_data, 'X', 'Y', ceiling='ce_fdh')
+        marks = dict(zip(result['outliers'], result['scope']))
+        assert marks['r7'] == 'X'
+        assert marks['r5'] == 'X'
+        assert marks.get('r3', '') == ''
+
+    def test_scope_shrink(self, test_data):
+        """Test the percentage by which the scope area shrinks."""
+        result = nca_outliers(test_data, 'X', 'Y', ceiling='ce_fdh')
+        shrink = dict(zip(result['outliers'], result['scope_shrink']))
+        # Scope 0-1 x 0.1-0.9, removing r5 lowers the Y maximum to 0.7
+        assert shrink['r5'] == 25.0
+        assert shrink['r7'] == 20.0
+        assert shrink.get('r3', 0.0) == 0.0
+
+
+class TestTopOutliers:
+    """Test keeping only the top max_results sets gives the full result."""
+
+    @pytest.mark.parametrize('ceiling', ['ce_fdh', 'cr_fdh', 'cols'])
+    def test_matches_all_outliers(self, monkeypatch, ceiling):
+        """Test the shown rows and the hidden count."""
+        import sys
+
+        np.random.seed(5)
+        data = nca_random(n=15, intercepts=[0.1], slopes=[1.0]).round(1)
+        kwargs = {'ceiling': ceiling, 'k': 3, 'max_results': 4}
+        result = nca_outliers(data, 'X', 'Y', **kwargs)
+
+        module = sys.modules['nca.nca_outliers']
+        new_top = module.p_new_top
+        monkeypatch.setattr(module, 'p_new_top', lambda max_results=None: new_top(None))
+        expected = nca_outliers(data, 'X', 'Y', **kwargs)
+
+        assert len(result) == 4
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+        assert result.attrs == expected.attrs
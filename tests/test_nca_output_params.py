@@ -71,6 +71,28 @@ class TestNcaOutputBottlenecks:
         assert isinstance(bn_table, pd.DataFrame)
         assert len(bn_table) > 0
 
+    def test_bottleneck_table_numeric(self, model_ce_fdh):
+        """Test bottleneck values are numeric with NN/NA masks."""
+        bn_table = model_ce_fdh['bottlenecks']['ce_fdh']
+        assert bn_table['X'].dtype == float
+
+        nn = bn_table.attrs['nn']['X']
+        na = bn_table.attrs['na']['X']
+        assert nn[0]
+        assert np.isnan(bn_table['X'][nn]).all()
+        assert not (nn & na).any()
+        assert len(bn_table.attrs['actual']['X']) == len(bn_table)
+
+    def test_bottleneck_percentile_cases(self, test_data, capsys):
+        """Test percentile bottlenecks are displayed with case counts."""
+        model = nca_analysis(test_data, 'X', 'Y', ceilings=['ce_fdh'], bottleneck_x='percentile')
+        assert 'X' in model['bottlenecks']['ce_fdh'].attrs['cases']
+
+        nca_output(model, summaries=False, plots=False, bottlenecks=True)
+        captured = capsys.readouterr()
+        assert 'NN (0)' in captured.out
+        assert '(percentile)' in captured.out
+
 
 class TestNcaOutputPlots:
     """Test nca_output() with plots option."""
@@ -206,6 +228,129 @@ class TestBottleneckXY:
         )
         assert 'bottlenecks' in model
 
+    def test_bottleneck_y_percentile(self, test_data):
+        """Test bottleneck_y='percentile'."""
+        model = nca_analysis(test_data, 'X', 'Y', bottleneck_y='percentile')
+        assert len(model['bottlenecks']['ce_fdh']) == 11
+
+
+class TestBottleneckExport:
+    """Test streaming the bottlenecks to file."""
+
+    def test_export_csv(self, test_data, tmp_path):
+        """Test CSV export matches the in-memory bottleneck table."""
+        model = nca_analysis(test_data, 'X', 'Y', ceilings=['ce_fdh', 'cr_fdh'])
+        exported = nca_analysis(
+            test_data, 'X', 'Y', ceilings=['ce_fdh', 'cr_fdh'],
+            bottleneck_export='csv', bottleneck_path=str(tmp_path)
+        )
+
+        assert exported['bottlenecks'] == {}
+        assert set(exported['bottleneck_files']) == {'ce_fdh', 'cr_fdh'}
+
+        for ceiling, file_name in exported['bottleneck_files'].items():
+            rows = pd.read_csv(file_name)
+            bn = model['bottlenecks'][ceiling]
+            assert list(rows['condition'].unique()) == ['X']
+            np.testing.assert_allclose(rows['y'], bn.iloc[:, 0])
+            np.testing.assert_allclose(rows['value'], bn['X'], equal_nan=True)
+            np.testing.assert_array_equal(rows['nn'], bn.attrs['nn']['X'])
+
+    def test_export_parquet(self, test_data, tmp_path):
+        """Test Parquet export writes a row group per (short) condition."""
+        pq = pytest.importorskip('pyarrow.parquet')
+        data = nca_random(n=50, intercepts=[0.2, 0.1], slopes=[0.8, 1.2])
+        model = nca_analysis(
+            data, ['X1', 'X2'], 'Y', ceilings=['ce_fdh'],
+            bottleneck_export='parquet', bottleneck_path=str(tmp_path)
+        )
+
+        file_name = model['bottleneck_files']['ce_fdh']
+        assert pq.ParquetFile(file_name).metadata.num_row_groups == 2
+
+        rows = pd.read_parquet(file_name, filters=[('y', '==', 50.0)])
+        assert list(rows['condition']) == ['X1', 'X2']
+
+    def test_export_parquet_row_groups(self, tmp_path):
+        """Test the row groups of a condition split its Y range."""
+        pq = pytest.importorskip('pyarrow.parquet')
+        data = nca_random(n=50, intercepts=[0.2, 0.1], slopes=[0.8, 1.2])
+        model = nca_analysis(
+            data, ['X1', 'X2'], 'Y', ceilings=['ce_fdh'], steps=2500,
+            bottleneck_export='parquet', bottleneck_path=str(tmp_path)
+        )
+
+        metadata = pq.ParquetFile(model['bottleneck_files']['ce_fdh']).metadata
+        assert metadata.num_row_groups == 6
+
+        column = metadata.schema.names.index('y')
+        for condition in range(2):
+            groups = [metadata.row_group(3 * condition + i) for i in range(3)]
+            stats = [group.column(column).statistics for group in groups]
+            assert [group.num_rows for group in groups] == [1000, 1000, 501]
+            assert stats[0].min == 0 and stats[-1].max == 100
+            assert all(a.max < b.min for a, b in zip(stats[:-1], stats[1:]))
+            assert groups[0].column(column).has_offset_index
+
+    def test_export_closed_on_error(self, tmp_path, monkeypatch):
+        """Test the export file is closed when the analysis fails."""
+        pq = pytest.importorskip('pyarrow.parquet')
+        data = nca_random(n=50, intercepts=[0.2, 0.1], slopes=[0.8, 1.2])
+
+        def failing_summary(analyses, loop_data):
+            raise RuntimeError('summary failed')
+
+        monkeypatch.setattr(sys.modules['nca.nca'], 'p_summary', failing_summary)
+        with pytest.raises(RuntimeError):
+            nca_analysis(
+                data, ['X1', 'X2'], 'Y', ceilings=['ce_fdh'],
+                bottleneck_export='parquet', bottleneck_path=str(tmp_path)
+            )
+
+        # Only a closed file has the footer with the metadata
+        assert pq.ParquetFile(str(tmp_path / 'bottlenecks.ce_fdh.parquet')).metadata.num_rows == 11
+
+    def test_export_invalid_format(self, test_data, tmp_path):
+        """Test an unknown export format raises."""
+        with pytest.raises(ValueError):
+            nca_analysis(test_data, 'X', 'Y', bottleneck_export='xlsx', bottleneck_path=str(tmp_path))
+
+
+class TestBottleneckSpecs:
+    """Test several bottleneck representations from one analysis."""
+
+    SPECS = [('actual', 'actual'), ('percentile', 'percentage.range'), ('percentage.max', 'actual')]
+
+    def test_specs_match_single_runs(self, test_data):
+        """Test every spec equals an analysis with that bottleneck_x / bottleneck_y."""
+        model = nca_analysis(
+            test_data, 'X', 'Y', ceilings=['ce_fdh', 'cr_fdh'], bottleneck_specs=self.SPECS
+        )
+
+        assert list(model['bottleneck_specs']) == [('percentage.range', 'percentage.range')] + self.SPECS
+        assert model['bottleneck_specs'][('percentage.range', 'percentage.range')] is model['bottlenecks']
+
+        for (bn_x, bn_y), tables in model['bottleneck_specs'].items():
+            single = nca_analysis(
+                test_data, 'X', 'Y', ceilings=['ce_fdh', 'cr_fdh'],
+                bottleneck_x=bn_x, bottleneck_y=bn_y
+            )
+            for ceiling, bn in tables.items():
+                expected = single['bottlenecks'][ceiling]
+                assert bn.attrs['bn_x'] == bn_x and bn.attrs['bn_y'] == bn_y
+                np.testing.assert_allclose(bn.iloc[:, 0], expected.iloc[:, 0])
+                np.testing.assert_allclose(bn['X'], expected['X'], equal_nan=True)
+                np.testing.assert_array_equal(bn.attrs['nn']['X'], expected.attrs['nn']['X'])
+
+    def test_without_specs(self, model_ce_fdh):
+        """Test the specs are only in the model when requested."""
+        assert 'bottleneck_specs' not in model_ce_fdh
+
+    def test_invalid_spec(self, test_data):
+        """Test a spec that is not a pair raises."""
+        with pytest.raises(ValueError):
+            nca_analysis(test_data, 'X', 'Y', bottleneck_specs=['actual'])
+
 
 class TestStepsParameter:
     """Test steps and step_size parameters."""
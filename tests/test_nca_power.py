@@ -188,3 +188,378 @@ class TestPInterceptFunction:
         
         intercept3 = p_intercept(1.5, 0.3)
         assert isinstance(intercept3, float)
+
+
+class TestPowerCell:
+    """Test the batched simulation of a power cell."""
+
+    def test_sample_below_line(self):
+        """Test that simulated points are in the scope and below the line."""
+        from nca.p_power import p_power_sample
+
+        rng = np.random.default_rng(1)
+        for distr in ["uniform", "normal"]:
+            x, y = p_power_sample(rng, 50, 30, 0.2, 1.5, distr, distr)
+
+            assert x.shape == (50, 30) and y.shape == (50, 30)
+            assert np.all((x >= 0) & (x <= 1) & (y >= 0))
+            assert np.all(y < np.minimum(1, 0.2 + 1.5 * x))
+
+    @pytest.mark.parametrize("ceiling", ["ce_fdh", "cr_fdh"])
+    def test_effects_match_analysis(self, ceiling):
+        """Test that the batched effects equal those of nca_analysis."""
+        from nca import nca_analysis
+        from nca.p_power import p_power_effects, p_power_sample
+
+        rng = np.random.default_rng(2)
+        x, y = p_power_sample(rng, 10, 25, 0.3, 1, "uniform", "uniform")
+        order = np.argsort(x, axis=1)
+        effects = p_power_effects(
+            ceiling, np.take_along_axis(x, order, 1), np.take_along_axis(y, order, 1)
+        )
+
+        for r in range(10):
+            data = pd.DataFrame({"X": x[r], "Y": y[r]})
+            model = nca_analysis(data, "X", "Y", ceilings=[ceiling], scope=[0, 1, 0, 1])
+            expected = model["summaries"]["X"]["params"].iloc[1, 0]
+            assert effects[r] == pytest.approx(expected, rel=1e-9)
+
+    def test_pvalues_match_loop(self):
+        """Test that a kernel ceiling and the per dataset loop give the same p-values."""
+        from nca.p_power import p_power_effects, p_power_pvalue, p_power_pvalues
+
+        x = np.random.default_rng(3).uniform(0, 1, 20)
+        y = np.minimum(x, np.random.default_rng(4).uniform(0, 1, 20))
+
+        order = np.argsort(x)
+        xs, ys = x[order], y[order]
+        perm = np.random.default_rng(5)
+        nulls = np.array([p_power_effects("ce_fdh", xs, ys[perm.permutation(20)]) for _ in range(30)])
+        expected = p_power_pvalues(nulls, np.asarray(p_power_effects("ce_fdh", xs, ys)), 30)
+
+        # The loop permutes the unsorted Y with the same random stream
+        pvalue = p_power_pvalue(np.random.default_rng(5), "ce_fdh", xs, ys, 30)
+        assert pvalue == pytest.approx(expected)
+
+    def test_fallback_matches_loop(self):
+        """Test that a ceiling without a kernel tests every dataset with the loop."""
+        from nca.p_power import P_POWER_KERNELS, p_power_cell, p_power_pvalue, p_power_sample
+
+        assert "ce_vrs" not in P_POWER_KERNELS
+        pvalues = p_power_cell(
+            np.random.default_rng(6), "ce_vrs", 15, 0.3, 1, "uniform", "uniform", 3, 10
+        )
+
+        rng = np.random.default_rng(6)
+        x, y = p_power_sample(rng, 3, 15, 0.3, 1, "uniform", "uniform")
+        expected = [p_power_pvalue(rng, "ce_vrs", x[r], y[r], 10) for r in range(3)]
+
+        np.testing.assert_allclose(pvalues, expected)
+        assert np.all((pvalues >= 0.1) & (pvalues <= 1))
+
+    def test_strong_effect_has_power(self, capsys):
+        """Test that a large effect in a large sample is detected."""
+        result = nca_power(n=[100], effect=0.3, slope=1, ceiling="ce_fdh", rep=20, test_rep=50)
+
+        assert result["power"].iloc[0] >= 0.9
+        assert result["p"].iloc[0] < 0.05
+
+
+class TestPowerScheduler:
+    """Test the task grid of nca_power."""
+
+    def test_tasks_cover_repetitions(self):
+        """Test that the blocks of a cell add up to rep."""
+        from nca.p_power import P_POWER_BLOCK, p_power_tasks
+
+        cells = [{"n": 20}, {"n": 30}]
+        seeds = np.random.SeedSequence(1).spawn(2)
+        tasks = p_power_tasks(cells, seeds, [[], []], [0, 1], 2 * P_POWER_BLOCK + 3, 10)
+
+        assert len(tasks) == 6
+        for cell_index in range(2):
+            sizes = [task[4] for task in tasks if task[0] == cell_index]
+            assert sizes == [P_POWER_BLOCK, P_POWER_BLOCK, 3]
+
+    def test_seed_reproducible(self, capsys):
+        """Test that a seed gives the same table, and another seed another one."""
+        args = {
+            "n": [20, 40],
+            "effect": 0.2,
+            "ceiling": ["ce_fdh", "cr_fdh"],
+            "rep": 30,
+            "test_rep": 20,
+        }
+
+        first = nca_power(random_state=7, **args)
+        second = nca_power(random_state=7, **args)
+        other = nca_power(random_state=8, **args)
+
+        pd.testing.assert_frame_equal(first, second)
+        assert not first["p"].equals(other["p"])
+
+    def test_pool_reproducible(self, capsys):
+        """Test that the results do not depend on running in a worker pool."""
+        from nca.p_utils import p_cluster_cleanup, p_start_cluster
+
+        args = {
+            "n": [20, 40],
+            "effect": 0.2,
+            "ceiling": ["ce_fdh", "ce_vrs"],
+            "rep": 10,
+            "test_rep": 10,
+        }
+        serial = nca_power(random_state=3, **args)
+
+        owned = p_start_cluster(True)
+        try:
+            parallel = nca_power(random_state=3, **args)
+        finally:
+            p_cluster_cleanup(owned)
+
+        pd.testing.assert_frame_equal(serial, parallel)
+
+
+class TestPowerSequential:
+    """Test sequential stopping of the power cells."""
+
+    def test_interval(self):
+        """Test the Clopper-Pearson interval of the power."""
+        from nca.p_power import p_power_interval
+
+        assert p_power_interval(0, 50) == pytest.approx((0, 0.0711), abs=1e-4)
+        assert p_power_interval(50, 50) == pytest.approx((0.9289, 1), abs=1e-4)
+        lower, upper = p_power_interval(20, 40)
+        assert lower < 0.5 < upper
+        assert upper - lower == pytest.approx(2 * (0.5 - lower))
+
+    def test_stops_early(self, capsys):
+        """Test that a cell with power near 1 stops before the cap."""
+        result = nca_power(
+            n=[100], effect=0.3, rep=500, test_rep=40, tolerance=0.15, random_state=1
+        )
+
+        row = result.iloc[0]
+        assert row["rep"] < 500
+        assert row["rep"] % 25 == 0
+        assert row["ci.upper"] - row["ci.lower"] <= 0.15
+        assert row["ci.lower"] <= row["power"] <= row["ci.upper"]
+
+    def test_cap_matches_fixed(self, capsys):
+        """Test that a cell that hits the cap equals the fixed run."""
+        args = {
+            "n": [20],
+            "effect": 0.1,
+            "ceiling": ["ce_fdh", "cr_fdh"],
+            "rep": 60,
+            "test_rep": 20,
+        }
+        fixed = nca_power(random_state=4, **args)
+        sequential = nca_power(random_state=4, tolerance=0.01, **args)
+
+        assert list(sequential["rep"]) == [60, 60]
+        pd.testing.assert_frame_equal(fixed, sequential[fixed.columns])
+
+    def test_invalid_tolerance(self, capsys):
+        """Test that a tolerance outside (0, 1) is rejected."""
+        result = nca_power(n=[20], effect=0.2, tolerance=0, rep=1, test_rep=5)
+        captured = capsys.readouterr()
+        assert "tolerance" in captured.out.lower()
+        assert result is None
+
+
+class TestSampleSize:
+    """Test the sample size search."""
+
+    def test_finds_smallest_n(self, capsys):
+        """Test that the result reaches the target and its lower neighbour does not."""
+        from nca import nca_sample_size
+
+        result = nca_sample_size(power=0.8, effect=0.2, rep=50, test_rep=40, random_state=2)
+        table = result["table"]
+
+        assert result["power"] >= 0.8
+        assert result["n"] in table["n"].values
+        below = table[table["n"] < result["n"]]
+        assert len(below) > 0 and below["power"].iloc[-1] < 0.8
+        assert len(table) <= 10
+
+    def test_matches_power(self, capsys):
+        """Test that a simulated sample size equals nca_power with the same seed."""
+        from nca import nca_sample_size
+        from nca.nca_power import p_intercept, p_power_grid
+
+        result = nca_sample_size(power=0.8, effect=0.2, rep=30, test_rep=20, random_state=5)
+        row = result["table"].iloc[0]
+
+        cell = {
+            "n": row["n"], "ES": 0.2, "slope": 1, "ceiling": "ce_fdh",
+            "distr.x": "uniform", "distr.y": "uniform", "intercept": p_intercept(1, 0.2),
+        }
+        expected = p_power_grid([cell], 0.05, 30, 20, 5)
+        assert row["power"] == expected["power"].iloc[0]
+
+    def test_unreachable(self, capsys):
+        """Test that a target beyond n_max gives no sample size."""
+        from nca import nca_sample_size
+
+        result = nca_sample_size(power=0.99, effect=0.05, rep=10, test_rep=10, n_max=20)
+        captured = capsys.readouterr()
+
+        assert result["n"] is None
+        assert "no sample size" in captured.out.lower()
+        assert list(result["table"]["n"]) == [10, 20]
+
+    def test_invalid_power(self, capsys):
+        """Test that a power outside (0, 1) is rejected."""
+        from nca import nca_sample_size
+
+        assert nca_sample_size(power=1) is None
+        assert "power" in capsys.readouterr().out.lower()
+
+
+class TestPowerTable:
+    """Test the power tables and their lookups."""
+
+    def test_store_pools_repetitions(self, tmp_path, capsys):
+        """Test that repeated runs of a point are pooled in the table."""
+        from nca.p_power_table import p_read_power_table
+
+        path = str(tmp_path / "power.csv")
+        first = nca_power(n=[20], effect=0.2, rep=20, test_rep=10, random_state=1, store=path)
+        second = nca_power(n=[20], effect=0.2, rep=30, test_rep=10, random_state=2, store=path)
+        nca_power(n=[20], effect=0.2, rep=10, test_rep=20, random_state=3, store=path)
+
+        table = p_read_power_table(path)
+        assert len(table) == 2
+        pooled = table[table["test_rep"] == 10].iloc[0]
+        assert pooled["rep"] == 50
+        expected = (20 * first["power"].iloc[0] + 30 * second["power"].iloc[0]) / 50
+        assert pooled["power"] == pytest.approx(expected)
+
+    def test_interpolation(self):
+        """Test the monotone interpolation between tabulated points."""
+        from nca.p_power_table import p_interpolate_power
+
+        rows = pd.DataFrame(
+            {"n": [20, 40, 20, 40], "ES": [0.1, 0.1, 0.2, 0.2], "power": [0.2, 0.5, 0.4, 0.9]}
+        ).assign(rep=1000)
+
+        power, se, source = p_interpolate_power(rows, 40, 0.2)
+        assert (power, source) == (0.9, "table")
+
+        # Halfway on log n between the bounds, with the gap in the error
+        power, se, source = p_interpolate_power(rows, np.sqrt(20 * 40), 0.1)
+        assert source == "interpolated"
+        assert power == pytest.approx(0.35)
+        assert 0.3 / np.sqrt(12) < se < 0.3 / np.sqrt(12) + 0.02
+
+        # Outside the tabulated points there is no bound
+        assert p_interpolate_power(rows, 10, 0.1)[1] == np.inf
+        assert p_interpolate_power(rows, 30, 0.3)[1] == np.inf
+
+    def test_lookup_simulates_uncertain_points(self, tmp_path, capsys):
+        """Test that only uncertain points are simulated, and then stored."""
+        from nca.nca_power import nca_power_lookup
+
+        path = str(tmp_path / "power.csv")
+        nca_power(n=[20, 40], effect=[0.1, 0.2], rep=40, test_rep=10, random_state=1, store=path)
+
+        result = nca_power_lookup(
+            path, n=[20, 30, 60], effect=0.1, test_rep=10, max_se=0.4, rep=20, random_state=2
+        )
+        assert list(result["source"]) == ["table", "interpolated", "simulated"]
+        assert np.all(result["se"] <= 0.4)
+
+        # The simulated point is now in the table
+        result = nca_power_lookup(path, n=60, effect=0.1, test_rep=10, max_se=0.4)
+        assert result["source"].iloc[0] == "table"
+
+
+class TestPowerCheckpoint:
+    """Test resumable nca_power runs."""
+
+    ARGS = {
+        "n": [20, 30],
+        "effect": [0.1, 0.2],
+        "ceiling": ["ce_fdh", "cr_fdh"],
+        "rep": 10,
+        "test_rep": 10,
+    }
+
+    def count_tasks(self, monkeypatch):
+        import sys
+
+        power_module = sys.modules["nca.nca_power"]
+        calls = []
+        task = power_module.p_power_task
+
+        def counted(args):
+            calls.append(args[0])
+            return task(args)
+
+        monkeypatch.setattr(power_module, "p_power_task", counted)
+        return calls
+
+    @pytest.mark.parametrize("extension", [".csv", ".parquet", ".sqlite"])
+    def test_resume_skips_completed_cells(self, tmp_path, monkeypatch, capsys, extension):
+        """Test that a rerun only simulates the missing cells, with their own streams."""
+        from nca.p_power_store import (
+            p_open_power_store,
+            p_read_power_store,
+            p_store_run,
+            p_write_power_store,
+        )
+
+        path = str(tmp_path / f"power{extension}")
+        full = nca_power(random_state=5, **self.ARGS)
+
+        # An interrupted run stored the first cells only
+        store = p_open_power_store(path)
+        run = p_store_run(10, 10, 0.05, None, np.random.SeedSequence(5))
+        for cell_index in range(3):
+            p_write_power_store(store, cell_index, full.iloc[cell_index].to_dict(), run)
+
+        calls = self.count_tasks(monkeypatch)
+        resumed = nca_power(random_state=5, checkpoint=path, **self.ARGS)
+
+        assert sorted(set(calls)) == list(range(3, 8))
+        assert len(p_read_power_store(store)) == 8
+        pd.testing.assert_frame_equal(full, resumed, check_dtype=False)
+
+    def test_resume_without_seed(self, tmp_path, monkeypatch, capsys):
+        """Test that a run without a seed resumes with the stored seed."""
+        path = str(tmp_path / "power.csv")
+        first = nca_power(checkpoint=path, **self.ARGS)
+
+        calls = self.count_tasks(monkeypatch)
+        second = nca_power(checkpoint=path, **self.ARGS)
+
+        assert calls == []
+        pd.testing.assert_frame_equal(first, second, check_dtype=False)
+
+    def test_resume_sequence_entropy(self, tmp_path, monkeypatch, capsys):
+        """Test resuming a run seeded with a spawned sequence of a list of integers."""
+        path = str(tmp_path / "power.csv")
+        seed = np.random.SeedSequence([1, 2])
+        seed.spawn(3)
+        full = nca_power(random_state=seed, checkpoint=path, **self.ARGS)
+
+        # An interrupted run stored the first cells only
+        pd.read_csv(path).iloc[:3].to_csv(path, index=False)
+
+        calls = self.count_tasks(monkeypatch)
+        resumed = nca_power(checkpoint=path, **self.ARGS)
+
+        assert sorted(set(calls)) == list(range(3, 8))
+        pd.testing.assert_frame_equal(full, resumed, check_dtype=False)
+
+    def test_other_settings_rerun(self, tmp_path, monkeypatch, capsys):
+        """Test that stored cells of other settings are not reused."""
+        path = str(tmp_path / "power.csv")
+        nca_power(random_state=5, checkpoint=path, **self.ARGS)
+
+        calls = self.count_tasks(monkeypatch)
+        nca_power(random_state=5, checkpoint=path, p=0.1, **self.ARGS)
+
+        assert len(set(calls)) == 8
@@ -200,3 +200,161 @@ class TestNcaRandomAttributes:
         assert df.attrs.get('distribution.y') == 'normal'
         assert df.attrs.get('mean.x') == 0.5
         assert df.attrs.get('sd.x') == 0.2
+
+
+class TestNcaRandomSampler:
+    """Test the batch rejection sampler."""
+
+    @pytest.mark.parametrize(
+        "intercepts, slopes, corner",
+        [([0.2, 0.1], [0.8, 1.2], 1), ([0.9], [-0.6], 2), ([0.8], [-0.5], 3), ([0.1], [0.8], 4)],
+    )
+    def test_points_in_empty_corner(self, intercepts, slopes, corner):
+        """Test that every point is on the correct side of every line."""
+        df = nca_random(n=2000, intercepts=intercepts, slopes=slopes, corner=corner)
+        x = df.iloc[:, :-1].to_numpy()
+        y = df["Y"].to_numpy()
+        lines = np.array(intercepts) + np.array(slopes) * x
+
+        assert len(df) == 2000
+        if corner in [1, 2]:
+            assert np.all(y[:, None] < np.minimum(1, lines))
+        else:
+            assert np.all(y[:, None] > np.maximum(0, lines))
+
+    def test_same_distribution_as_single_draws(self):
+        """Test that the batches match rows drawn and rejected one by one."""
+        from scipy.stats import ks_2samp
+
+        rng = np.random.default_rng(1)
+        rows = []
+        while len(rows) < 2000:
+            y, x1, x2 = rng.uniform(0, 1, 3)
+            if y < min(1, 0.2 + 0.8 * x1) and y < min(1, 0.1 + 1.2 * x2):
+                rows.append([x1, x2, y])
+        rows = np.array(rows)
+
+        np.random.seed(2)
+        df = nca_random(n=2000, intercepts=[0.2, 0.1], slopes=[0.8, 1.2])
+        for i, column in enumerate(["X1", "X2", "Y"]):
+            assert ks_2samp(rows[:, i], df[column]).pvalue > 0.001
+
+    def test_large_n(self):
+        """Test that large samples are drawn in blocks."""
+        df = nca_random(n=200000, intercepts=0.2, slopes=1.5)
+
+        assert len(df) == 200000
+        assert df["Y"].is_monotonic_increasing
+
+
+class TestNcaRandomNormal:
+    """Test the batch truncated normal draws."""
+
+    @pytest.mark.parametrize("mean, sd", [(0.5, 0.2), (0.1, 0.3), (-0.5, 0.2), (3, 0.2)])
+    def test_matches_truncnorm(self, mean, sd):
+        """Test that the inverse CDF draws follow the truncated normal distribution."""
+        from scipy.stats import kstest, truncnorm
+
+        from nca.nca_random import p_values
+
+        values = p_values("normal", mean, sd, 20000, np.random.default_rng(3))
+        a, b = (0 - mean) / sd, (1 - mean) / sd
+
+        assert np.all((values >= 0) & (values <= 1))
+        assert kstest(values, truncnorm(a, b, loc=mean, scale=sd).cdf).pvalue > 0.001
+
+    def test_normal_large_n(self):
+        """Test that normal samples are drawn as fast as uniform ones."""
+        df = nca_random(
+            n=200000, intercepts=0.2, slopes=1.5, distribution_x="normal", distribution_y="normal"
+        )
+
+        assert len(df) == 200000
+        assert df.attrs["mean.x"] == 0.5
+
+
+class TestNcaRandomChunks:
+    """Test chunked generation of large datasets."""
+
+    def test_chunks(self):
+        """Test the sizes, index and attributes of the chunks."""
+        from nca import nca_random_chunks
+
+        chunks = list(
+            nca_random_chunks(
+                25000, [0.2, 0.1], [0.8, 1.2], distribution_x="normal", chunk_size=10000
+            )
+        )
+
+        assert [len(chunk) for chunk in chunks] == [10000, 10000, 5000]
+        assert chunks[1].index[0] == 10001 and chunks[-1].index[-1] == 25000
+        assert list(chunks[0].columns) == ["X1", "X2", "Y"]
+        assert chunks[2].attrs["mean.x"] == 0.5
+        for chunk in chunks:
+            lines = np.array([0.2, 0.1]) + np.array([0.8, 1.2]) * chunk[["X1", "X2"]].to_numpy()
+            assert np.all(chunk["Y"].to_numpy()[:, None] < np.minimum(1, lines))
+
+    def test_chunks_validate(self):
+        """Test that the chunks validate their inputs before drawing."""
+        from nca import nca_random_chunks
+
+        with pytest.raises(ValueError):
+            next(nca_random_chunks(100, 1.5, 0.8))
+
+    def test_npy_file(self, tmp_path):
+        """Test a memory mapped .npy file with its metadata."""
+        import json
+
+        from nca import nca_random_file
+
+        path = str(tmp_path / "data.npy")
+        np.random.seed(4)
+        nca_random_file(path, 25000, 0.2, 0.8, chunk_size=10000, distribution_y="normal")
+
+        data = np.load(path, mmap_mode="r")
+        metadata = json.load(open(path + ".json"))
+
+        assert data.shape == (25000, 2)
+        assert metadata["columns"] == ["X", "Y"]
+        assert metadata["attrs"]["distribution.y"] == "normal"
+        assert np.all(data[:, 1] < np.minimum(1, 0.2 + 0.8 * data[:, 0]))
+
+        # The same rows as the chunks
+        np.random.seed(4)
+        chunks = chunks_frame(25000, 10000, distribution_y="normal")
+        np.testing.assert_array_equal(data, chunks.to_numpy())
+
+    def test_parquet_file(self, tmp_path):
+        """Test a Parquet file with a row group per chunk and the attributes."""
+        import json
+
+        pq = pytest.importorskip("pyarrow.parquet")
+        from nca import nca_random_file
+
+        path = str(tmp_path / "data.parquet")
+        np.random.seed(5)
+        nca_random_file(path, 25000, 0.2, 0.8, chunk_size=10000)
+
+        metadata = pq.read_metadata(path)
+        attrs = json.loads(pq.read_schema(path).metadata[b"nca_random"])
+
+        assert metadata.num_rows == 25000
+        assert metadata.num_row_groups == 3
+        assert attrs == {"distribution.x": "uniform", "distribution.y": "uniform"}
+
+        np.random.seed(5)
+        chunks = chunks_frame(25000, 10000)
+        pd.testing.assert_frame_equal(pd.read_parquet(path), chunks.reset_index(drop=True))
+
+    def test_invalid_file(self, tmp_path):
+        """Test that other file types are rejected."""
+        from nca import nca_random_file
+
+        with pytest.raises(ValueError):
+            nca_random_file(str(tmp_path / "data.csv"), 100, 0.2, 0.8)
+
+
+def chunks_frame(n, chunk_size, **kwargs):
+    from nca import nca_random_chunks
+
+    return pd.concat(nca_random_chunks(n, 0.2, 0.8, chunk_size=chunk_size, **kwargs))
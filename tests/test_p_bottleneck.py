@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+# Add the parent directory to sys.path to import nca
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from nca.p_bottleneck import p_cases, p_peer_index, p_sorted_x, p_transform_mpx
+from nca.p_loop_data import p_create_loop_data
+
+
+class TestPBottleneck(unittest.TestCase):
+    def setUp(self):
+        x = pd.DataFrame({"X": [0.4, 0.1, 0.9, 0.3, 0.7]})
+        y = pd.Series([0.2, 0.1, 0.8, 0.5, 0.6], name="Y")
+        self.loop_data = p_create_loop_data(x, y, None, [False], False, 0, 0.95)
+        self.mpx = np.array([[0.1], [0.35], [0.7], [1.0]])
+
+    def test_sorted_x(self):
+        np.testing.assert_array_equal(p_sorted_x(self.loop_data), [0.1, 0.3, 0.4, 0.7, 0.9])
+        np.testing.assert_array_equal(
+            p_sorted_x(self.loop_data, True), np.sort(-self.loop_data["x"].to_numpy())
+        )
+
+    def test_sorted_x_fallback(self):
+        # Loop data without the precomputed arrays gives the same results
+        plain = {k: v for k, v in self.loop_data.items() if not k.startswith("x_sorted")}
+
+        for flip_x in [False, True]:
+            self.loop_data["flip_x"] = flip_x
+            plain["flip_x"] = flip_x
+            np.testing.assert_array_equal(
+                p_transform_mpx(self.loop_data, self.mpx.copy(), 4),
+                p_transform_mpx(plain, self.mpx.copy(), 4),
+            )
+            np.testing.assert_array_equal(
+                p_cases(self.loop_data, self.mpx), p_cases(plain, self.mpx)
+            )
+
+    def test_peer_index(self):
+        y_peers = np.array([0.2, 0.5, 0.5, 0.8])
+        mpy = np.array([0.0, 0.2, 0.3, 0.8, 0.9])
+        np.testing.assert_array_equal(p_peer_index(mpy, y_peers, False), [0, 0, 1, 3, 4])
+
+        # Flipped Y: first peer below the level
+        y_peers = np.array([0.8, 0.5, 0.2])
+        mpy = np.array([1.0, 0.6, 0.2, 0.1])
+        np.testing.assert_array_equal(p_peer_index(mpy, y_peers, True), [0, 1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()